@@ -2,51 +2,368 @@
 Docker-related API endpoints for the n8n AI Assistant Pro backend.
 """
 
-from flask import request, jsonify
+from flask import request, jsonify, Response
+import re
+import time
+import json
 import logging
-from postgres_handler import create_postgres_connection, execute_postgres_query
+import docker
+from config import get_config
+from docker_handler import get_docker_client, get_docker_client_stats, list_containers, stream_exec
+from command_runner import get_command_metrics
+from docker_fleet import fleet_ps, fleet_stats, fleet_images, fleet_search_logs
+from docker_logs import (
+    open_log_follower, search_logs, parse_log_timestamp, parse_time_param, LogStreamLimitError, LOG_LEVELS
+)
+from stats_sampler import get_stats_sampler
 
 logger = logging.getLogger("n8n_ai_assistant_api")
 
-def register_postgres_routes(app):
-    """Register PostgreSQL-related endpoints."""
+def _ndjson_exec_events(events):
+    """Encode stream_exec() events as newline-delimited JSON."""
+    try:
+        for event in events:
+            yield json.dumps(event) + '\n'
+    except Exception as e:
+        # Headers are already sent, so report the error in-band
+        logger.error(f"Error streaming exec output: {str(e)}")
+        yield json.dumps({"error": str(e)}) + '\n'
+
+def _sse_data(text):
+    """
+    Frame text as SSE data lines.
+    
+    CR, LF and CRLF all end a line in SSE, and log lines often carry a bare
+    CR (progress bars): each piece gets a data: line of its own, which the
+    client joins back with LF.
+    """
+    return ''.join(f"data: {part}\n" for part in re.split(r'\r\n|\r|\n', text))
+
+def _sse_log_events(follower):
+    """Encode followed log lines as Server-Sent Events, closing the follower when done."""
+    config = get_config()
+    try:
+        # Reconnect quickly; the browser sends the last id back as Last-Event-ID
+        yield "retry: 3000\n\n"
+        for item in follower.lines(config["DOCKER_LOG_STREAM_HEARTBEAT"], config["DOCKER_LOG_STREAM_MAX_DURATION"]):
+            if item is None:
+                # Comment frame: keeps proxies and the browser from timing out
+                yield ": heartbeat\n\n"
+                continue
+            timestamp, text = item
+            if timestamp:
+                yield f"id: {timestamp}\n{_sse_data(text)}\n"
+            else:
+                yield f"{_sse_data(text)}\n"
+        yield "event: end\ndata: {}\n\n"
+    except RuntimeError as e:
+        # Headers are already sent, so report the error in-band
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    finally:
+        # Also runs when the client disconnects and the generator is closed
+        follower.close()
+
+def register_docker_routes(app):
+    """Register Docker-related endpoints."""
+    
+    @app.route('/test-docker', methods=['POST'])
+    def test_docker_connection():
+        """Endpoint to test Docker connection."""
+        try:
+            data = request.json
+            docker_host = data.get('dockerHost')
+            
+            # Get Docker client
+            client = get_docker_client(docker_host)
+            
+            # Get server info
+            docker_info = client.info()
+            docker_version = client.version()
+            
+            # Get container list
+            containers = list_containers(docker_host)
+            container_info = [
+                {
+                    "id": container["short_id"],
+                    "name": container["name"],
+                    "image": container["image"],
+                    "status": container["status"],
+                    "status_text": container["status_text"]
+                }
+                for container in containers
+            ]
+            
+            return jsonify({
+                "success": True, 
+                "message": "Docker connection successful",
+                "docker_info": {
+                    "version": docker_version.get('Version', 'unknown'),
+                    "containers_count": len(containers),
+                    "containers": container_info[:10]  # Limit to 10 to avoid huge responses
+                }
+            })
+            
+        except Exception as e:
+            logger.error(f"Error testing Docker connection: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/docker/client-stats', methods=['GET'])
+    def docker_client_stats():
+        """Endpoint to report Docker client cache statistics."""
+        try:
+            return jsonify({
+                "success": True,
+                "clients": get_docker_client_stats()
+            })
+        except Exception as e:
+            logger.error(f"Error getting Docker client statistics: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/docker/command-metrics', methods=['GET'])
+    def docker_command_metrics():
+        """Endpoint to report duration and outcome counters of docker CLI fallback commands."""
+        return jsonify({
+            "success": True,
+            "commands": get_command_metrics()
+        })
+    
+    @app.route('/docker/stats/history', methods=['GET'])
+    def docker_stats_history():
+        """Endpoint to get sampled container metrics, downsampled to at most `points` per container."""
+        sampler = get_stats_sampler()
+        if sampler is None:
+            return jsonify({"success": False, "error": "Stats sampler is not running"}), 503
+        
+        try:
+            container = request.args.get('container')
+            points = min(max(int(request.args.get('points', 120)), 1), 1000)
+            window = request.args.get('window')
+            since = time.time() - int(window) if window else None
+        except ValueError:
+            return jsonify({"success": False, "error": "points and window must be integers"}), 400
+        
+        history = sampler.history(container, points=points, since=since)
+        if container and not history:
+            return jsonify({"success": False, "error": f"No samples for container '{container}'"}), 404
+        
+        return jsonify({
+            "success": True,
+            "sampler": sampler.status(),
+            "containers": history
+        })
+    
+    @app.route('/docker/logs/<container_name>/stream', methods=['GET'])
+    def stream_container_logs(container_name):
+        """
+        Endpoint to follow a container's log as Server-Sent Events.
+        
+        Each line is sent as it arrives, with its Docker timestamp as the
+        event id, so a reconnecting client resumes after the last line it
+        received (Last-Event-ID header or last_event_id parameter).
+        """
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        since_ns = None
+        if last_event_id:
+            since_ns = parse_log_timestamp(last_event_id)
+            if since_ns is None:
+                return jsonify({"success": False, "error": f"Invalid Last-Event-ID '{last_event_id}'"}), 400
+        
+        try:
+            tail = int(request.args.get('tail', 100))
+        except ValueError:
+            return jsonify({"success": False, "error": "tail must be an integer"}), 400
+        
+        try:
+            client = get_docker_client(request.args.get('dockerHost'))
+            container = client.containers.get(container_name)
+            follower = open_log_follower(container, since_ns, tail)
+        except docker.errors.NotFound:
+            return jsonify({"success": False, "error": f"Container '{container_name}' not found"}), 404
+        except LogStreamLimitError as e:
+            return jsonify({"success": False, "error": str(e)}), 429
+        except Exception as e:
+            logger.error(f"Error opening log stream for {container_name}: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+        
+        response = Response(_sse_log_events(follower), mimetype='text/event-stream')
+        # The generator's cleanup never runs if the client leaves before the first chunk
+        response.call_on_close(follower.close)
+        response.headers['Cache-Control'] = 'no-cache'
+        # Ask reverse proxies not to buffer the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @app.route('/docker/logs/<container_name>/search', methods=['GET'])
+    def search_container_logs(container_name):
+        """
+        Endpoint to search a container's log on the server.
+        
+        Only matching lines and their context are returned. Pass the returned
+        cursor as `since` on the next call to search only newer lines.
+        """
+        pattern = request.args.get('pattern') or None
+        if pattern and len(pattern) > 500:
+            return jsonify({"success": False, "error": "Pattern is too long (max 500 characters)"}), 400
+        
+        levels = [level.strip().lower() for level in request.args.get('levels', '').split(',') if level.strip()]
+        unknown = [level for level in levels if level not in LOG_LEVELS]
+        if unknown:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown levels {', '.join(unknown)}; expected {', '.join(LOG_LEVELS)}"
+            }), 400
+        
+        try:
+            since_ns = parse_time_param(request.args['since']) if request.args.get('since') else None
+            until_ns = parse_time_param(request.args['until']) if request.args.get('until') else None
+            context = min(max(int(request.args.get('context', 2)), 0), 20)
+            limit = min(max(int(request.args.get('limit', 200)), 1), 1000)
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "since/until must be log timestamps or Unix seconds; context and limit must be integers"
+            }), 400
+        
+        try:
+            client = get_docker_client(request.args.get('dockerHost'))
+            container = client.containers.get(container_name)
+            start_time = time.time()
+            result = search_logs(
+                container, pattern, levels, since_ns, until_ns, context, limit,
+                ignore_case=request.args.get('ignore_case', '1') == '1'
+            )
+            result["duration"] = time.time() - start_time
+            return jsonify({"success": True, **result})
+            
+        except re.error as e:
+            return jsonify({"success": False, "error": f"Invalid pattern: {str(e)}"}), 400
+        except docker.errors.NotFound:
+            return jsonify({"success": False, "error": f"Container '{container_name}' not found"}), 404
+        except Exception as e:
+            logger.error(f"Error searching logs of {container_name}: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
     
-    @app.route('/test-postgres', methods=['POST'])
-    def test_postgres_connection():
-        """Endpoint to test PostgreSQL connection."""
+    @app.route('/docker/exec/stream', methods=['POST'])
+    def stream_container_exec():
+        """
+        Endpoint to run a command in a container and stream its output as NDJSON.
+        
+        Each line is {"stream": "stdout"|"stderr", "data": ...}; the last one
+        reports the exit code. Output beyond max_bytes is cut with a
+        {"truncated": true} marker.
+        """
         try:
             data = request.json
-            connection_string = data.get('connectionString', '')
-            
-            if not connection_string:
-                return jsonify({"success": False, "error": "Connection string required"}), 400
-            
-            # Try to connect to PostgreSQL
-            conn = create_postgres_connection(connection_string)
-            if conn:
-                # Get database information
-                cursor = conn.cursor()
-                cursor.execute("SELECT version();")
-                db_version = cursor.fetchone()[0]
-                
-                # Get list of databases
-                cursor.execute("SELECT datname FROM pg_database WHERE datistemplate = false;")
-                databases = [row[0] for row in cursor.fetchall()]
-                
-                cursor.close()
-                conn.close()
-                
-                return jsonify({
-                    "success": True, 
-                    "message": "PostgreSQL connection successful",
-                    "db_info": {
-                        "version": db_version,
-                        "databases": databases
-                    }
-                })
+            container_name = data.get('container')
+            cmd = data.get('command')
+            
+            if not container_name or not cmd:
+                return jsonify({"success": False, "error": "container and command are required"}), 400
+            
+            max_bytes_cap = get_config()["DOCKER_EXEC_MAX_OUTPUT_BYTES"]
+            max_bytes = data.get('max_bytes')
+            if max_bytes is None:
+                max_bytes = max_bytes_cap
+            if not isinstance(max_bytes, int) or isinstance(max_bytes, bool) or max_bytes <= 0:
+                return jsonify({"success": False, "error": "max_bytes must be a positive integer"}), 400
+            max_bytes = min(max_bytes, max_bytes_cap)
+            
+            # The first event comes as soon as the exec has started: reading it
+            # before sending headers gives a missing container a proper status code
+            client = get_docker_client(data.get('dockerHost'))
+            events = stream_exec(client, container_name, cmd, max_bytes)
+            first = next(events)
+            
+            def chunks():
+                yield json.dumps(first) + '\n'
+                yield from _ndjson_exec_events(events)
             
+            response = Response(chunks(), mimetype='application/x-ndjson')
+            # Ask reverse proxies not to buffer the chunked body
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+            
+        except docker.errors.NotFound:
+            return jsonify({"success": False, "error": f"Container '{container_name}' not found"}), 404
         except Exception as e:
-            logger.error(f"Error testing PostgreSQL connection: {str(e)}", exc_info=True)
+            logger.error(f"Error running exec: {str(e)}", exc_info=True)
             return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/docker/fleet/<kind>', methods=['POST'])
+    def docker_fleet_listing(kind):
+        """
+        Endpoint to run ps, stats or images on several Docker hosts at once.
         
-        return jsonify({"success": False, "error": "Could not establish connection"}), 500
\ No newline at end of file
+        Rows from all hosts are merged with a "host" key; hosts that fail or
+        time out are listed in "hosts" with their error.
+        """
+        if kind not in ('ps', 'stats', 'images'):
+            return jsonify({"success": False, "error": f"Unknown fleet query '{kind}'"}), 404
+        
+        try:
+            data = request.json or {}
+            queries = {
+                'ps': lambda hosts, timeout: fleet_ps(hosts, all=data.get('all', True), timeout=timeout),
+                'stats': fleet_stats,
+                'images': fleet_images,
+            }
+            hosts = data.get('hosts') or []
+            if not isinstance(hosts, list) or not hosts:
+                return jsonify({"success": False, "error": "hosts must be a non-empty list"}), 400
+            
+            timeout = data.get('timeout')
+            rows, host_results = queries[kind](hosts, float(timeout) if timeout else None)
+            
+            return jsonify({
+                "success": True,
+                "partial": any(result["status"] != 'ok' for result in host_results),
+                "rows": rows,
+                "hosts": host_results
+            })
+        except Exception as e:
+            logger.error(f"Error running fleet {kind}: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/docker/fleet/logs/<container_name>/search', methods=['POST'])
+    def docker_fleet_log_search(container_name):
+        """Endpoint to search a container's log on every host that runs it."""
+        try:
+            data = request.json or {}
+            hosts = data.get('hosts') or []
+            if not isinstance(hosts, list) or not hosts:
+                return jsonify({"success": False, "error": "hosts must be a non-empty list"}), 400
+            
+            levels = data.get('levels') or []
+            unknown = [level for level in levels if level not in LOG_LEVELS]
+            if unknown:
+                return jsonify({"success": False, "error": f"Unknown levels {', '.join(unknown)}"}), 400
+            
+            pattern = data.get('pattern') or None
+            if pattern:
+                # Fail fast instead of once per host
+                re.compile(pattern)
+            
+            timeout = data.get('timeout')
+            rows, host_results = fleet_search_logs(
+                hosts, container_name, float(timeout) if timeout else None,
+                pattern=pattern,
+                levels=levels,
+                since_ns=parse_time_param(data['since']) if data.get('since') else None,
+                until_ns=parse_time_param(data['until']) if data.get('until') else None,
+                context=min(max(int(data.get('context', 2)), 0), 20),
+                limit=min(max(int(data.get('limit', 200)), 1), 1000),
+            )
+            
+            return jsonify({
+                "success": True,
+                "partial": any(result["status"] != 'ok' for result in host_results),
+                "matches": rows,
+                "hosts": host_results
+            })
+        except re.error as e:
+            return jsonify({"success": False, "error": f"Invalid pattern: {str(e)}"}), 400
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error searching fleet logs of {container_name}: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
@@ -6,9 +6,10 @@ from flask import request, jsonify
 import logging
 import time
 import uuid
-from docker_handler import execute_docker_command
+from docker_fleet import run_docker_command
 from postgres_handler import execute_postgres_query
 from nlp_interpreter import interpret_natural_language_command
+from utils import request_bypasses_cache, request_forbids_store
 
 logger = logging.getLogger("n8n_ai_assistant_api")
 
@@ -47,19 +48,25 @@ def register_execute_routes(app):
             # Execute based on operation type
             if operation_type == 'docker_command' or docker_command:
                 cmd = docker_command or command
-                result = execute_docker_command(cmd, docker_host)
+                result = run_docker_command(cmd, docker_host)
             elif operation_type == 'postgres_query' or postgres_query:
                 query = postgres_query or command
-                result = execute_postgres_query(query, postgres_connection)
+                result = execute_postgres_query(
+                    query, postgres_connection,
+                    refresh_cache=request_bypasses_cache(), store_cache=not request_forbids_store()
+                )
             elif operation_type == 'combined':
                 # Execute both types of commands
                 docker_result = "No Docker command executed"
                 postgres_result = "No PostgreSQL query executed"
                 
                 if docker_command:
-                    docker_result = execute_docker_command(docker_command, docker_host)
+                    docker_result = run_docker_command(docker_command, docker_host)
                 if postgres_query:
-                    postgres_result = execute_postgres_query(postgres_query, postgres_connection)
+                    postgres_result = execute_postgres_query(
+                        postgres_query, postgres_connection,
+                        refresh_cache=request_bypasses_cache(), store_cache=not request_forbids_store()
+                    )
                 
                 result = f"Docker result:\n{docker_result}\n\nPostgreSQL result:\n{postgres_result}"
             else:
@@ -85,50 +92,3 @@ def register_execute_routes(app):
                 "request_id": request_id,
                 "duration": duration
             }), 500
-from docker_handler import get_docker_client, execute_docker_command
-
-logger = logging.getLogger("n8n_ai_assistant_api")
-
-def register_docker_routes(app):
-    """Register Docker-related endpoints."""
-    
-    @app.route('/test-docker', methods=['POST'])
-    def test_docker_connection():
-        """Endpoint to test Docker connection."""
-        try:
-            data = request.json
-            docker_host = data.get('dockerHost')
-            
-            # Get Docker client
-            client = get_docker_client(docker_host)
-            
-            # Get server info
-            docker_info = client.info()
-            docker_version = client.version()
-            
-            # Get container list
-            containers = client.containers.list(all=True)
-            container_info = []
-            
-            for container in containers:
-                container_info.append({
-                    "id": container.short_id,
-                    "name": container.name,
-                    "image": container.image.tags[0] if container.image.tags else 'none',
-                    "status": container.status,
-                    "state": container.attrs.get('State', {})
-                })
-            
-            return jsonify({
-                "success": True, 
-                "message": "Docker connection successful",
-                "docker_info": {
-                    "version": docker_version.get('Version', 'unknown'),
-                    "containers_count": len(containers),
-                    "containers": container_info[:10]  # Limit to 10 to avoid huge responses
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error testing Docker connection: {str(e)}", exc_info=True)
-            return jsonify({"success": False, "error": str(e)}), 500
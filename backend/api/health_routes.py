@@ -7,8 +7,9 @@ import logging
 from datetime import datetime
 import docker
 from config import get_config
-from postgres_handler import create_postgres_connection
+from postgres_pool import pooled_connection
 from docker_handler import get_docker_client
+from container_inventory import get_container_inventory
 from utils import graceful_shutdown
 
 logger = logging.getLogger("n8n_ai_assistant_api")
@@ -21,23 +22,27 @@ def register_health_routes(app):
         """Endpoint to check the health of the service."""
         config = get_config()
         
-        # Check Docker status
+        # Check Docker status: the inventory's event stream is a live connection to the daemon
         docker_status = "OK"
-        try:
-            client = get_docker_client()
-            # Simple check: try to list containers
-            client.containers.list(limit=1)
-        except Exception as e:
-            docker_status = f"ERROR: {str(e)}"
+        inventory = get_container_inventory()
+        if inventory is not None:
+            if not inventory.is_synced():
+                docker_status = f"ERROR: {inventory.status()['last_error'] or 'container inventory not synced'}"
+        else:
+            try:
+                get_docker_client().ping()
+            except Exception as e:
+                docker_status = f"ERROR: {str(e)}"
         
         # Check PostgreSQL status if default connection is configured
         postgres_status = "N/A"
         if config["DEFAULT_POSTGRES_CONNECTION"]:
             try:
-                conn = create_postgres_connection(config["DEFAULT_POSTGRES_CONNECTION"])
-                if conn:
-                    postgres_status = "OK"
-                    conn.close()
+                with pooled_connection(config["DEFAULT_POSTGRES_CONNECTION"]) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT 1;")
+                    cursor.close()
+                postgres_status = "OK"
             except Exception as e:
                 postgres_status = f"ERROR: {str(e)}"
         
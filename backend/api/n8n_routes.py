@@ -2,41 +2,144 @@
 n8n-specific API endpoints for the n8n AI Assistant Pro backend.
 """
 
-from flask import jsonify
+from flask import request, jsonify, Response
+import time
+import json
+import fnmatch
+import hashlib
 import logging
 import docker
+from config import get_config
 from docker_handler import get_docker_client
+from container_inventory import get_containers
+from postgres_handler import QueryError
+from n8n_execution_stats import get_execution_stats
+from n8n_pruning import (
+    estimate_prune, validate_prune_options, submit_prune_job, resume_prune_job,
+    get_prune_job, list_prune_jobs, cancel_prune_job, PruneInProgressError
+)
+from n8n_workflow_index import get_workflow_index
+from n8n_change_feed import (
+    get_change_feed, install_trigger, remove_trigger, trigger_installed, FeedLimitError
+)
+from n8n_db import EXECUTION_STATUSES
+from utils import request_bypasses_cache
 
 logger = logging.getLogger("n8n_ai_assistant_api")
 
+def _n8n_container_patterns():
+    """
+    Parse N8N_CONTAINERS into (role, name pattern) pairs.
+    
+    Entries are comma-separated 'role:pattern' or bare patterns (role
+    'main'); patterns are shell-style, e.g. 'worker:n8n-worker*'.
+    """
+    patterns = []
+    for entry in get_config()["N8N_CONTAINERS"].split(','):
+        role, _, pattern = entry.strip().rpartition(':')
+        if pattern:
+            patterns.append((role.strip() or 'main', pattern.strip()))
+    return patterns
+
+def _n8n_containers(containers):
+    """
+    Pick the n8n containers out of an inventory listing, with their role.
+    
+    Only stable fields are kept (not the "Up 5 minutes" status text), so the
+    status view changes only when a container does.
+    """
+    patterns = _n8n_container_patterns()
+    matched = []
+    for container in containers:
+        role = next((role for role, pattern in patterns if fnmatch.fnmatchcase(container["name"], pattern)), None)
+        if role is not None:
+            matched.append({
+                "role": role,
+                "name": container["name"],
+                "id": container["id"],
+                "image": container["image"],
+                "status": container["status"],
+                "health": container["health"],
+            })
+    return sorted(matched, key=lambda container: (container["role"] != 'main', container["role"], container["name"]))
+
+def _sse_feed_events(subscription):
+    """Encode change feed events as Server-Sent Events, leaving the feed when done."""
+    config = get_config()
+    try:
+        yield "retry: 3000\n\n"
+        for item in subscription.events(config["N8N_CHANGE_FEED_HEARTBEAT"], config["N8N_CHANGE_FEED_MAX_DURATION"]):
+            if item is None:
+                # Comment frame: keeps proxies and the browser from timing out
+                yield ": heartbeat\n\n"
+                continue
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        yield "event: end\ndata: {}\n\n"
+    finally:
+        # Also runs when the client disconnects and the generator is closed
+        subscription.close()
+
 def register_n8n_routes(app):
     """Register n8n-related endpoints."""
     
     @app.route('/n8n/status', methods=['GET'])
     def n8n_status():
-        """Endpoint to check n8n status."""
+        """
+        Endpoint to check the status of the n8n containers.
+        
+        Served from the container inventory, so polling costs no Docker
+        calls. The response carries an ETag; a request whose If-None-Match
+        matches gets 304 Not Modified. Pass logs=N for the last N log lines
+        of each container.
+        """
         try:
-            # Check if n8n container is running
-            client = get_docker_client()
-            
+            log_lines = request.args.get('logs', '0')
             try:
-                n8n_container = client.containers.get('n8n')
-                container_status = n8n_container.status
-                container_state = n8n_container.attrs.get('State', {})
-                
-                return jsonify({
-                    "success": True,
-                    "status": container_status,
-                    "running": container_status == 'running',
-                    "details": container_state,
-                    "logs": n8n_container.logs(tail=20).decode('utf-8').split('\n')
-                })
-            except docker.errors.NotFound:
+                log_lines = int(log_lines)
+            except ValueError:
+                return jsonify({"success": False, "error": "logs must be a number of lines"}), 400
+            log_lines = max(0, min(log_lines, get_config()["N8N_STATUS_MAX_LOG_LINES"]))
+            
+            containers = _n8n_containers(get_containers())
+            if not containers:
                 return jsonify({
                     "success": False,
-                    "error": "No container named 'n8n' found"
+                    "error": f"No n8n containers found (N8N_CONTAINERS={get_config()['N8N_CONTAINERS']})"
                 }), 404
             
+            if log_lines:
+                client = get_docker_client()
+                for container in containers:
+                    container["logs"] = client.api.logs(container["id"], tail=log_lines).decode(
+                        'utf-8', errors='replace').split('\n')
+            
+            main = next((container for container in containers if container["role"] == 'main'), None)
+            roles = {}
+            for container in containers:
+                counts = roles.setdefault(container["role"], {"total": 0, "running": 0})
+                counts["total"] += 1
+                counts["running"] += 1 if container["status"] == 'running' else 0
+            
+            body = {
+                "success": True,
+                "status": main["status"] if main else 'not_found',
+                "running": main is not None and main["status"] == 'running',
+                "healthy": all(container["status"] == 'running' and container["health"] in (None, 'healthy')
+                               for container in containers),
+                "details": main,
+                "roles": roles,
+                "containers": containers,
+            }
+            if main is not None and log_lines:
+                body["logs"] = main["logs"]
+            
+            response = jsonify(body)
+            # Hash of the body: unchanged container state answers with 304
+            response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+            
         except Exception as e:
             logger.error(f"Error checking n8n status: {str(e)}", exc_info=True)
             return jsonify({"success": False, "error": str(e)}), 500
@@ -64,3 +167,274 @@ def register_n8n_routes(app):
         except Exception as e:
             logger.error(f"Error restarting n8n: {str(e)}", exc_info=True)
             return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/n8n/executions/stats', methods=['GET'])
+    def n8n_execution_stats():
+        """
+        Endpoint to report per-workflow execution statistics.
+        
+        Aggregates are refreshed incrementally, at most once per
+        N8N_EXECUTION_STATS_REFRESH_INTERVAL unless refresh=1 (or
+        Cache-Control: no-cache) is passed; refresh=0 returns them as they are.
+        """
+        try:
+            connection_string = request.args.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+            workflow_id = request.args.get('workflow')
+            refresh = request.args.get('refresh')
+            
+            if not connection_string:
+                return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+            
+            if refresh not in (None, '0', '1'):
+                return jsonify({"success": False, "error": "refresh must be 0 or 1"}), 400
+            
+            tracker = get_execution_stats(connection_string)
+            refresh_result = None
+            if refresh != '0':
+                refresh_result = tracker.refresh(force=refresh == '1' or request_bypasses_cache())
+            
+            return jsonify({
+                "success": True,
+                "refresh": refresh_result,
+                **tracker.summary(workflow_id)
+            })
+            
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+        except Exception as e:
+            logger.error(f"Error getting n8n execution stats: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/n8n/executions/prune', methods=['POST'])
+    def n8n_prune_executions():
+        """
+        Endpoint to delete executions that stopped more than older_than_days ago.
+        
+        Only executions with a final status are deleted (all of them unless
+        statuses narrows it down), never waiting or running ones.
+        With dry_run the matching executions are only counted. Otherwise a
+        pruning job is started and its ID returned to poll.
+        """
+        try:
+            data = request.json or {}
+            connection_string = data.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+            older_than_days = data.get('older_than_days')
+            statuses = data.get('statuses')
+            batch_size = data.get('batch_size')
+            
+            if not connection_string:
+                return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+            
+            try:
+                validate_prune_options(older_than_days, statuses)
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            
+            if batch_size is not None and (not isinstance(batch_size, int) or batch_size <= 0):
+                return jsonify({"success": False, "error": "batch_size must be a positive integer"}), 400
+            
+            if data.get('dry_run'):
+                return jsonify({
+                    "success": True,
+                    "dry_run": True,
+                    **estimate_prune(connection_string, older_than_days, statuses)
+                })
+            
+            job = submit_prune_job(connection_string, older_than_days, statuses, batch_size)
+            
+            return jsonify({
+                "success": True,
+                "job": job.to_dict()
+            }), 202
+            
+        except PruneInProgressError as e:
+            return jsonify({"success": False, "error": str(e)}), 409
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+        except Exception as e:
+            logger.error(f"Error pruning n8n executions: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/n8n/executions/prune', methods=['GET'])
+    def n8n_list_prune_jobs():
+        """Endpoint to list pruning jobs."""
+        return jsonify({
+            "success": True,
+            "jobs": [job.to_dict() for job in list_prune_jobs()]
+        })
+    
+    @app.route('/n8n/executions/prune/<job_id>', methods=['GET'])
+    def n8n_get_prune_job(job_id):
+        """Endpoint to poll the progress of a pruning job."""
+        job = get_prune_job(job_id)
+        if job is None:
+            return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+        
+        return jsonify({
+            "success": True,
+            "job": job.to_dict()
+        })
+    
+    @app.route('/n8n/executions/prune/<job_id>', methods=['DELETE'])
+    def n8n_cancel_prune_job(job_id):
+        """Endpoint to cancel a pruning job after its current batch."""
+        job = get_prune_job(job_id)
+        if job is None:
+            return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+        
+        if not cancel_prune_job(job):
+            return jsonify({
+                "success": False,
+                "error": f"Job already {job.status}",
+                "job": job.to_dict()
+            }), 409
+        
+        return jsonify({
+            "success": True,
+            "message": "Cancellation requested",
+            "job": job.to_dict()
+        })
+    
+    @app.route('/n8n/executions/prune/<job_id>/resume', methods=['POST'])
+    def n8n_resume_prune_job(job_id):
+        """Endpoint to continue a cancelled or failed pruning job where it stopped."""
+        try:
+            job = get_prune_job(job_id)
+            if job is None:
+                return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+            
+            resumed = resume_prune_job(job)
+            if resumed is None:
+                return jsonify({
+                    "success": False,
+                    "error": f"Only cancelled or failed jobs can be resumed, job is {job.status}",
+                    "job": job.to_dict()
+                }), 409
+            
+            return jsonify({
+                "success": True,
+                "job": resumed.to_dict()
+            }), 202
+            
+        except PruneInProgressError as e:
+            return jsonify({"success": False, "error": str(e)}), 409
+        except Exception as e:
+            logger.error(f"Error resuming pruning job: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/n8n/workflows/index', methods=['GET'])
+    def n8n_workflow_index():
+        """
+        Endpoint to find workflows by node type, credential and webhook path.
+        
+        Filters (node_type, credential, webhook, active) combine with AND and
+        are answered from the in-memory workflow index, which is refreshed
+        incrementally at most once per N8N_WORKFLOW_INDEX_REFRESH_INTERVAL
+        unless refresh=1 is passed.
+        """
+        try:
+            connection_string = request.args.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+            active = request.args.get('active')
+            refresh = request.args.get('refresh')
+            
+            if not connection_string:
+                return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+            
+            if active not in (None, 'true', 'false'):
+                return jsonify({"success": False, "error": "active must be true or false"}), 400
+            
+            if refresh not in (None, '0', '1'):
+                return jsonify({"success": False, "error": "refresh must be 0 or 1"}), 400
+            
+            index = get_workflow_index(connection_string)
+            refresh_result = None
+            if refresh != '0':
+                refresh_result = index.refresh(force=refresh == '1' or request_bypasses_cache())
+            
+            start_time = time.perf_counter()
+            workflows = index.find(
+                node_type=request.args.get('node_type'),
+                credential=request.args.get('credential'),
+                webhook=request.args.get('webhook'),
+                active=None if active is None else active == 'true'
+            )
+            lookup_us = (time.perf_counter() - start_time) * 1000000
+            
+            return jsonify({
+                "success": True,
+                "refresh": refresh_result,
+                "lookup_us": round(lookup_us, 1),
+                "count": len(workflows),
+                "workflows": workflows,
+                "index": index.overview()
+            })
+            
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+        except Exception as e:
+            logger.error(f"Error querying the workflow index: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/n8n/executions/feed', methods=['GET'])
+    def n8n_execution_feed():
+        """
+        Endpoint to stream new executions and status changes as Server-Sent Events.
+        
+        Needs the change feed trigger (see /n8n/executions/feed/trigger).
+        Events are 'execution' (id, workflowId, status, mode, startedAt,
+        stoppedAt), 'resync' (events were missed: reload), 'error' and 'end'.
+        Optional filters: workflow (comma-separated ids) and status.
+        """
+        connection_string = request.args.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+        workflow_ids = [value for value in request.args.get('workflow', '').split(',') if value]
+        statuses = [value for value in request.args.get('status', '').split(',') if value]
+        
+        if not connection_string:
+            return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+        
+        invalid = [status for status in statuses if status not in EXECUTION_STATUSES]
+        if invalid:
+            return jsonify({"success": False, "error": f"Invalid status: {', '.join(invalid)}"}), 400
+        
+        try:
+            subscription = get_change_feed(connection_string).subscribe(workflow_ids, statuses)
+        except FeedLimitError as e:
+            return jsonify({"success": False, "error": str(e)}), 429
+        
+        response = Response(_sse_feed_events(subscription), mimetype='text/event-stream')
+        # The generator's cleanup never runs if the client leaves before the first chunk
+        response.call_on_close(subscription.close)
+        response.headers['Cache-Control'] = 'no-cache'
+        # Ask reverse proxies not to buffer the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @app.route('/n8n/executions/feed/trigger', methods=['GET', 'POST', 'DELETE'])
+    def n8n_execution_feed_trigger():
+        """
+        Endpoint to check (GET), install (POST) or remove (DELETE) the NOTIFY
+        trigger behind the execution change feed.
+        """
+        try:
+            connection_string = request.args.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+            
+            if not connection_string:
+                return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+            
+            if request.method == 'POST':
+                install_trigger(connection_string)
+            elif request.method == 'DELETE':
+                remove_trigger(connection_string)
+            
+            return jsonify({
+                "success": True,
+                "installed": trigger_installed(connection_string),
+                "channel": get_config()["N8N_CHANGE_FEED_CHANNEL"],
+                "feed": get_change_feed(connection_string).status()
+            })
+            
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), 500
+        except Exception as e:
+            logger.error(f"Error managing the execution change feed trigger: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
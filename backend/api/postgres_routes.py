@@ -2,14 +2,114 @@
 PostgreSQL-related API endpoints for the n8n AI Assistant Pro backend.
 """
 
-from flask import request, jsonify
+from flask import request, jsonify, Response
 import logging
 import re
+import io
+import csv
+import json
 from config import get_config
-from postgres_handler import create_postgres_connection, execute_postgres_query
+from postgres_handler import run_postgres_query, stream_postgres_query, to_json_value, QueryError, QueryRejectedError
+from postgres_pool import pooled_connection, get_pool_stats
+from postgres_catalog import (
+    list_tables as list_tables_with_counts, COUNT_MODES,
+    get_schema_snapshot, get_schema_cache_stats, invalidate_schema_cache
+)
+from query_cache import get_result_cache
+from query_jobs import (
+    submit_query_job, get_query_job, list_query_jobs, cancel_query_job, JobQueueFullError
+)
+from postgres_explain import explain_query, MAX_TOP_NODES
+from slow_query_log import get_slow_queries, get_slow_query_stats, clear_slow_queries
+from utils import request_bypasses_cache, request_forbids_store
 
 logger = logging.getLogger("n8n_ai_assistant_api")
 
+def _query_error_status(error):
+    """HTTP status for a query error: 400 for rejected queries, 500 otherwise."""
+    return 400 if isinstance(error, QueryRejectedError) else 500
+
+def _parse_cache_ttl(value):
+    """
+    Parse the cache_ttl of a query request.
+    
+    Returns:
+        Seconds to keep the result, at most QUERY_CACHE_TTL, or None for the default
+        
+    Raises:
+        ValueError: If the value is not a positive number
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError("cache_ttl must be a positive number of seconds")
+    try:
+        ttl = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("cache_ttl must be a positive number of seconds")
+    if not ttl > 0 or ttl == float('inf'):
+        raise ValueError("cache_ttl must be a positive number of seconds")
+    return min(ttl, get_config()["QUERY_CACHE_TTL"])
+
+def _parse_flag(value, name):
+    """
+    Parse a boolean request option: a JSON boolean, or "true"/"false".
+    
+    Raises:
+        ValueError: If the value is anything else
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise ValueError(f"{name} must be true or false")
+
+def _parse_positive_int(value, name, maximum):
+    """
+    Parse a positive integer request option, capped at maximum.
+    
+    Raises:
+        ValueError: If the value is not a positive integer
+    """
+    if isinstance(value, bool) or isinstance(value, float):
+        raise ValueError(f"{name} must be a positive integer")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a positive integer")
+    if number <= 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return min(number, maximum)
+
+def _ndjson_chunks(columns, batches):
+    """Encode streamed row batches as newline-delimited JSON objects."""
+    try:
+        for batch in batches:
+            yield ''.join(
+                json.dumps({column: to_json_value(value) for column, value in zip(columns, row)}, default=str) + '\n'
+                for row in batch
+            )
+    except QueryError as e:
+        # Headers are already sent, so report the error in-band
+        logger.error(f"Error streaming query results: {str(e)}")
+        yield json.dumps({"error": str(e)}) + '\n'
+
+def _csv_chunks(columns, batches):
+    """Encode streamed row batches as CSV, starting with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    try:
+        for batch in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([to_json_value(value) for value in row] for row in batch)
+            yield buffer.getvalue()
+    except QueryError as e:
+        # CSV has no error channel; the truncated body is logged server-side
+        logger.error(f"Error streaming query results: {str(e)}")
+
 def register_postgres_routes(app):
     """Register PostgreSQL-related endpoints."""
     
@@ -23,9 +123,8 @@ def register_postgres_routes(app):
             if not connection_string:
                 return jsonify({"success": False, "error": "Connection string required"}), 400
             
-            # Try to connect to PostgreSQL
-            conn = create_postgres_connection(connection_string)
-            if conn:
+            # Try to connect to PostgreSQL (through the pool, so the session is reused afterwards)
+            with pooled_connection(connection_string) as conn:
                 # Get database information
                 cursor = conn.cursor()
                 cursor.execute("SELECT version();")
@@ -36,7 +135,6 @@ def register_postgres_routes(app):
                 databases = [row[0] for row in cursor.fetchall()]
                 
                 cursor.close()
-                conn.close()
                 
                 return jsonify({
                     "success": True, 
@@ -50,8 +148,46 @@ def register_postgres_routes(app):
         except Exception as e:
             logger.error(f"Error testing PostgreSQL connection: {str(e)}", exc_info=True)
             return jsonify({"success": False, "error": str(e)}), 500
-        
-        return jsonify({"success": False, "error": "Could not establish connection"}), 500
+    
+    @app.route('/postgres/cache-stats', methods=['GET'])
+    def postgres_cache_stats():
+        """Endpoint to report PostgreSQL cache statistics."""
+        try:
+            result_cache = get_result_cache()
+            return jsonify({
+                "success": True,
+                "schema_cache": get_schema_cache_stats(),
+                "result_cache": result_cache.stats() if result_cache else None
+            })
+        except Exception as e:
+            logger.error(f"Error getting cache statistics: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/postgres/cache', methods=['DELETE'])
+    def clear_postgres_caches():
+        """Endpoint to clear the result and schema caches."""
+        try:
+            connection_string = request.args.get('connection')
+            result_cache = get_result_cache()
+            if result_cache:
+                result_cache.invalidate(connection_string)
+            invalidate_schema_cache(connection_string)
+            return jsonify({"success": True, "message": "PostgreSQL caches cleared"})
+        except Exception as e:
+            logger.error(f"Error clearing caches: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/postgres/pool-stats', methods=['GET'])
+    def postgres_pool_stats():
+        """Endpoint to report connection pool statistics."""
+        try:
+            return jsonify({
+                "success": True,
+                "pools": get_pool_stats()
+            })
+        except Exception as e:
+            logger.error(f"Error getting pool statistics: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
     
     @app.route('/postgres/databases', methods=['GET'])
     def list_databases():
@@ -73,46 +209,33 @@ def register_postgres_routes(app):
             ORDER BY pg_database_size(datname) DESC;
             """
             
-            result = execute_postgres_query(query, connection_string)
-            
-            # Process the result
-            if result.startswith("PostgreSQL Error:"):
-                return jsonify({"success": False, "error": result}), 500
-            
-            # Parse tabular result into JSON
-            lines = result.strip().split('\n')
-            if len(lines) < 3:  # Header + separator + at least one row
-                return jsonify({"success": True, "databases": []})
-                
-            headers = lines[0].split('\t')
-            databases = []
-            
-            for line in lines[2:]:  # Skip header and separator
-                if not line.strip():  # Skip empty lines
-                    continue
-                values = line.split('\t')
-                if len(values) >= len(headers):
-                    db_info = {}
-                    for i, header in enumerate(headers):
-                        db_info[header.strip()] = values[i].strip()
-                    databases.append(db_info)
+            result = run_postgres_query(query, connection_string)
+            databases = result.records()
             
             return jsonify({
                 "success": True,
                 "databases": databases
             })
             
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), _query_error_status(e)
         except Exception as e:
             logger.error(f"Error listing databases: {str(e)}", exc_info=True)
             return jsonify({"success": False, "error": str(e)}), 500
     
     @app.route('/postgres/tables', methods=['GET'])
     def list_tables():
-        """Endpoint to list tables in a PostgreSQL database."""
+        """
+        Endpoint to list tables in a PostgreSQL database.
+        
+        Row counts are estimated from planner statistics by default; pass
+        count=exact to count rows per table within a time budget.
+        """
         try:
             config = get_config()
             connection_string = request.args.get('connection', config["DEFAULT_POSTGRES_CONNECTION"])
             schema = request.args.get('schema', 'public')
+            count_mode = request.args.get('count', 'estimate')
             
             if not connection_string:
                 return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
@@ -121,52 +244,20 @@ def register_postgres_routes(app):
             if not re.match(r'^[a-zA-Z0-9_]+$', schema):
                 return jsonify({"success": False, "error": "Invalid schema name"}), 400
             
-            query = f"""
-            SELECT 
-                table_name, 
-                (xpath('/row/cnt/text()', xml_count))[1]::text::int as row_count,
-                pg_size_pretty(pg_total_relation_size('"' || table_schema || '"."' || table_name || '"')) as total_size
-            FROM (
-                SELECT 
-                    table_name, 
-                    table_schema, 
-                    query_to_xml('select count(*) as cnt from ' || table_schema || '.' || table_name, false, true, '') as xml_count
-                FROM information_schema.tables 
-                WHERE table_schema = '{schema}'
-            ) t 
-            ORDER BY table_name;
-            """
-            
-            result = execute_postgres_query(query, connection_string)
+            if count_mode not in COUNT_MODES:
+                return jsonify({"success": False, "error": "Count mode must be 'estimate' or 'exact'"}), 400
             
-            # Process the result
-            if result.startswith("PostgreSQL Error:"):
-                return jsonify({"success": False, "error": result}), 500
-            
-            # Parse tabular result into JSON
-            lines = result.strip().split('\n')
-            if len(lines) < 3:  # Header + separator + at least one row
-                return jsonify({"success": True, "tables": []})
-                
-            headers = lines[0].split('\t')
-            tables = []
-            
-            for line in lines[2:]:  # Skip header and separator
-                if not line.strip():  # Skip empty lines
-                    continue
-                values = line.split('\t')
-                if len(values) >= len(headers):
-                    table_info = {}
-                    for i, header in enumerate(headers):
-                        table_info[header.strip()] = values[i].strip()
-                    tables.append(table_info)
+            tables = list_tables_with_counts(connection_string, schema, count_mode)
             
             return jsonify({
                 "success": True,
                 "schema": schema,
+                "count_mode": count_mode,
                 "tables": tables
             })
             
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), _query_error_status(e)
         except Exception as e:
             logger.error(f"Error listing tables: {str(e)}", exc_info=True)
             return jsonify({"success": False, "error": str(e)}), 500
@@ -190,78 +281,22 @@ def register_postgres_routes(app):
             if not re.match(r'^[a-zA-Z0-9_]+$', table_name) or not re.match(r'^[a-zA-Z0-9_]+$', schema):
                 return jsonify({"success": False, "error": "Invalid table or schema name"}), 400
             
-            query = f"""
-            SELECT 
-                column_name, 
-                data_type, 
-                is_nullable, 
-                column_default,
-                ordinal_position
-            FROM information_schema.columns 
-            WHERE table_name = '{table_name}' AND table_schema = '{schema}'
-            ORDER BY ordinal_position;
-            """
-            
-            result = execute_postgres_query(query, connection_string)
-            
-            # Process the result
-            if result.startswith("PostgreSQL Error:"):
-                return jsonify({"success": False, "error": result}), 500
-            
-            # Parse tabular result into JSON
-            lines = result.strip().split('\n')
-            if len(lines) < 3:  # Header + separator + at least one row
-                return jsonify({"success": True, "columns": []})
-                
-            headers = lines[0].split('\t')
-            columns = []
-            
-            for line in lines[2:]:  # Skip header and separator
-                if not line.strip():  # Skip empty lines
-                    continue
-                values = line.split('\t')
-                if len(values) >= len(headers):
-                    column_info = {}
-                    for i, header in enumerate(headers):
-                        column_info[header.strip()] = values[i].strip()
-                    columns.append(column_info)
-            
-            # Get indexes for the table
-            index_query = f"""
-            SELECT
-                indexname,
-                indexdef
-            FROM pg_indexes
-            WHERE tablename = '{table_name}' AND schemaname = '{schema}';
-            """
-            
-            index_result = execute_postgres_query(index_query, connection_string)
-            
-            # Process index results
-            indexes = []
-            if not index_result.startswith("PostgreSQL Error:"):
-                index_lines = index_result.strip().split('\n')
-                if len(index_lines) >= 3:  # Header + separator + at least one row
-                    index_headers = index_lines[0].split('\t')
-                    
-                    for line in index_lines[2:]:  # Skip header and separator
-                        if not line.strip():  # Skip empty lines
-                            continue
-                        values = line.split('\t')
-                        if len(values) >= len(index_headers):
-                            index_info = {}
-                            for i, header in enumerate(index_headers):
-                                index_info[header.strip()] = values[i].strip()
-                            indexes.append(index_info)
+            # Columns, indexes and constraints come from the cached schema snapshot
+            refresh = request.args.get('refresh', '0') == '1'
+            snapshot = get_schema_snapshot(connection_string, schema, force_refresh=refresh)
+            table = snapshot.get(table_name, {"columns": [], "indexes": [], "constraints": []})
             
             return jsonify({
                 "success": True,
                 "table": table_name,
                 "schema": schema,
-                "columns": columns,
-                "indexes": indexes
+                "columns": table["columns"],
+                "indexes": table["indexes"],
+                "constraints": table["constraints"]
             })
             
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), _query_error_status(e)
         except Exception as e:
             logger.error(f"Error getting table schema: {str(e)}", exc_info=True)
             return jsonify({"success": False, "error": str(e)}), 500
@@ -280,67 +315,247 @@ def register_postgres_routes(app):
             if not connection_string:
                 return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
             
-            # Execute the query
-            result = execute_postgres_query(query, connection_string)
+            try:
+                cache_ttl = _parse_cache_ttl(data.get('cache_ttl'))
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
             
-            # Check for errors
-            if result.startswith("PostgreSQL Error:"):
-                return jsonify({"success": False, "error": result}), 500
+            # Execute the query (read-only results may come from the cache)
+            result = run_postgres_query(
+                query,
+                connection_string,
+                refresh_cache=request_bypasses_cache(),
+                cache_ttl=cache_ttl,
+                store_cache=not request_forbids_store()
+            )
             
             # Check if query is SELECT (returns data) or other (returns row count)
-            if "Rows affected:" in result:
+            if result.is_modification:
                 # For INSERT, UPDATE, DELETE, etc.
-                match = re.search(r"Rows affected: (\d+)", result)
-                affected_rows = int(match.group(1)) if match else 0
-                
                 return jsonify({
                     "success": True,
                     "type": "modification",
-                    "affected_rows": affected_rows,
-                    "message": result
+                    "affected_rows": result.rowcount,
+                    "message": result.to_text()
                 })
-            else:
-                # For SELECT queries, parse tabular result into JSON
-                lines = result.strip().split('\n')
-                if len(lines) < 2:  # At least header + separator
-                    return jsonify({
-                        "success": True,
-                        "type": "query",
-                        "columns": [],
-                        "rows": []
-                    })
-                
-                headers = lines[0].split('\t')
-                rows = []
-                
-                for line in lines[2:]:  # Skip header and separator
-                    if not line.strip() or '... (showing' in line:  # Skip empty lines and truncation message
-                        continue
-                    values = line.split('\t')
-                    if len(values) >= len(headers):
-                        row = {}
-                        for i, header in enumerate(headers):
-                            row[header.strip()] = values[i].strip() if i < len(values) else None
-                        rows.append(row)
+            
+            return jsonify({
+                "success": True,
+                "type": "query",
+                "columns": result.columns,
+                "rows": result.records(),
+                "rowcount": result.rowcount,
+                "truncated": result.truncated,
+                "truncation_message": result.truncation_message,
+                "cached": result.cached
+            })
+            
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), _query_error_status(e)
+        except Exception as e:
+            logger.error(f"Error executing custom query: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/postgres/query/stream', methods=['POST'])
+    def stream_query():
+        """
+        Endpoint to stream the rows of a SELECT query as NDJSON or CSV.
+        
+        Rows are sent in chunks as they come off the server-side cursor and
+        are not limited by MAX_RESULTS.
+        """
+        try:
+            data = request.json
+            query = data.get('query', '')
+            connection_string = data.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+            output_format = data.get('format', 'ndjson').lower()
+            
+            if not query:
+                return jsonify({"success": False, "error": "Query is required"}), 400
                 
-                # Check if result was truncated
-                truncated = False
-                truncation_message = ""
-                for line in lines:
-                    if '... (showing' in line:
-                        truncated = True
-                        truncation_message = line.strip()
-                        break
+            if not connection_string:
+                return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+            
+            if output_format not in ('ndjson', 'csv'):
+                return jsonify({"success": False, "error": "Format must be 'ndjson' or 'csv'"}), 400
+            
+            batch_size = data.get('batch_size')
+            if batch_size is not None:
+                try:
+                    batch_size = _parse_positive_int(batch_size, 'batch_size', get_config()["POSTGRES_FETCH_MAX_BATCH_SIZE"])
+                except ValueError as e:
+                    return jsonify({"success": False, "error": str(e)}), 400
+            
+            # Run the query and read the first batch before sending headers,
+            # so errors still get a proper status code
+            batches = stream_postgres_query(query, connection_string, batch_size)
+            columns = next(batches)
+            
+            if output_format == 'csv':
+                response = Response(_csv_chunks(columns, batches), mimetype='text/csv')
+                response.headers['Content-Disposition'] = 'attachment; filename="query.csv"'
+            else:
+                response = Response(_ndjson_chunks(columns, batches), mimetype='application/x-ndjson')
+            
+            # Ask reverse proxies not to buffer the chunked body
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+            
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), _query_error_status(e)
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/postgres/jobs', methods=['POST'])
+    def submit_job():
+        """Endpoint to run a query asynchronously. Returns a job ID to poll."""
+        try:
+            data = request.json
+            query = data.get('query', '')
+            connection_string = data.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+            
+            if not query:
+                return jsonify({"success": False, "error": "Query is required"}), 400
                 
+            if not connection_string:
+                return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+            
+            job = submit_query_job(query, connection_string)
+            
+            return jsonify({
+                "success": True,
+                "job": job.to_dict()
+            }), 202
+            
+        except JobQueueFullError as e:
+            return jsonify({"success": False, "error": str(e)}), 503
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), _query_error_status(e)
+        except Exception as e:
+            logger.error(f"Error submitting query job: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/postgres/jobs', methods=['GET'])
+    def list_jobs():
+        """Endpoint to list query jobs."""
+        return jsonify({
+            "success": True,
+            "jobs": [job.to_dict() for job in list_query_jobs()]
+        })
+    
+    @app.route('/postgres/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        """Endpoint to poll the status and progress of a query job."""
+        job = get_query_job(job_id)
+        if job is None:
+            return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+        
+        return jsonify({
+            "success": True,
+            "job": job.to_dict()
+        })
+    
+    @app.route('/postgres/jobs/<job_id>/result', methods=['GET'])
+    def get_job_result(job_id):
+        """Endpoint to fetch the result of a finished query job."""
+        job = get_query_job(job_id)
+        if job is None:
+            return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+        
+        if job.status != 'succeeded':
+            return jsonify({
+                "success": False,
+                "error": job.error or f"Job is {job.status}",
+                "job": job.to_dict()
+            }), 409
+        
+        result = job.result
+        if result.is_modification:
+            return jsonify({
+                "success": True,
+                "type": "modification",
+                "affected_rows": result.rowcount,
+                "message": result.to_text()
+            })
+        
+        return jsonify({
+            "success": True,
+            "type": "query",
+            "columns": result.columns,
+            "rows": result.records(),
+            "rowcount": result.rowcount,
+            "truncated": result.truncated,
+            "truncation_message": result.truncation_message
+        })
+    
+    @app.route('/postgres/jobs/<job_id>', methods=['DELETE'])
+    def cancel_job(job_id):
+        """Endpoint to cancel a queued or running query job."""
+        try:
+            job = get_query_job(job_id)
+            if job is None:
+                return jsonify({"success": False, "error": f"Job {job_id} not found"}), 404
+            
+            if not cancel_query_job(job):
                 return jsonify({
-                    "success": True,
-                    "type": "query",
-                    "columns": [h.strip() for h in headers],
-                    "rows": rows,
-                    "truncated": truncated,
-                    "truncation_message": truncation_message
-                })
+                    "success": False,
+                    "error": f"Job already {job.status}",
+                    "job": job.to_dict()
+                }), 409
+            
+            return jsonify({
+                "success": True,
+                "message": "Cancellation requested",
+                "job": job.to_dict()
+            })
             
         except Exception as e:
-            logger.error(f"Error executing custom query: {str(e)}", exc_info=True)
-            return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
+            logger.error(f"Error cancelling query job: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/postgres/explain', methods=['POST'])
+    def explain():
+        """Endpoint to get the execution plan of a query and its most expensive nodes."""
+        try:
+            data = request.json
+            query = data.get('query', '')
+            connection_string = data.get('connection', get_config()["DEFAULT_POSTGRES_CONNECTION"])
+            if not query:
+                return jsonify({"success": False, "error": "Query is required"}), 400
+                
+            if not connection_string:
+                return jsonify({"success": False, "error": "No PostgreSQL connection configured"}), 400
+            
+            # EXPLAIN ANALYZE executes the statement: "false" must not turn it on
+            try:
+                analyze = _parse_flag(data.get('analyze', True), 'analyze')
+                top = _parse_positive_int(data.get('top', 5), 'top', MAX_TOP_NODES)
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            
+            explanation = explain_query(query, connection_string, analyze=analyze, top=top)
+            explanation["success"] = True
+            return jsonify(explanation)
+            
+        except QueryError as e:
+            return jsonify({"success": False, "error": str(e)}), _query_error_status(e)
+        except Exception as e:
+            logger.error(f"Error explaining query: {str(e)}", exc_info=True)
+            return jsonify({"success": False, "error": str(e)}), 500
+    
+    @app.route('/postgres/slow-queries', methods=['GET'])
+    def slow_queries():
+        """Endpoint to list queries that exceeded SLOW_QUERY_THRESHOLD_MS."""
+        limit = request.args.get('limit', type=int)
+        return jsonify({
+            "success": True,
+            "log": get_slow_query_stats(),
+            "queries": get_slow_queries(limit)
+        })
+    
+    @app.route('/postgres/slow-queries', methods=['DELETE'])
+    def clear_slow_query_log():
+        """Endpoint to empty the slow query log."""
+        clear_slow_queries()
+        return jsonify({"success": True, "message": "Slow query log cleared"})
@@ -21,6 +21,8 @@ from api.n8n_routes import register_n8n_routes
 from api.health_routes import register_health_routes
 from api.execute_routes import register_execute_routes
 from docker_handler import init_docker_client
+from stats_sampler import start_stats_sampler
+from container_inventory import start_container_inventory
 
 # Configure logging
 logging.basicConfig(
@@ -46,6 +48,10 @@ def create_app():
     # Initialize Docker client
     init_docker_client()
     
+    # Keep the container inventory current and sample container metrics in the background
+    start_container_inventory()
+    start_stats_sampler()
+    
     # Register API routes
     register_health_routes(app)
     register_docker_routes(app)
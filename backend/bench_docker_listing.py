@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Benchmark for container listings of the n8n AI Assistant Pro backend.
+
+Starts a fake Docker Engine API on localhost, then lists its containers the
+old way (high-level containers.list() plus container.image.tags) and through
+docker_handler.list_containers(), counting the daemon calls each one makes.
+
+Usage:
+    python bench_docker_listing.py [--containers N] [--images N] [--latency MS]
+"""
+
+import re
+import json
+import time
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import docker
+from config import setup_config
+import docker_handler
+
+API_VERSION = '1.41'
+
+class FakeDockerAPI:
+    """In-memory containers and images, and a count of the calls made against them."""
+
+    def __init__(self, container_count, image_count, latency):
+        self.latency = latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.images = {
+            f"sha256:{index:064x}": [f"example/image-{index}:latest"]
+            for index in range(image_count)
+        }
+        image_ids = list(self.images)
+        self.containers = [
+            {
+                "Id": f"{index + 1:064x}",
+                "Names": [f"/container-{index}"],
+                "Image": self.images[image_ids[index % image_count]][0],
+                "ImageID": image_ids[index % image_count],
+                "State": "running" if index % 4 else "exited",
+                "Status": "Up 2 hours" if index % 4 else "Exited (0) 1 hour ago",
+            }
+            for index in range(container_count)
+        ]
+
+    def record(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] += 1
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+
+    def container_inspect(self, container_id):
+        for container in self.containers:
+            if container["Id"].startswith(container_id) or container["Names"][0] == f"/{container_id}":
+                return {
+                    "Id": container["Id"],
+                    "Name": container["Names"][0],
+                    "Image": container["ImageID"],
+                    "Config": {"Image": container["Image"]},
+                    "State": {"Status": container["State"], "Running": container["State"] == "running"},
+                }
+        return None
+
+    def image_inspect(self, image_id):
+        image_id = image_id.replace('sha256:', '')
+        for full_id, tags in self.images.items():
+            if full_id.replace('sha256:', '').startswith(image_id):
+                return {"Id": full_id, "RepoTags": tags}
+        return None
+
+def make_handler(api):
+    """Build a request handler class serving the fake API."""
+
+    routes = [
+        (re.compile(r'/containers/json$'), 'containers/json',
+         lambda match: [container for container in api.containers]),
+        (re.compile(r'/containers/([^/]+)/json$'), 'containers/inspect',
+         lambda match: api.container_inspect(match.group(1))),
+        (re.compile(r'/images/json$'), 'images/json',
+         lambda match: [{"Id": image_id, "RepoTags": tags} for image_id, tags in api.images.items()]),
+        (re.compile(r'/images/(.+)/json$'), 'images/inspect',
+         lambda match: api.image_inspect(match.group(1))),
+        (re.compile(r'/_ping$'), '_ping', lambda match: 'OK'),
+        (re.compile(r'/version$'), 'version', lambda match: {"ApiVersion": API_VERSION, "Version": "fake"}),
+    ]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are written separately; without this every call waits on a delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            path = re.sub(r'^/v[\d.]+', '', path)
+            for pattern, endpoint, respond in routes:
+                match = pattern.match(path)
+                if match:
+                    api.record(endpoint)
+                    time.sleep(api.latency)
+                    body = respond(match)
+                    self._send(404 if body is None else 200, body or {"message": "not found"})
+                    return
+            api.record(f"unhandled {path}")
+            self._send(404, {"message": f"unhandled {path}"})
+
+        def _send(self, status, body):
+            payload = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def old_listing(client):
+    """The listing as /test-docker and 'ps' built it before."""
+    return [
+        {
+            "id": container.short_id,
+            "name": container.name,
+            "image": container.image.tags[0] if container.image.tags else 'none',
+            "status": container.status,
+        }
+        for container in client.containers.list(all=True)
+    ]
+
+def run(label, api, listing):
+    """Time one listing and report the daemon calls it made."""
+    api.reset()
+    start = time.perf_counter()
+    containers = listing()
+    elapsed = time.perf_counter() - start
+    calls = dict(api.calls)
+    print(f"{label}: {len(containers)} containers, {sum(calls.values())} daemon calls, {elapsed * 1000:.1f} ms")
+    for endpoint, count in sorted(calls.items()):
+        print(f"    {endpoint}: {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--containers', type=int, default=40)
+    parser.add_argument('--images', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=2.0, help="Simulated daemon latency per call, in ms")
+    args = parser.parse_args()
+
+    api = FakeDockerAPI(args.containers, args.images, args.latency / 1000)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(api))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"tcp://127.0.0.1:{server.server_address[1]}"
+
+    setup_config()
+    client = docker.DockerClient(base_url=host, version=API_VERSION)
+    # Create the cached client up front, so its version negotiation is not counted
+    docker_handler.get_docker_client(host)
+
+    try:
+        run("containers.list() + image.tags", api, lambda: old_listing(client))
+        run("list_containers() (cold image cache)", api, lambda: docker_handler.list_containers(host))
+        run("list_containers() (warm image cache)", api, lambda: docker_handler.list_containers(host))
+    finally:
+        client.close()
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,80 @@ def setup_config():
     global CONFIG
     CONFIG = {
         "DEFAULT_POSTGRES_CONNECTION": os.getenv("DEFAULT_POSTGRES_CONNECTION", ""),
+        "POSTGRES_READ_REPLICA_CONNECTION": os.getenv("POSTGRES_READ_REPLICA_CONNECTION", ""),
         "DEFAULT_DOCKER_HOST": os.getenv("DEFAULT_DOCKER_HOST", "unix:///var/run/docker.sock"),
+        "DOCKER_CLIENT_CACHE_SIZE": int(os.getenv("DOCKER_CLIENT_CACHE_SIZE", "8")),
+        "DOCKER_CLIENT_IDLE_TIMEOUT": int(os.getenv("DOCKER_CLIENT_IDLE_TIMEOUT", "600")),
+        "DOCKER_CLIENT_HEALTH_CHECK_INTERVAL": int(os.getenv("DOCKER_CLIENT_HEALTH_CHECK_INTERVAL", "30")),
+        "DOCKER_IMAGE_CACHE_TTL": int(os.getenv("DOCKER_IMAGE_CACHE_TTL", "60")),
+        "DOCKER_STATS_WORKERS": int(os.getenv("DOCKER_STATS_WORKERS", "8")),
+        "DOCKER_STATS_TIMEOUT": int(os.getenv("DOCKER_STATS_TIMEOUT", "5")),
+        "DOCKER_STATS_SAMPLER_ENABLED": os.getenv("DOCKER_STATS_SAMPLER_ENABLED", "1") == "1",
+        "DOCKER_STATS_SAMPLE_INTERVAL": int(os.getenv("DOCKER_STATS_SAMPLE_INTERVAL", "5")),
+        "DOCKER_STATS_HISTORY_SIZE": int(os.getenv("DOCKER_STATS_HISTORY_SIZE", "720")),
+        "DOCKER_STATS_RESCAN_INTERVAL": int(os.getenv("DOCKER_STATS_RESCAN_INTERVAL", "15")),
+        "DOCKER_STATS_SAMPLER_MAX_CONTAINERS": int(os.getenv("DOCKER_STATS_SAMPLER_MAX_CONTAINERS", "50")),
+        "DOCKER_EXEC_MAX_OUTPUT_BYTES": int(os.getenv("DOCKER_EXEC_MAX_OUTPUT_BYTES", str(10 * 1024 * 1024))),
+        "DOCKER_FLEET_WORKERS": int(os.getenv("DOCKER_FLEET_WORKERS", "16")),
+        "DOCKER_FLEET_HOST_TIMEOUT": int(os.getenv("DOCKER_FLEET_HOST_TIMEOUT", "10")),
+        "DOCKER_FLEET_STATS_WORKERS_PER_HOST": int(os.getenv("DOCKER_FLEET_STATS_WORKERS_PER_HOST", "32")),
+        "DOCKER_LOG_STREAM_MAX_ACTIVE": int(os.getenv("DOCKER_LOG_STREAM_MAX_ACTIVE", "20")),
+        "DOCKER_LOG_STREAM_QUEUE_SIZE": int(os.getenv("DOCKER_LOG_STREAM_QUEUE_SIZE", "1000")),
+        "DOCKER_LOG_STREAM_HEARTBEAT": int(os.getenv("DOCKER_LOG_STREAM_HEARTBEAT", "15")),
+        "DOCKER_LOG_STREAM_MAX_DURATION": int(os.getenv("DOCKER_LOG_STREAM_MAX_DURATION", "3600")),
+        "DOCKER_INVENTORY_ENABLED": os.getenv("DOCKER_INVENTORY_ENABLED", "1") == "1",
+        "DOCKER_INVENTORY_MAX_BACKOFF": int(os.getenv("DOCKER_INVENTORY_MAX_BACKOFF", "30")),
         "COMMAND_TIMEOUT": int(os.getenv("COMMAND_TIMEOUT", "30")),
+        "COMMAND_MAX_CONCURRENT": int(os.getenv("COMMAND_MAX_CONCURRENT", "4")),
+        "COMMAND_QUEUE_TIMEOUT": int(os.getenv("COMMAND_QUEUE_TIMEOUT", "10")),
+        "COMMAND_MAX_OUTPUT_BYTES": int(os.getenv("COMMAND_MAX_OUTPUT_BYTES", str(1024 * 1024))),
         "MAX_RESULTS": int(os.getenv("MAX_RESULTS", "1000")),
+        "POSTGRES_STREAM_RESULTS": os.getenv("POSTGRES_STREAM_RESULTS", "1") == "1",
+        "POSTGRES_FETCH_BATCH_SIZE": int(os.getenv("POSTGRES_FETCH_BATCH_SIZE", "500")),
+        "POSTGRES_FETCH_MAX_BATCH_SIZE": int(os.getenv("POSTGRES_FETCH_MAX_BATCH_SIZE", "10000")),
+        "POSTGRES_EXACT_COUNT_BUDGET": int(os.getenv("POSTGRES_EXACT_COUNT_BUDGET", "10")),
+        "SCHEMA_CACHE_SIZE": int(os.getenv("SCHEMA_CACHE_SIZE", "32")),
+        "SCHEMA_CACHE_TTL": int(os.getenv("SCHEMA_CACHE_TTL", "600")),
+        "SCHEMA_CACHE_CHECK_INTERVAL": int(os.getenv("SCHEMA_CACHE_CHECK_INTERVAL", "5")),
+        "QUERY_CACHE_ENABLED": os.getenv("QUERY_CACHE_ENABLED", "1") == "1",
+        "QUERY_CACHE_TTL": int(os.getenv("QUERY_CACHE_TTL", "30")),
+        "QUERY_CACHE_MAX_BYTES": int(os.getenv("QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        "QUERY_JOB_WORKERS": int(os.getenv("QUERY_JOB_WORKERS", "2")),
+        "QUERY_JOB_MAX_PENDING": int(os.getenv("QUERY_JOB_MAX_PENDING", "20")),
+        "QUERY_JOB_TIMEOUT": int(os.getenv("QUERY_JOB_TIMEOUT", "900")),
+        "QUERY_JOB_RETENTION": int(os.getenv("QUERY_JOB_RETENTION", "3600")),
+        "SLOW_QUERY_THRESHOLD_MS": int(os.getenv("SLOW_QUERY_THRESHOLD_MS", "1000")),
+        "SLOW_QUERY_LOG_SIZE": int(os.getenv("SLOW_QUERY_LOG_SIZE", "200")),
+        "POSTGRES_POOL_MAX_SIZE": int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+        "POSTGRES_POOL_IDLE_TIMEOUT": int(os.getenv("POSTGRES_POOL_IDLE_TIMEOUT", "300")),
+        "POSTGRES_POOL_ACQUIRE_TIMEOUT": int(os.getenv("POSTGRES_POOL_ACQUIRE_TIMEOUT", "10")),
+        "POSTGRES_POOL_MAX_POOLS": int(os.getenv("POSTGRES_POOL_MAX_POOLS", "8")),
+        "POSTGRES_POOL_HEALTH_CHECK_INTERVAL": int(os.getenv("POSTGRES_POOL_HEALTH_CHECK_INTERVAL", "30")),
+        "N8N_CONTAINERS": os.getenv("N8N_CONTAINERS", "main:n8n,worker:n8n-worker*,webhook:n8n-webhook*"),
+        "N8N_STATUS_MAX_LOG_LINES": int(os.getenv("N8N_STATUS_MAX_LOG_LINES", "500")),
+        "N8N_DB_SCHEMA": os.getenv("N8N_DB_SCHEMA", "public"),
+        "N8N_TABLE_PREFIX": os.getenv("N8N_TABLE_PREFIX", ""),
+        "N8N_EXECUTION_STATS_BATCH_SIZE": int(os.getenv("N8N_EXECUTION_STATS_BATCH_SIZE", "5000")),
+        "N8N_EXECUTION_STATS_MAX_ROWS": int(os.getenv("N8N_EXECUTION_STATS_MAX_ROWS", "200000")),
+        "N8N_EXECUTION_STATS_REFRESH_INTERVAL": int(os.getenv("N8N_EXECUTION_STATS_REFRESH_INTERVAL", "30")),
+        "N8N_EXECUTION_STATS_GAP_WINDOW": int(os.getenv("N8N_EXECUTION_STATS_GAP_WINDOW", "300")),
+        "N8N_EXECUTION_STATS_MAX_PENDING": int(os.getenv("N8N_EXECUTION_STATS_MAX_PENDING", "10000")),
+        "N8N_EXECUTION_STATS_DB": os.getenv("N8N_EXECUTION_STATS_DB", ""),
+        "N8N_PRUNE_BATCH_SIZE": int(os.getenv("N8N_PRUNE_BATCH_SIZE", "1000")),
+        "N8N_PRUNE_MIN_BATCH_SIZE": int(os.getenv("N8N_PRUNE_MIN_BATCH_SIZE", "100")),
+        "N8N_PRUNE_MAX_BATCH_SIZE": int(os.getenv("N8N_PRUNE_MAX_BATCH_SIZE", "10000")),
+        "N8N_PRUNE_TARGET_BATCH_MS": int(os.getenv("N8N_PRUNE_TARGET_BATCH_MS", "500")),
+        "N8N_PRUNE_SLEEP_MS": int(os.getenv("N8N_PRUNE_SLEEP_MS", "250")),
+        "N8N_WORKFLOW_INDEX_REFRESH_INTERVAL": int(os.getenv("N8N_WORKFLOW_INDEX_REFRESH_INTERVAL", "60")),
+        "N8N_WORKFLOW_INDEX_LOOKBACK": int(os.getenv("N8N_WORKFLOW_INDEX_LOOKBACK", "60")),
+        "N8N_WORKFLOW_INDEX_BATCH_SIZE": int(os.getenv("N8N_WORKFLOW_INDEX_BATCH_SIZE", "200")),
+        "N8N_CHANGE_FEED_CHANNEL": os.getenv("N8N_CHANGE_FEED_CHANNEL", "n8n_execution_changes"),
+        "N8N_CHANGE_FEED_MAX_SUBSCRIBERS": int(os.getenv("N8N_CHANGE_FEED_MAX_SUBSCRIBERS", "50")),
+        "N8N_CHANGE_FEED_QUEUE_SIZE": int(os.getenv("N8N_CHANGE_FEED_QUEUE_SIZE", "1000")),
+        "N8N_CHANGE_FEED_HEARTBEAT": int(os.getenv("N8N_CHANGE_FEED_HEARTBEAT", "15")),
+        "N8N_CHANGE_FEED_MAX_DURATION": int(os.getenv("N8N_CHANGE_FEED_MAX_DURATION", "3600")),
+        "N8N_CHANGE_FEED_IDLE_TIMEOUT": int(os.getenv("N8N_CHANGE_FEED_IDLE_TIMEOUT", "60")),
+        "N8N_CHANGE_FEED_MAX_BACKOFF": int(os.getenv("N8N_CHANGE_FEED_MAX_BACKOFF", "30")),
         "DEBUG": os.getenv("FLASK_DEBUG", "0") == "1"
     }
 
@@ -0,0 +1,237 @@
+"""
+Bounded subprocess execution for the n8n AI Assistant Pro backend.
+
+Commands run from argument lists (never through a shell), their output is
+read incrementally up to a byte cap, the number of concurrent commands is
+limited, and commands that time out are killed with their process group.
+"""
+
+import os
+import time
+import shlex
+import signal
+import logging
+import selectors
+import threading
+import subprocess
+from config import get_config
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Shell syntax that used to work through shell=True and is now refused
+_SHELL_OPERATORS = frozenset(['|', '||', '&', '&&', ';', '>', '>>', '<', '<<', '2>', '2>&1', '&>'])
+
+# Seconds between SIGTERM and SIGKILL when stopping a process group
+_KILL_GRACE = 2
+
+# Module-level variables
+_slots = None
+_slots_lock = threading.Lock()
+_metrics = {}  # command name -> counters
+_metrics_lock = threading.Lock()
+
+class CommandError(Exception):
+    """Raised when a command cannot be run at all."""
+
+class CommandBusyError(CommandError):
+    """Raised when COMMAND_MAX_CONCURRENT commands are already running."""
+
+class CommandResult:
+    """Outcome of one command."""
+
+    def __init__(self, args, returncode, stdout, stderr, duration, timed_out=False, truncated=False):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+        self.truncated = truncated
+
+    def to_text(self, timeout=None):
+        """Render the result for the chat-style command output."""
+        output = self.stdout.decode('utf-8', errors='replace')
+        errors = self.stderr.decode('utf-8', errors='replace')
+
+        if self.timed_out:
+            text = f"Error: Command exceeded the time limit of {timeout} seconds"
+            if output:
+                text += f"\nPartial output:\n{output}"
+        elif self.returncode != 0 and not self.truncated:
+            text = f"Error: Command exited with status {self.returncode}"
+            if errors or output:
+                text += f"\n{errors or output}"
+        else:
+            text = output
+
+        if self.truncated:
+            text += f"\n... Output truncated at {get_config()['COMMAND_MAX_OUTPUT_BYTES']} bytes ..."
+        return text
+
+def _get_slots():
+    """Create the semaphore bounding concurrent commands on first use."""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(get_config()["COMMAND_MAX_CONCURRENT"])
+        return _slots
+
+def parse_command(command):
+    """
+    Split a command line into arguments without involving a shell.
+
+    Raises:
+        CommandError: If the line is malformed or uses shell operators
+    """
+    try:
+        args = shlex.split(command)
+    except ValueError as e:
+        raise CommandError(f"Could not parse command: {str(e)}") from e
+    operators = [arg for arg in args if arg in _SHELL_OPERATORS]
+    if operators:
+        raise CommandError(f"Shell operators are not supported: {' '.join(operators)}")
+    return args
+
+def _command_name(args):
+    """Metrics key: the program and its subcommand, e.g. 'docker inspect'."""
+    name = os.path.basename(args[0])
+    subcommand = next((arg for arg in args[1:] if not arg.startswith('-')), None)
+    return f"{name} {subcommand}" if subcommand else name
+
+def _record(args, result):
+    """Add a finished command to the metrics."""
+    name = _command_name(args)
+    with _metrics_lock:
+        metrics = _metrics.setdefault(name, {
+            "count": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "truncated": 0,
+            "total_duration": 0.0,
+            "max_duration": 0.0,
+        })
+        metrics["count"] += 1
+        # Timed out and truncated commands are stopped by us, not failures of their own
+        metrics["failures"] += 1 if result.returncode != 0 and not (result.timed_out or result.truncated) else 0
+        metrics["timeouts"] += 1 if result.timed_out else 0
+        metrics["truncated"] += 1 if result.truncated else 0
+        metrics["total_duration"] += result.duration
+        metrics["max_duration"] = max(metrics["max_duration"], result.duration)
+
+def _kill_group(process):
+    """Terminate a process and everything it started, escalating to SIGKILL."""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(timeout=_KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+def run_command(args, timeout=None, max_bytes=None, on_output=None, env=None):
+    """
+    Run a command and collect its output incrementally.
+
+    Args:
+        args: Argument list; args[0] is the program
+        timeout: Seconds before the process group is killed (default COMMAND_TIMEOUT)
+        max_bytes: Combined stdout/stderr cap (default COMMAND_MAX_OUTPUT_BYTES);
+            the process is stopped once it is exceeded
+        on_output: Optional callback(stream_name, chunk) called as output arrives
+        env: Extra environment variables for the command
+
+    Returns:
+        CommandResult
+
+    Raises:
+        CommandBusyError: If no slot frees up within COMMAND_QUEUE_TIMEOUT
+        CommandError: If the program cannot be started
+    """
+    config = get_config()
+    timeout = config["COMMAND_TIMEOUT"] if timeout is None else timeout
+    max_bytes = config["COMMAND_MAX_OUTPUT_BYTES"] if max_bytes is None else max_bytes
+
+    slots = _get_slots()
+    if not slots.acquire(timeout=config["COMMAND_QUEUE_TIMEOUT"]):
+        raise CommandBusyError(
+            f"Too many commands running ({config['COMMAND_MAX_CONCURRENT']}), try again later"
+        )
+
+    try:
+        start_time = time.monotonic()
+        try:
+            # Own session, so a timeout can kill the whole process group
+            process = subprocess.Popen(
+                args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                env=dict(os.environ, **env) if env else None, start_new_session=True
+            )
+        except OSError as e:
+            raise CommandError(f"Could not start {args[0]}: {str(e)}") from e
+
+        output = {'stdout': bytearray(), 'stderr': bytearray()}
+        collected = 0
+        timed_out = False
+        truncated = False
+        deadline = start_time + timeout
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ, 'stdout')
+            selector.register(process.stderr, selectors.EVENT_READ, 'stderr')
+
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                for key, _ in selector.select(timeout=remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    room = max_bytes - collected
+                    if len(chunk) > room:
+                        chunk = chunk[:room]
+                        truncated = True
+                    output[key.data] += chunk
+                    collected += len(chunk)
+                    if chunk and on_output is not None:
+                        on_output(key.data, bytes(chunk))
+                if truncated:
+                    break
+
+        if timed_out or truncated:
+            _kill_group(process)
+        try:
+            returncode = process.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            # Closed stdout and stderr but kept running
+            timed_out = True
+            _kill_group(process)
+            returncode = process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+        result = CommandResult(
+            args, returncode, bytes(output['stdout']), bytes(output['stderr']),
+            time.monotonic() - start_time, timed_out=timed_out, truncated=truncated
+        )
+    finally:
+        slots.release()
+
+    _record(args, result)
+    if timed_out:
+        logger.warning(f"Command {_command_name(args)} timed out after {timeout}s")
+    return result
+
+def get_command_metrics():
+    """Return per-command counters, with average durations."""
+    with _metrics_lock:
+        metrics = {name: dict(counters) for name, counters in _metrics.items()}
+    for counters in metrics.values():
+        counters["avg_duration"] = counters["total_duration"] / counters["count"]
+    return metrics
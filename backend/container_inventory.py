@@ -0,0 +1,234 @@
+"""
+Event-driven container inventory for the n8n AI Assistant Pro backend.
+
+The containers of the default Docker host are listed once and then kept
+current from the daemon's event stream, so handlers that need names,
+status or health read them from memory instead of querying the daemon.
+"""
+
+import time
+import logging
+import threading
+import docker
+from config import get_config
+from docker_handler import list_containers
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Container events that set the status outright
+_STATUS_BY_ACTION = {
+    'create': 'created',
+    'start': 'running',
+    'restart': 'running',
+    'unpause': 'running',
+    'pause': 'paused',
+    'die': 'exited',
+}
+
+# Module-level variables
+_inventory = None
+_inventory_lock = threading.Lock()
+
+class ContainerInventory:
+    """In-memory view of one Docker host's containers, kept current by its event stream."""
+
+    def __init__(self, docker_host, max_backoff):
+        self.docker_host = docker_host
+        self.max_backoff = max_backoff
+        self._containers = {}  # container id -> record, as returned by list_containers()
+        self._lock = threading.Lock()
+        self._synced = False
+        self._last_error = None
+        self._last_sync = None
+        self._stats = {"syncs": 0, "events": 0, "disconnects": 0}
+        self._client = None
+        self._events = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the watcher thread."""
+        self._thread = threading.Thread(target=self._watch, name="container-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching; closing the event stream unblocks the watcher."""
+        self._stop.set()
+        self._close_connection()
+
+    def _close_connection(self):
+        """Close the event stream and the inventory's client."""
+        events, self._events = self._events, None
+        client, self._client = self._client, None
+        for resource in (events, client):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+
+    def _watch(self):
+        """Subscribe, resync and apply events; reconnect with backoff after a disconnect."""
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                # Own client: the event stream holds its connection for good
+                self._client = docker.DockerClient(base_url=self.docker_host)
+                # Subscribe before listing, so changes made during the listing
+                # are replayed afterwards instead of lost
+                self._events = self._client.api.events(decode=True, filters={"type": "container"})
+                self._resync()
+                backoff = 1
+
+                for event in self._events:
+                    self._apply(event)
+
+                if self._stop.is_set():
+                    break
+                raise ConnectionError("Docker event stream ended")
+
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                with self._lock:
+                    self._synced = False
+                    self._last_error = str(e)
+                    self._stats["disconnects"] += 1
+                logger.warning(f"Container inventory lost the Docker event stream: {str(e)}; resyncing in {backoff}s")
+                self._close_connection()
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _resync(self):
+        """Replace the inventory with a full listing."""
+        containers = list_containers(self.docker_host, all=True, client=self._client)
+        with self._lock:
+            self._containers = {container["id"]: container for container in containers}
+            self._synced = True
+            self._last_error = None
+            self._last_sync = time.time()
+            self._stats["syncs"] += 1
+        logger.info(f"Container inventory synced: {len(containers)} containers on {self.docker_host}")
+
+    def _apply(self, event):
+        """Update the inventory from one container event."""
+        action = event.get("Action") or event.get("status") or ''
+        actor = event.get("Actor", {})
+        container_id = actor.get("ID") or event.get("id")
+        attributes = actor.get("Attributes", {})
+        if not container_id or action.startswith('exec_'):
+            return
+
+        with self._lock:
+            self._stats["events"] += 1
+
+            if action == 'destroy':
+                self._containers.pop(container_id, None)
+                return
+
+            record = self._containers.get(container_id)
+            if record is None:
+                record = self._containers[container_id] = {
+                    "id": container_id,
+                    "short_id": container_id[:12],
+                    "name": attributes.get("name", container_id[:12]),
+                    "image": attributes.get("image", 'none'),
+                    "status": 'created',
+                    "status_text": '',
+                    "health": None,
+                }
+
+            if action in _STATUS_BY_ACTION:
+                record["status"] = _STATUS_BY_ACTION[action]
+                record["status_text"] = ''
+                if action == 'start' and record["health"] is not None:
+                    # Health checks start over with the container
+                    record["health"] = 'starting'
+            elif action.startswith('health_status'):
+                # "health_status: healthy"
+                record["health"] = action.partition(':')[2].strip() or None
+            elif action == 'rename':
+                record["name"] = attributes.get("name", record["name"]).lstrip('/')
+
+    def is_synced(self):
+        """Whether the inventory is connected and current."""
+        with self._lock:
+            return self._synced
+
+    def containers(self):
+        """Return copies of every container record, or None while not synced."""
+        with self._lock:
+            if not self._synced:
+                return None
+            return [dict(record) for record in self._containers.values()]
+
+    def status(self):
+        """Describe the inventory for health checks and API responses."""
+        with self._lock:
+            return {
+                "docker_host": self.docker_host,
+                "synced": self._synced,
+                "containers": len(self._containers),
+                "last_sync": self._last_sync,
+                "last_error": self._last_error,
+                **self._stats,
+            }
+
+def start_container_inventory():
+    """Start the inventory for the default Docker host, if enabled."""
+    global _inventory
+    config = get_config()
+    if not config["DOCKER_INVENTORY_ENABLED"]:
+        return None
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = ContainerInventory(config["DEFAULT_DOCKER_HOST"], config["DOCKER_INVENTORY_MAX_BACKOFF"])
+            _inventory.start()
+        return _inventory
+
+def stop_container_inventory():
+    """Stop the inventory if it is running."""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is not None:
+            _inventory.stop()
+            _inventory = None
+
+def get_container_inventory(docker_host=None):
+    """Get the inventory covering a Docker host, or None."""
+    inventory = _inventory
+    if inventory is None or (docker_host or get_config()["DEFAULT_DOCKER_HOST"]) != inventory.docker_host:
+        return None
+    return inventory
+
+def get_containers(docker_host=None):
+    """
+    Get every container of a host, from the inventory when it covers the host.
+
+    Falls back to a single daemon listing for other hosts, or while the
+    inventory is resyncing.
+
+    Returns:
+        List of dicts with id, short_id, name, image, status, status_text and health
+    """
+    inventory = get_container_inventory(docker_host)
+    if inventory is not None:
+        containers = inventory.containers()
+        if containers is not None:
+            return containers
+    return list_containers(docker_host, all=True)
+
+def find_container(name, docker_host=None):
+    """Get a container record by name, or None if there is no such container."""
+    for container in get_containers(docker_host):
+        if container["name"] == name:
+            return container
+    return None
+
+def get_container_names(docker_host=None):
+    """Get a list of container names from Docker."""
+    try:
+        return [container["name"] for container in get_containers(docker_host)]
+    except Exception as e:
+        logger.error(f"Error getting container names: {str(e)}")
+        return []
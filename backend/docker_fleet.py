@@ -0,0 +1,210 @@
+"""
+Multi-host Docker queries for the n8n AI Assistant Pro backend.
+
+n8n queue-mode workers can be spread over several Docker hosts. The same
+query runs on every host concurrently, each with its own deadline, and the
+results are merged into one table with a host column. Hosts that fail or
+time out are reported next to the rows of the others.
+"""
+
+import time
+import logging
+import threading
+import docker
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import get_config
+from docker_handler import (
+    get_fleet_client, execute_docker_command, list_containers, list_images, collect_container_stats,
+    format_container_row, format_image_row, format_stats_row, PS_HEADER, IMAGES_HEADER, STATS_HEADER
+)
+from docker_logs import search_logs
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+FLEET_COMMANDS = ('ps', 'stats', 'images')
+
+# Module-level variables
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Create the fleet executor on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_config()["DOCKER_FLEET_WORKERS"],
+                thread_name_prefix="docker-fleet"
+            )
+        return _executor
+
+def _timed(query, host, deadline):
+    """
+    Run a per-host query and measure it (runs on the fleet executor).
+
+    The query gets the host's fleet client, whose socket timeout is
+    DOCKER_FLEET_HOST_TIMEOUT: a host that stops answering frees the worker
+    soon after query_hosts() has given up on it.
+    """
+    start_time = time.monotonic()
+    if start_time >= deadline:
+        raise TimeoutError("fleet deadline passed before the query started")
+    rows = query(host, get_fleet_client(host))
+    return rows, time.monotonic() - start_time
+
+def query_hosts(hosts, query, timeout=None):
+    """
+    Run a query on several Docker hosts concurrently.
+
+    All hosts share one deadline, so the total latency is that of the
+    slowest host, capped at the timeout, rather than the sum of all hosts.
+
+    Args:
+        hosts: Docker host URLs
+        query: Callable(host, client) returning a list of row dicts
+        timeout: Per-host deadline in seconds (default DOCKER_FLEET_HOST_TIMEOUT)
+
+    Returns:
+        (rows, host_results): rows from every host that answered, each with
+        a "host" key, and one {"host", "status", "rows", "duration", "error"}
+        per host, status being 'ok', 'error' or 'timeout'
+    """
+    if timeout is None:
+        timeout = get_config()["DOCKER_FLEET_HOST_TIMEOUT"]
+
+    deadline = time.monotonic() + timeout
+    executor = _get_executor()
+    futures = [executor.submit(_timed, query, host, deadline) for host in hosts]
+    wait(futures, timeout=timeout)
+
+    rows = []
+    host_results = []
+    for host, future in zip(hosts, futures):
+        result = {"host": host, "status": 'ok', "rows": 0, "duration": None, "error": None}
+        if not future.done():
+            # Still waiting on the daemon: the client timeout ends the thread soon
+            future.cancel()
+            result.update(status='timeout', error=f"timed out after {timeout}s")
+        elif future.exception() is not None:
+            result.update(status='error', error=str(future.exception()))
+        else:
+            host_rows, duration = future.result()
+            rows.extend(dict(row, host=host) for row in host_rows)
+            result.update(rows=len(host_rows), duration=duration)
+        host_results.append(result)
+
+    failed = [result["host"] for result in host_results if result["status"] != 'ok']
+    if failed:
+        logger.warning(f"Fleet query incomplete, no answer from: {', '.join(failed)}")
+    return rows, host_results
+
+def fleet_ps(hosts, all=True, timeout=None):
+    """List containers on several hosts. See query_hosts() for the return value."""
+    return query_hosts(hosts, lambda host, client: list_containers(host, all=all, client=client), timeout)
+
+def fleet_images(hosts, timeout=None):
+    """List images on several hosts. See query_hosts() for the return value."""
+    return query_hosts(hosts, lambda host, client: list_images(host, client=client), timeout)
+
+def _host_stats(host, client):
+    """
+    Stats of the running containers of one host.
+
+    Each host gets a stats pool of its own: through the shared one, fleet
+    latency would grow with the containers of all hosts together rather than
+    with the slowest host.
+    """
+    containers = list_containers(host, all=False, client=client)
+    workers = min(len(containers), get_config()["DOCKER_FLEET_STATS_WORKERS_PER_HOST"])
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="docker-fleet-stats")
+    try:
+        return collect_container_stats(client, containers, docker_host=host, executor=executor)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fleet_stats(hosts, timeout=None):
+    """Container stats on several hosts. See query_hosts() for the return value."""
+    return query_hosts(hosts, _host_stats, timeout)
+
+def fleet_search_logs(hosts, container_name, timeout=None, **search_options):
+    """
+    Search a container's log on every host that has a container of that name.
+
+    Hosts without the container are reported as 'ok' with no rows.
+
+    Args:
+        hosts: Docker host URLs
+        container_name: Container name
+        timeout: Per-host deadline in seconds
+        **search_options: Passed to docker_logs.search_logs()
+
+    Returns:
+        See query_hosts(); rows are the matches, and each host result also
+        carries the cursor and truncated flag of its search
+    """
+    searches = {}
+
+    def search(host, client):
+        try:
+            container = client.containers.get(container_name)
+        except docker.errors.NotFound:
+            return []
+        result = search_logs(container, **search_options)
+        searches[host] = result
+        return result["matches"]
+
+    rows, host_results = query_hosts(hosts, search, timeout)
+    for host_result in host_results:
+        found = searches.get(host_result["host"])
+        if found is not None:
+            host_result.update(cursor=found["cursor"], truncated=found["truncated"])
+    return rows, host_results
+
+def _format_fleet_table(header, rows, host_results, format_row):
+    """Render merged rows with a leading HOST column, then the hosts that did not answer."""
+    result = "HOST\t" + header
+    for row in rows:
+        result += f"{row['host']}\t{format_row(row)}"
+    for host_result in host_results:
+        if host_result["status"] != 'ok':
+            result += f"\n[{host_result['host']}: {host_result['status']} - {host_result['error']}]"
+    return result
+
+def execute_fleet_command(command, hosts):
+    """
+    Execute a listing command (ps, stats, images) on several Docker hosts.
+
+    Returns:
+        One merged text table with a HOST column
+    """
+    if command.startswith('docker '):
+        command = command[7:]
+
+    if command.startswith('ps'):
+        rows, host_results = fleet_ps(hosts, all='-a' in command)
+        return _format_fleet_table(PS_HEADER, rows, host_results, format_container_row)
+    if command.startswith('stats'):
+        rows, host_results = fleet_stats(hosts)
+        return _format_fleet_table(STATS_HEADER, rows, host_results, format_stats_row)
+    if command.startswith('images'):
+        rows, host_results = fleet_images(hosts)
+        return _format_fleet_table(IMAGES_HEADER, rows, host_results, format_image_row)
+
+    return f"Error: only {', '.join(FLEET_COMMANDS)} can run on several Docker hosts at once"
+
+def run_docker_command(command, docker_host=None):
+    """
+    Execute a Docker command on one host, or on each of a list of hosts.
+
+    Args:
+        command: Docker command to execute
+        docker_host: URL of the Docker host, or a list of URLs (optional)
+
+    Returns:
+        Result of the command execution
+    """
+    if isinstance(docker_host, (list, tuple)):
+        if len(docker_host) <= 1:
+            return execute_docker_command(command, docker_host[0] if docker_host else None)
+        return execute_fleet_command(command, list(docker_host))
+    return execute_docker_command(command, docker_host)
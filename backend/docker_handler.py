@@ -3,55 +3,467 @@ Docker interaction functionality for the n8n AI Assistant Pro backend.
 """
 
 import docker
-import subprocess
 import time
+import codecs
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from config import get_config
+from stats_sampler import compute_container_stats, get_latest_stats
+from command_runner import run_command, parse_command, CommandError
 
 # Module-level variables
 docker_client = None
 logger = logging.getLogger("n8n_ai_assistant_api")
 
+# Per-host client caches, least recently used first: one for ordinary
+# requests and one for fleet queries, whose clients have a socket timeout
+_client_cache = OrderedDict()  # host -> {"client", "last_used", "last_checked"}
+_fleet_client_cache = OrderedDict()
+_client_cache_lock = threading.Lock()
+_client_cache_stats = {
+    "hits": 0,
+    "creations": 0,
+    "evictions": 0,
+    "idle_evictions": 0,
+    "failed_health_checks": 0,
+}
+_fleet_client_cache_stats = dict(_client_cache_stats)
+
+# Table headers of the listing commands
+PS_HEADER = "CONTAINER ID\tIMAGE\t\tSTATUS\t\tNAMES\n"
+IMAGES_HEADER = "REPOSITORY\tTAG\t\tIMAGE ID\t\tCREATED\t\tSIZE\n"
+STATS_HEADER = "CONTAINER\tCPU %\tMEM USAGE / LIMIT\tMEM %\tNET I/O\tBLOCK I/O\n"
+
+# Image ID -> tags, per host, refreshed with a single image listing
+_image_tags_cache = {}  # host -> {"tags": {image_id: [tags]}, "loaded_at"}
+_image_tags_cache_lock = threading.Lock()
+
+# Shared pool for per-container stats calls, created on first use
+_stats_executor = None
+_stats_executor_lock = threading.Lock()
+
 def init_docker_client():
     """Initialize the global Docker client."""
     global docker_client
     config = get_config()
     
     try:
-        docker_client = docker.DockerClient(base_url=config["DEFAULT_DOCKER_HOST"])
+        docker_client = get_docker_client()
         logger.info(f"Docker client initialized with host: {config['DEFAULT_DOCKER_HOST']}")
     except Exception as e:
         docker_client = None
         logger.warning(f"Could not initialize Docker client: {str(e)}")
 
+def _close_client(client, host):
+    """Close a client's connection pool, ignoring errors."""
+    try:
+        client.close()
+    except Exception as e:
+        logger.debug(f"Error closing Docker client for {host}: {str(e)}")
+
+def _evict_idle_clients(cache, stats, now, idle_timeout):
+    """Remove clients unused for longer than idle_timeout. Caller holds the lock."""
+    evicted = []
+    for host, entry in list(cache.items()):
+        if now - entry["last_used"] > idle_timeout:
+            del cache[host]
+            stats["idle_evictions"] += 1
+            evicted.append((host, entry["client"]))
+    return evicted
+
 def get_docker_client(docker_host=None):
-    """Get the Docker client, optionally creating a new one with a specific host."""
-    global docker_client
-    config = get_config()
+    """
+    Get a Docker client for a host, reusing cached clients.
+    
+    Clients are kept in a bounded LRU per host. A cached client that has not
+    been checked for DOCKER_CLIENT_HEALTH_CHECK_INTERVAL seconds is pinged
+    before reuse and replaced if the ping fails. Clients idle for longer than
+    DOCKER_CLIENT_IDLE_TIMEOUT, or pushed out of the LRU, are closed.
+    """
+    host = docker_host or get_config()["DEFAULT_DOCKER_HOST"]
+    return _get_cached_client(_client_cache, _client_cache_stats, host)
+
+def get_fleet_client(docker_host=None):
+    """
+    Get a Docker client for fleet queries on a host, reusing cached clients.
     
-    # Use the provided docker_host or the default one
+    Fleet clients live in their own LRU, managed like get_docker_client()'s,
+    with DOCKER_FLEET_HOST_TIMEOUT as their socket timeout: a host that stops
+    answering frees the fleet worker instead of holding it indefinitely.
+    """
+    config = get_config()
     host = docker_host or config["DEFAULT_DOCKER_HOST"]
+    return _get_cached_client(
+        _fleet_client_cache, _fleet_client_cache_stats, host, timeout=config["DOCKER_FLEET_HOST_TIMEOUT"]
+    )
+
+def _get_cached_client(cache, stats, host, **client_options):
+    """Get a client for host from one of the client LRUs; see get_docker_client()."""
+    config = get_config()
+    now = time.monotonic()
+    
+    with _client_cache_lock:
+        to_close = _evict_idle_clients(cache, stats, now, config["DOCKER_CLIENT_IDLE_TIMEOUT"])
+        entry = cache.get(host)
+        if entry is not None:
+            cache.move_to_end(host)
+            entry["last_used"] = now
     
-    # Return the global client if it's already initialized with the right host
-    if docker_client is not None and host == config["DEFAULT_DOCKER_HOST"]:
-        return docker_client
+    for evicted_host, evicted_client in to_close:
+        _close_client(evicted_client, evicted_host)
+    
+    if entry is not None:
+        if now - entry["last_checked"] < config["DOCKER_CLIENT_HEALTH_CHECK_INTERVAL"]:
+            with _client_cache_lock:
+                stats["hits"] += 1
+            return entry["client"]
+        
+        # Health check outside the lock: a ping is a daemon round trip
+        try:
+            entry["client"].ping()
+            entry["last_checked"] = time.monotonic()
+            with _client_cache_lock:
+                stats["hits"] += 1
+            return entry["client"]
+        except Exception as e:
+            logger.warning(f"Cached Docker client for {host} failed health check: {str(e)}")
+            with _client_cache_lock:
+                stats["failed_health_checks"] += 1
+                if cache.get(host) is entry:
+                    del cache[host]
+            _close_client(entry["client"], host)
     
     # Create a new client with the specified host
     try:
-        return docker.DockerClient(base_url=host)
+        client = docker.DockerClient(base_url=host, **client_options)
     except Exception as e:
         logger.error(f"Error creating Docker client with host {host}: {str(e)}")
         raise
+    
+    now = time.monotonic()
+    to_close = []
+    with _client_cache_lock:
+        existing = cache.get(host)
+        if existing is not None:
+            # Another request created one meanwhile: keep that one
+            to_close.append((host, client))
+            client = existing["client"]
+        else:
+            cache[host] = {"client": client, "last_used": now, "last_checked": now}
+            stats["creations"] += 1
+            while len(cache) > config["DOCKER_CLIENT_CACHE_SIZE"]:
+                evicted_host, evicted = cache.popitem(last=False)
+                stats["evictions"] += 1
+                to_close.append((evicted_host, evicted["client"]))
+    
+    for evicted_host, evicted_client in to_close:
+        _close_client(evicted_client, evicted_host)
+    
+    return client
+
+def get_docker_client_stats():
+    """Return Docker client cache statistics."""
+    with _client_cache_lock:
+        stats = dict(_client_cache_stats)
+        stats["cached_hosts"] = list(_client_cache.keys())
+        stats["size"] = len(_client_cache)
+        stats["max_size"] = get_config()["DOCKER_CLIENT_CACHE_SIZE"]
+        stats["fleet"] = dict(_fleet_client_cache_stats, cached_hosts=list(_fleet_client_cache.keys()),
+                              size=len(_fleet_client_cache))
+    return stats
+
+def _get_image_tags(client, host, image_ids):
+    """
+    Map image IDs to their tags.
+    
+    The map is shared per host and reloaded with one image listing when it
+    is older than DOCKER_IMAGE_CACHE_TTL or an unknown image ID shows up,
+    instead of inspecting every container's image.
+    """
+    with _image_tags_cache_lock:
+        entry = _image_tags_cache.get(host)
+    
+    if (entry is None
+            or time.monotonic() - entry["loaded_at"] > get_config()["DOCKER_IMAGE_CACHE_TTL"]
+            or any(image_id not in entry["tags"] for image_id in image_ids)):
+        tags = {image["Id"]: image.get("RepoTags") or [] for image in client.api.images()}
+        entry = {"tags": tags, "loaded_at": time.monotonic()}
+        with _image_tags_cache_lock:
+            _image_tags_cache[host] = entry
+    
+    return entry["tags"]
+
+def parse_health(status_text):
+    """Read the health check state from a listing's Status text, e.g. 'Up 2 hours (healthy)'."""
+    if '(healthy)' in status_text:
+        return 'healthy'
+    if '(unhealthy)' in status_text:
+        return 'unhealthy'
+    if '(health: starting)' in status_text:
+        return 'starting'
+    return None
+
+def list_containers(docker_host=None, all=True, client=None):
+    """
+    List containers with one low-level listing call.
+    
+    The high-level containers.list() inspects every container, and reading
+    container.image inspects its image too, so N containers cost 2N+1 daemon
+    round trips. The raw listing already has names, state and image; tags
+    come from the shared image-tags cache.
+    
+    Args:
+        docker_host: URL of the Docker host (optional)
+        all: Include stopped containers
+        client: Docker client to use instead of the cached one for docker_host
+        
+    Returns:
+        List of dicts with id, short_id, name, image, status, status_text
+        and health (None without a health check)
+    """
+    host = docker_host or get_config()["DEFAULT_DOCKER_HOST"]
+    client = client or get_docker_client(host)
+    
+    raw_containers = client.api.containers(all=all)
+    image_tags = _get_image_tags(client, host, {container["ImageID"] for container in raw_containers})
+    
+    containers = []
+    for container in raw_containers:
+        tags = image_tags.get(container["ImageID"])
+        if tags:
+            image = tags[0]
+        elif not container["Image"].startswith('sha256:'):
+            # Untagged since the container was created: the name it was created from
+            image = container["Image"]
+        else:
+            image = 'none'
+        
+        containers.append({
+            "id": container["Id"],
+            "short_id": container["Id"][:12],
+            "name": container["Names"][0].lstrip('/') if container.get("Names") else container["Id"][:12],
+            "image": image,
+            "status": container["State"],
+            "status_text": container.get("Status", ''),
+            "health": parse_health(container.get("Status", '')),
+        })
+    return containers
+
+def list_images(docker_host=None, client=None):
+    """
+    List images with one low-level listing call.
+    
+    Args:
+        docker_host: URL of the Docker host (optional)
+        client: Docker client to use instead of the cached one for docker_host
+        
+    Returns:
+        List of dicts with id, short_id, repository, tag, created (Unix
+        seconds) and size (bytes)
+    """
+    client = client or get_docker_client(docker_host)
+    images = []
+    for image in client.api.images():
+        repo_tags = image["RepoTags"][0] if image.get("RepoTags") else '<none>:<none>'
+        repo, tag = '<none>', '<none>'
+        if ':' in repo_tags:
+            # The tag follows the last colon; registries can have a port
+            repo, tag = repo_tags.rsplit(':', 1)
+        
+        image_id = image["Id"]
+        images.append({
+            "id": image_id,
+            "short_id": image_id[:19] if image_id.startswith('sha256:') else image_id[:12],
+            "repository": repo,
+            "tag": tag,
+            "created": image["Created"],
+            "size": image["Size"],
+        })
+    return images
+
+def format_container_row(container):
+    """Format one list_containers() row as a tab-separated line."""
+    return f"{container['short_id']}\t{container['image']}\t\t{container['status']}\t{container['name']}\n"
+
+def format_image_row(image):
+    """Format one list_images() row as a tab-separated line."""
+    created = datetime.fromtimestamp(image['created']).strftime('%Y-%m-%d %H:%M:%S')
+    size_mb = image['size'] / (1024 * 1024)
+    return f"{image['repository']}\t{image['tag']}\t\t{image['short_id']}\t{created}\t{size_mb:.2f} MB\n"
+
+def _get_stats_executor():
+    """Create the stats executor on first use."""
+    global _stats_executor
+    with _stats_executor_lock:
+        if _stats_executor is None:
+            _stats_executor = ThreadPoolExecutor(
+                max_workers=get_config()["DOCKER_STATS_WORKERS"],
+                thread_name_prefix="docker-stats"
+            )
+        return _stats_executor
+
+def _fetch_container_stats(client, container_id):
+    """Take one stats sample of a container (runs on the stats executor)."""
+    return compute_container_stats(client.api.stats(container_id, stream=False))
+
+def collect_container_stats(client, containers, timeout=None, docker_host=None, executor=None):
+    """
+    Collect stats for several containers concurrently.
+    
+    Containers with a recent sample from the background stats sampler are
+    answered from memory. The others need a stats call each, which blocks
+    while the daemon takes two samples, so those calls are spread over a
+    bounded thread pool and awaited together until a shared deadline.
+    Containers that miss the deadline or fail are returned as partial rows
+    instead of failing the whole table.
+    
+    Args:
+        client: Docker client of the host
+        containers: list_containers() rows
+        timeout: Deadline in seconds (default DOCKER_STATS_TIMEOUT)
+        docker_host: URL of the Docker host the containers belong to
+        executor: Pool for the stats calls (default: the shared stats pool)
+        
+    Returns:
+        List of dicts, in the order of containers, with "name", "stats"
+        (see compute_container_stats, or None) and "error" (or None)
+    """
+    if timeout is None:
+        timeout = get_config()["DOCKER_STATS_TIMEOUT"]
+    
+    executor = executor or _get_stats_executor()
+    sampled = [get_latest_stats(docker_host, container["name"]) for container in containers]
+    futures = [
+        None if stats is not None else executor.submit(_fetch_container_stats, client, container["id"])
+        for container, stats in zip(containers, sampled)
+    ]
+    wait([future for future in futures if future is not None], timeout=timeout)
+    
+    rows = []
+    for container, stats, future in zip(containers, sampled, futures):
+        row = {"name": container["name"], "stats": stats, "error": None}
+        if future is None:
+            # Answered from the sampler
+            pass
+        elif not future.done():
+            # Still queued or waiting on the daemon: drop it if it has not started
+            future.cancel()
+            row["error"] = f"timed out after {timeout}s"
+        elif future.exception() is not None:
+            row["error"] = str(future.exception())
+        else:
+            row["stats"] = future.result()
+        rows.append(row)
+    
+    partial = sum(1 for row in rows if row["error"])
+    if partial:
+        logger.warning(f"Stats incomplete for {partial} of {len(rows)} containers")
+    return rows
+
+def _format_bytes_pair(pair):
+    """Format a (read, write) byte pair in MB, or N/A."""
+    if pair is None:
+        return "N/A"
+    return f"{pair[0] / (1024 * 1024):.2f}MB / {pair[1] / (1024 * 1024):.2f}MB"
+
+def format_stats_row(row):
+    """Format one collect_container_stats() row as a tab-separated line."""
+    stats = row["stats"]
+    if stats is None:
+        return f"{row['name']}\t-\t-\t-\t-\tpartial: {row['error']}\n"
+    
+    cpu = f"{stats['cpu_percent']:.2f}%" if stats['cpu_percent'] is not None else "N/A"
+    if stats['mem_usage'] is not None and stats['mem_limit']:
+        mem = f"{stats['mem_usage'] / (1024 * 1024):.2f}MB / {stats['mem_limit'] / (1024 * 1024):.2f}MB"
+        mem_percent = f"{stats['mem_percent']:.2f}%"
+    else:
+        mem, mem_percent = "N/A", "N/A"
+    return f"{row['name']}\t{cpu}\t{mem}\t{mem_percent}\t{_format_bytes_pair(stats['net_io'])}\t{_format_bytes_pair(stats['block_io'])}\n"
 
-def get_container_names(docker_host=None):
-    """Get a list of container names from Docker."""
+def _close_exec_output(output):
+    """
+    Close an exec output stream together with the connection under it.
+    
+    Closing only the demux generator leaves the hijacked socket open, so the
+    daemon keeps copying output into it and the command keeps running. Once
+    the socket is shut down the command's stdout and stderr are closed and it
+    gets SIGPIPE on its next write.
+    """
     try:
-        client = get_docker_client(docker_host)
-        return [container.name for container in client.containers.list(all=True)]
+        # CancellableStream shuts the socket down (not supported over SSH)
+        output.close()
     except Exception as e:
-        logger.error(f"Error getting container names: {str(e)}")
-        return []
+        logger.debug(f"Error closing exec stream: {str(e)}")
+    response = getattr(output, '_response', None)
+    if response is not None:
+        response.close()
+
+def stream_exec(client, container_name, cmd, max_bytes=None):
+    """
+    Run a command in a container and yield its output as it is produced.
+    
+    stdout and stderr are kept apart (demultiplexed). Once max_bytes of
+    output have been sent, reading stops and the exec connection is shut
+    down, which ends a command that keeps writing.
+    
+    Args:
+        client: Docker client
+        container_name: Name or ID of the container
+        cmd: Command to run, as a string or argument list
+        max_bytes: Combined output cap (default DOCKER_EXEC_MAX_OUTPUT_BYTES)
+        
+    Yields:
+        {"exec_id": id} once the exec has started, then
+        {"stream": "stdout"|"stderr", "data": text} for each chunk,
+        {"truncated": True, "limit": max_bytes} where output was cut, and
+        finally {"exit_code", "running", "truncated", "stdout_bytes", "stderr_bytes"}.
+        exit_code is None if the command was still running when output was cut.
+    """
+    if max_bytes is None:
+        max_bytes = get_config()["DOCKER_EXEC_MAX_OUTPUT_BYTES"]
+    
+    exec_id = client.api.exec_create(container_name, cmd, stdout=True, stderr=True)['Id']
+    output = client.api.exec_start(exec_id, stream=True, demux=True)
+    yield {"exec_id": exec_id}
+    
+    # Chunk boundaries can split multi-byte characters
+    decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace') for name in ('stdout', 'stderr')}
+    sizes = {'stdout': 0, 'stderr': 0}
+    truncated = False
+    
+    try:
+        for stdout, stderr in output:
+            for name, chunk in (('stdout', stdout), ('stderr', stderr)):
+                if not chunk:
+                    continue
+                room = max_bytes - sizes['stdout'] - sizes['stderr']
+                if len(chunk) > room:
+                    chunk = chunk[:room]
+                    truncated = True
+                sizes[name] += len(chunk)
+                text = decoders[name].decode(chunk)
+                if text:
+                    yield {"stream": name, "data": text}
+                if truncated:
+                    break
+            if truncated:
+                yield {"truncated": True, "limit": max_bytes}
+                break
+    finally:
+        # Stop reading from the daemon, also when the consumer goes away
+        _close_exec_output(output)
+    
+    info = client.api.exec_inspect(exec_id)
+    yield {
+        "exit_code": info.get('ExitCode') if not info.get('Running') else None,
+        "running": bool(info.get('Running')),
+        "truncated": truncated,
+        "stdout_bytes": sizes['stdout'],
+        "stderr_bytes": sizes['stderr'],
+    }
 
 def execute_docker_command(command, docker_host=None):
     """
@@ -81,10 +493,10 @@ def execute_docker_command(command, docker_host=None):
         if command.startswith('ps') or command == 'ps':
             # List containers
             all_containers = True if '-a' in command else False
-            containers = client.containers.list(all=all_containers)
-            result = "CONTAINER ID\tIMAGE\t\tSTATUS\t\tNAMES\n"
+            containers = list_containers(docker_host, all=all_containers)
+            result = PS_HEADER
             for container in containers:
-                result += f"{container.short_id}\t{container.image.tags[0] if container.image.tags else 'none'}\t\t{container.status}\t{container.name}\n"
+                result += format_container_row(container)
                 
         elif command.startswith('logs'):
             # Get container logs
@@ -113,7 +525,7 @@ def execute_docker_command(command, docker_host=None):
                 for line in container.logs(stream=True, tail=tail_lines):
                     logs.append(line.decode('utf-8').strip())
                     if time.time() > timeout:
-                        logs.append("... Truncated (10 second limit) ...")
+                        logs.append(f"... Truncated (10 second limit); follow live at /docker/logs/{container_name}/stream ...")
                         break
                 
                 result = "\n".join(logs)
@@ -137,66 +549,36 @@ def execute_docker_command(command, docker_host=None):
             container_name = parts[1]
             cmd = ' '.join(parts[2:])
             
-            container = client.containers.get(container_name)
-            exec_result = container.exec_run(cmd)
-            result = exec_result.output.decode('utf-8')
+            stdout, stderr = [], []
+            for event in stream_exec(client, container_name, cmd):
+                if event.get("stream") == 'stdout':
+                    stdout.append(event["data"])
+                elif event.get("stream") == 'stderr':
+                    stderr.append(event["data"])
+                elif "exit_code" in event:
+                    summary = event
+            
+            result = ''.join(stdout)
+            if stderr:
+                result += f"\n[stderr]\n{''.join(stderr)}"
+            if summary["truncated"]:
+                result += f"\n... Output truncated at {get_config()['DOCKER_EXEC_MAX_OUTPUT_BYTES']} bytes ..."
+            if summary["exit_code"]:
+                result += f"\n[exit code {summary['exit_code']}]"
             
         elif command.startswith('images'):
             # List images
-            images = client.images.list()
-            result = "REPOSITORY\tTAG\t\tIMAGE ID\t\tCREATED\t\tSIZE\n"
-            for image in images:
-                repo_tags = image.tags[0] if image.tags else '<none>:<none>'
-                repo, tag = '<none>', '<none>'
-                if ':' in repo_tags:
-                    repo, tag = repo_tags.split(':', 1)
-                
-                created = datetime.fromtimestamp(image.attrs['Created']).strftime('%Y-%m-%d %H:%M:%S')
-                size_mb = image.attrs['Size'] / (1024 * 1024)
-                
-                result += f"{repo}\t{tag}\t\t{image.short_id}\t{created}\t{size_mb:.2f} MB\n"
+            result = IMAGES_HEADER
+            for image in list_images(docker_host):
+                result += format_image_row(image)
                 
         elif command.startswith('stats'):
             # Container statistics
-            containers = client.containers.list()
-            result = "CONTAINER\tCPU %\tMEM USAGE / LIMIT\tMEM %\tNET I/O\tBLOCK I/O\n"
+            containers = list_containers(docker_host, all=False)
+            result = STATS_HEADER
             
-            for container in containers:
-                stats = container.stats(stream=False)
-                
-                # Calculate CPU percentage
-                cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - stats['precpu_stats']['cpu_usage']['total_usage']
-                system_delta = stats['cpu_stats']['system_cpu_usage'] - stats['precpu_stats']['system_cpu_usage']
-                num_cpus = stats['cpu_stats']['online_cpus']
-                cpu_percent = (cpu_delta / system_delta) * num_cpus * 100.0
-                
-                # Calculate memory usage
-                mem_usage = stats['memory_stats']['usage']
-                mem_limit = stats['memory_stats']['limit']
-                mem_percent = (mem_usage / mem_limit) * 100.0
-                
-                # Format values
-                mem_usage_mb = mem_usage / (1024 * 1024)
-                mem_limit_mb = mem_limit / (1024 * 1024)
-                
-                # Network and storage
-                net_io = "N/A"
-                if 'networks' in stats:
-                    rx_bytes = sum(net['rx_bytes'] for net in stats['networks'].values())
-                    tx_bytes = sum(net['tx_bytes'] for net in stats['networks'].values())
-                    rx_mb = rx_bytes / (1024 * 1024)
-                    tx_mb = tx_bytes / (1024 * 1024)
-                    net_io = f"{rx_mb:.2f}MB / {tx_mb:.2f}MB"
-                
-                block_io = "N/A"
-                if 'blkio_stats' in stats and 'io_service_bytes_recursive' in stats['blkio_stats']:
-                    reads = sum(item['value'] for item in stats['blkio_stats']['io_service_bytes_recursive'] if item['op'] == 'Read')
-                    writes = sum(item['value'] for item in stats['blkio_stats']['io_service_bytes_recursive'] if item['op'] == 'Write')
-                    reads_mb = reads / (1024 * 1024)
-                    writes_mb = writes / (1024 * 1024)
-                    block_io = f"{reads_mb:.2f}MB / {writes_mb:.2f}MB"
-                
-                result += f"{container.name}\t{cpu_percent:.2f}%\t{mem_usage_mb:.2f}MB / {mem_limit_mb:.2f}MB\t{mem_percent:.2f}%\t{net_io}\t{block_io}\n"
+            for row in collect_container_stats(client, containers, docker_host=docker_host):
+                result += format_stats_row(row)
                 
         elif command.startswith('start'):
             # Start a container
@@ -222,13 +604,12 @@ def execute_docker_command(command, docker_host=None):
             result = f"Image {image_name} pulled successfully"
             
         else:
-            # Try using subprocess as a last resort for complex commands
-            command_with_docker = f"docker {command}"
-            result = subprocess.check_output(
-                command_with_docker, 
-                shell=True, 
-                timeout=config["COMMAND_TIMEOUT"]
-            ).decode('utf-8')
+            # Fall back to the docker CLI for other commands, without a shell
+            result = run_command(
+                ['docker'] + parse_command(command),
+                timeout=config["COMMAND_TIMEOUT"],
+                env={"DOCKER_HOST": docker_host} if docker_host else None
+            ).to_text(config["COMMAND_TIMEOUT"])
         
         return result
         
@@ -236,8 +617,8 @@ def execute_docker_command(command, docker_host=None):
         return f"Error: Container or image not found: {str(e)}"
     except docker.errors.APIError as e:
         return f"Docker API Error: {str(e)}"
-    except subprocess.TimeoutExpired:
-        return f"Error: Command exceeded the time limit of {get_config()['COMMAND_TIMEOUT']} seconds"
+    except CommandError as e:
+        return f"Error: {str(e)}"
     except Exception as e:
         logger.error(f"Error executing Docker command: {str(e)}", exc_info=True)
         return f"Error executing Docker command: {str(e)}"
@@ -0,0 +1,337 @@
+"""
+Container log streaming and search for the n8n AI Assistant Pro backend.
+"""
+
+import re
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from config import get_config
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# First level word in a line; n8n writes "level" in text and JSON formats
+_LEVEL_RE = re.compile(r'\b(fatal|error|warn(?:ing)?|info|verbose|debug)\b', re.IGNORECASE)
+LOG_LEVELS = ('fatal', 'error', 'warn', 'info', 'verbose', 'debug')
+
+# Markers put on a follower's queue next to (timestamp, line) tuples
+_END = object()
+
+# Module-level variables
+_stream_slots = None
+_stream_slots_lock = threading.Lock()
+
+class LogStreamLimitError(Exception):
+    """Raised when DOCKER_LOG_STREAM_MAX_ACTIVE streams are already open."""
+
+def parse_log_timestamp(timestamp):
+    """
+    Parse a Docker log timestamp (RFC 3339 with nanoseconds, UTC) to epoch nanoseconds.
+
+    Returns:
+        Integer nanoseconds since the epoch, or None if the text is not a timestamp
+    """
+    try:
+        seconds, _, fraction = timestamp.rstrip('Z').partition('.')
+        parsed = datetime.strptime(seconds, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+        nanos = int((fraction or '0')[:9].ljust(9, '0'))
+    except ValueError:
+        return None
+    return int(parsed.timestamp()) * 1000000000 + nanos
+
+def parse_time_param(value):
+    """
+    Parse a since/until parameter: a Docker log timestamp or Unix seconds.
+
+    Returns:
+        Integer nanoseconds since the epoch
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    nanos = parse_log_timestamp(value)
+    if nanos is None:
+        nanos = int(float(value) * 1000000000)
+    return nanos
+
+def format_log_timestamp(nanos):
+    """Format epoch nanoseconds like a Docker log timestamp."""
+    seconds, fraction = divmod(nanos, 1000000000)
+    moment = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    return f"{moment.strftime('%Y-%m-%dT%H:%M:%S')}.{fraction:09d}Z"
+
+def detect_log_level(text):
+    """Return the normalized level named in a log line, or None."""
+    match = _LEVEL_RE.search(text)
+    if match is None:
+        return None
+    level = match.group(1).lower()
+    return 'warn' if level == 'warning' else level
+
+def split_log_line(raw_line):
+    """
+    Split a line from logs(timestamps=True) into its timestamp and text.
+
+    Returns:
+        (timestamp, text); timestamp is None if the line has none
+    """
+    timestamp, _, text = raw_line.partition(' ')
+    if parse_log_timestamp(timestamp) is None:
+        return None, raw_line
+    return timestamp, text
+
+def iter_log_lines(chunks):
+    """
+    Reassemble whole lines from log chunks.
+
+    The daemon sends frames, not lines: one chunk can hold several lines or
+    end in the middle of one.
+    """
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8', errors='replace').rstrip('\r')
+    if pending:
+        yield pending.decode('utf-8', errors='replace').rstrip('\r')
+
+def _get_stream_slots():
+    """Create the semaphore bounding concurrent log streams on first use."""
+    global _stream_slots
+    with _stream_slots_lock:
+        if _stream_slots is None:
+            _stream_slots = threading.BoundedSemaphore(get_config()["DOCKER_LOG_STREAM_MAX_ACTIVE"])
+        return _stream_slots
+
+class LogFollower:
+    """
+    Follows a container's log on a reader thread.
+
+    Lines go through a bounded queue: when the consumer falls behind, the
+    reader blocks, stops reading from the daemon and lets TCP flow control
+    push back, instead of buffering the log in memory.
+    """
+
+    def __init__(self, container, since_ns=None, tail=100, slots=None):
+        config = get_config()
+        self.container = container
+        self.since_ns = since_ns
+        self.tail = tail
+        self.queue = queue.Queue(maxsize=config["DOCKER_LOG_STREAM_QUEUE_SIZE"])
+        self.closed = threading.Event()
+        self._stream = None
+        self._thread = None
+        self._slots = slots
+
+    def start(self):
+        """Open the log stream and start the reader thread."""
+        if self.since_ns is not None:
+            # The daemon filters by whole seconds: resume at the start of the
+            # second and drop what the client already has
+            self._stream = self.container.logs(
+                stream=True, follow=True, timestamps=True,
+                since=max(int(self.since_ns // 1000000000), 1)
+            )
+        else:
+            self._stream = self.container.logs(stream=True, follow=True, timestamps=True, tail=self.tail)
+
+        self._thread = threading.Thread(target=self._read, name=f"logs-{self.container.name}", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        """Block while the queue is full, giving up once the follower is closed."""
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        """Move lines from the daemon stream to the queue (runs on the reader thread)."""
+        error = None
+        try:
+            for raw_line in iter_log_lines(self._stream):
+                timestamp, text = split_log_line(raw_line)
+                if self.since_ns is not None and timestamp is not None:
+                    if parse_log_timestamp(timestamp) <= self.since_ns:
+                        continue
+                if not self._put((timestamp, text)):
+                    return
+        except Exception as e:
+            if not self.closed.is_set():
+                logger.warning(f"Log stream for {self.container.name} failed: {str(e)}")
+                error = str(e)
+        self._put((_END, error))
+
+    def lines(self, heartbeat, max_duration):
+        """
+        Yield (timestamp, text) tuples as they arrive.
+
+        Yields None after `heartbeat` seconds without a line, so the caller
+        can keep the connection alive. Ends when the container's log ends
+        (e.g. it stopped) or after max_duration seconds.
+
+        Raises:
+            RuntimeError: If the daemon stream failed
+        """
+        deadline = time.monotonic() + max_duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                item = self.queue.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield None
+                continue
+            if item[0] is _END:
+                if item[1]:
+                    raise RuntimeError(item[1])
+                return
+            yield item
+
+    def close(self):
+        """Stop the reader thread and release the daemon connection and stream slot."""
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+        if self._slots is not None:
+            self._slots.release()
+
+def open_log_follower(container, since_ns=None, tail=100):
+    """
+    Start following a container's log, within the concurrent stream limit.
+
+    The caller must close() the follower, which also frees its slot.
+
+    Raises:
+        LogStreamLimitError: If too many log streams are open
+    """
+    slots = _get_stream_slots()
+    if not slots.acquire(blocking=False):
+        raise LogStreamLimitError(
+            f"Too many log streams open ({get_config()['DOCKER_LOG_STREAM_MAX_ACTIVE']}), try again later"
+        )
+
+    follower = LogFollower(container, since_ns, tail, slots)
+    try:
+        follower.start()
+    except Exception:
+        follower.close()
+        raise
+    return follower
+
+def search_logs(container, pattern=None, levels=None, since_ns=None, until_ns=None,
+                context=2, limit=200, ignore_case=True):
+    """
+    Search a container's log on the server and return matching lines only.
+
+    The log is read as a stream between since and until and filtered line
+    by line, keeping only `context` lines of look-behind, so memory and the
+    response size depend on the matches, not on the log size. The returned
+    cursor is the `since` for the next call, which then only reads newer
+    log lines.
+
+    Args:
+        container: Container object
+        pattern: Regular expression to match (optional)
+        levels: Iterable of LOG_LEVELS to keep (optional)
+        since_ns: Only lines after this epoch nanosecond timestamp
+        until_ns: Only lines up to this epoch nanosecond timestamp
+        context: Lines of context before and after each match
+        limit: Maximum number of matches
+        ignore_case: Case-insensitive pattern
+
+    Returns:
+        Dict with matches (timestamp, level, line, before, after), cursor,
+        truncated, lines_scanned and bytes_scanned
+
+    Raises:
+        re.error: If the pattern is invalid
+    """
+    regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0) if pattern else None
+    levels = set(levels) if levels else None
+
+    options = {"stream": True, "follow": False, "timestamps": True}
+    if since_ns is not None:
+        # The daemon filters by whole seconds; the exact bound is applied below
+        options["since"] = max(int(since_ns // 1000000000), 1)
+    if until_ns is not None:
+        options["until"] = int(until_ns // 1000000000) + 1
+
+    before = deque(maxlen=context) if context else None
+    awaiting_context = []
+    matches = []
+    cursor_ns = since_ns
+    truncated = False
+    lines_scanned = 0
+    bytes_scanned = 0
+
+    stream = container.logs(**options)
+    try:
+        for raw_line in iter_log_lines(stream):
+            bytes_scanned += len(raw_line) + 1
+            timestamp, text = split_log_line(raw_line)
+            line_ns = parse_log_timestamp(timestamp) if timestamp else None
+            if line_ns is not None:
+                if since_ns is not None and line_ns <= since_ns:
+                    continue
+                if until_ns is not None and line_ns > until_ns:
+                    break
+            lines_scanned += 1
+
+            for match in awaiting_context:
+                match["after"].append(text)
+            awaiting_context = [match for match in awaiting_context if len(match["after"]) < context]
+
+            if truncated:
+                # Only finishing the context of the last matches
+                if not awaiting_context:
+                    break
+                continue
+
+            if line_ns is not None:
+                cursor_ns = line_ns
+
+            level = detect_log_level(text)
+            if (levels is None or level in levels) and (regex is None or regex.search(text)):
+                match = {
+                    "timestamp": timestamp,
+                    "level": level,
+                    "line": text,
+                    "before": list(before) if before is not None else [],
+                    "after": [],
+                }
+                matches.append(match)
+                if context:
+                    awaiting_context.append(match)
+                if len(matches) >= limit:
+                    # Resume after the last match next time, so lines read
+                    # only as context are searched again
+                    truncated = True
+                    if not awaiting_context:
+                        break
+
+            if before is not None:
+                before.append(text)
+    finally:
+        stream.close()
+
+    return {
+        "matches": matches,
+        "cursor": format_log_timestamp(cursor_ns) if cursor_ns is not None else None,
+        "truncated": truncated,
+        "lines_scanned": lines_scanned,
+        "bytes_scanned": bytes_scanned,
+    }
@@ -0,0 +1,357 @@
+"""
+Change feed of n8n executions for the n8n AI Assistant Pro backend.
+
+An optional trigger on execution_entity sends a NOTIFY for every new
+execution and every status change. One listener connection per database
+receives them and fans them out to any number of subscribers (the SSE
+endpoint), so clients learn about executions as they happen instead of
+polling the n8n database.
+
+NOTIFY is not delivered on read replicas: the listener always connects to
+the given (primary) connection string. Notifications sent while the
+listener is disconnected are lost; subscribers get a 'resync' event after a
+reconnect, or when they fell behind, and should reload what they show.
+"""
+
+import json
+import time
+import queue
+import select
+import logging
+import threading
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from config import get_config
+from postgres_pool import pooled_connection, redact_connection_string
+from postgres_handler import QueryError, create_postgres_connection
+from n8n_db import n8n_table
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+NOTIFY_FUNCTION = 'n8n_ai_assistant_notify_execution'
+INSERT_TRIGGER = 'n8n_ai_assistant_execution_insert'
+UPDATE_TRIGGER = 'n8n_ai_assistant_execution_update'
+
+# The payload stays far below NOTIFY's 8000 byte limit: ids and statuses only
+_INSTALL_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify({channel}, json_build_object(
+        'op', lower(TG_OP),
+        'id', NEW.id,
+        'workflowId', NEW."workflowId",
+        'status', NEW.status,
+        'mode', NEW.mode,
+        'startedAt', NEW."startedAt",
+        'stoppedAt', NEW."stoppedAt"
+    )::text);
+    RETURN NULL;
+END
+$$;
+DROP TRIGGER IF EXISTS {insert_trigger} ON {table};
+DROP TRIGGER IF EXISTS {update_trigger} ON {table};
+CREATE TRIGGER {insert_trigger} AFTER INSERT ON {table}
+    FOR EACH ROW EXECUTE PROCEDURE {function}();
+CREATE TRIGGER {update_trigger} AFTER UPDATE OF status ON {table}
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status) EXECUTE PROCEDURE {function}();
+"""
+
+_REMOVE_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS {insert_trigger} ON {table};
+DROP TRIGGER IF EXISTS {update_trigger} ON {table};
+DROP FUNCTION IF EXISTS {function}();
+"""
+
+_TRIGGER_STATUS_QUERY = """
+SELECT t.tgname
+FROM pg_trigger t
+JOIN pg_class c ON c.oid = t.tgrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s AND c.relname = %s AND t.tgname IN (%s, %s) AND t.tgenabled <> 'D';
+"""
+
+# Seconds between checks of the listener connection and its subscribers
+_POLL_INTERVAL = 1
+
+# Module-level variables
+_feeds = {}  # connection string -> ChangeFeed
+_feeds_lock = threading.Lock()
+
+class FeedLimitError(Exception):
+    """Raised when N8N_CHANGE_FEED_MAX_SUBSCRIBERS subscribers are already connected."""
+
+def _trigger_statement(template):
+    """Format the trigger SQL for the configured schema, table prefix and channel."""
+    config = get_config()
+    return sql.SQL(template).format(
+        function=sql.Identifier(config["N8N_DB_SCHEMA"], NOTIFY_FUNCTION),
+        channel=sql.Literal(config["N8N_CHANGE_FEED_CHANNEL"]),
+        table=n8n_table('execution_entity'),
+        insert_trigger=sql.Identifier(INSERT_TRIGGER),
+        update_trigger=sql.Identifier(UPDATE_TRIGGER),
+    )
+
+def _run_ddl(connection_string, template):
+    """Run trigger DDL in one transaction."""
+    try:
+        with pooled_connection(connection_string) as conn:
+            cursor = conn.cursor()
+            cursor.execute(_trigger_statement(template))
+            cursor.close()
+            conn.commit()
+    except psycopg2.Error as e:
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+def install_trigger(connection_string):
+    """
+    Install (or replace) the NOTIFY trigger on execution_entity.
+
+    Needs a role allowed to create functions and triggers on n8n's tables.
+
+    Raises:
+        QueryError: If PostgreSQL reports an error
+    """
+    _run_ddl(connection_string, _INSTALL_TRIGGER_SQL)
+    logger.info(f"Execution change feed trigger installed on {redact_connection_string(connection_string)}")
+
+def remove_trigger(connection_string):
+    """
+    Remove the NOTIFY trigger and its function.
+
+    Raises:
+        QueryError: If PostgreSQL reports an error
+    """
+    _run_ddl(connection_string, _REMOVE_TRIGGER_SQL)
+    logger.info(f"Execution change feed trigger removed from {redact_connection_string(connection_string)}")
+
+def trigger_installed(connection_string):
+    """
+    Check whether both triggers are installed and enabled.
+
+    Raises:
+        QueryError: If PostgreSQL reports an error
+    """
+    config = get_config()
+    try:
+        with pooled_connection(connection_string) as conn:
+            cursor = conn.cursor()
+            cursor.execute(_TRIGGER_STATUS_QUERY, (
+                config["N8N_DB_SCHEMA"], config["N8N_TABLE_PREFIX"] + 'execution_entity',
+                INSERT_TRIGGER, UPDATE_TRIGGER
+            ))
+            found = cursor.fetchall()
+            cursor.close()
+            conn.rollback()
+    except psycopg2.Error as e:
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+    return len(found) == 2
+
+class Subscription:
+    """One consumer of a change feed, with its own bounded queue and filters."""
+
+    def __init__(self, feed, workflow_ids=None, statuses=None):
+        self.feed = feed
+        self.workflow_ids = set(workflow_ids) if workflow_ids else None
+        self.statuses = set(statuses) if statuses else None
+        self.queue = queue.Queue(maxsize=get_config()["N8N_CHANGE_FEED_QUEUE_SIZE"])
+        self.dropped = 0
+        self.closed = False
+
+    def wants(self, execution):
+        """Whether an execution event passes the subscription's filters."""
+        if self.workflow_ids is not None and str(execution.get("workflowId")) not in self.workflow_ids:
+            return False
+        if self.statuses is not None and execution.get("status") not in self.statuses:
+            return False
+        return True
+
+    def put(self, event):
+        """Queue an event without blocking the listener; a full queue drops it."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def events(self, heartbeat, max_duration):
+        """
+        Yield (event, data) tuples as they arrive.
+
+        Yields None after `heartbeat` seconds without an event. If events had
+        to be dropped because this consumer fell behind, a 'resync' event
+        follows the ones that were kept. Ends after max_duration seconds.
+        """
+        deadline = time.monotonic() + max_duration
+        while not self.closed:
+            if self.dropped and self.queue.empty():
+                # Caught up with what was kept: tell the client what it missed
+                dropped, self.dropped = self.dropped, 0
+                yield ('resync', {"reason": 'lagged', "dropped": dropped})
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                item = self.queue.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield None
+                continue
+            yield item
+
+    def close(self):
+        """Leave the feed."""
+        if not self.closed:
+            self.closed = True
+            self.feed.unsubscribe(self)
+
+class ChangeFeed:
+    """
+    Shared LISTEN connection for one database.
+
+    The listener thread starts with the first subscriber and stops once the
+    feed had no subscribers for N8N_CHANGE_FEED_IDLE_TIMEOUT seconds.
+    """
+
+    def __init__(self, connection_string):
+        self.connection_string = connection_string
+        self.source = redact_connection_string(connection_string)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._connected = False
+        self._last_error = None
+        self._stats = {"notifications": 0, "reconnects": 0}
+
+    def subscribe(self, workflow_ids=None, statuses=None):
+        """
+        Add a subscriber, starting the listener if needed.
+
+        Raises:
+            FeedLimitError: If the subscriber limit is reached
+        """
+        limit = get_config()["N8N_CHANGE_FEED_MAX_SUBSCRIBERS"]
+        subscription = Subscription(self, workflow_ids, statuses)
+        with self._lock:
+            if len(self._subscribers) >= limit:
+                raise FeedLimitError(f"Too many change feed subscribers ({limit}), try again later")
+            self._subscribers.add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="n8n-change-feed", daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscriber; the listener notices the feed went idle by itself."""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _publish(self, event, data, execution=None):
+        """Hand an event to every interested subscriber."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if execution is None or subscription.wants(execution):
+                subscription.put((event, data))
+
+    def _idle(self, idle_since):
+        """
+        Track how long the feed has had no subscribers.
+
+        Returns:
+            (idle_since, stop): stop is True once the idle timeout passed;
+            the thread is then unregistered under the lock, so a new
+            subscriber starts a fresh one
+        """
+        with self._lock:
+            if self._subscribers:
+                return None, False
+            if idle_since is None:
+                return time.monotonic(), False
+            if time.monotonic() - idle_since < get_config()["N8N_CHANGE_FEED_IDLE_TIMEOUT"]:
+                return idle_since, False
+            self._thread = None
+            self._connected = False
+            return idle_since, True
+
+    def _listen(self):
+        """Receive notifications and fan them out; reconnect with backoff (runs on the listener thread)."""
+        config = get_config()
+        backoff = 1
+        idle_since = None
+        first_connect = True
+
+        while True:
+            conn = None
+            try:
+                conn = create_postgres_connection(self.connection_string)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                cursor = conn.cursor()
+                cursor.execute(sql.SQL("LISTEN {};").format(sql.Identifier(config["N8N_CHANGE_FEED_CHANNEL"])))
+                with self._lock:
+                    self._connected = True
+                    self._last_error = None
+                if not first_connect:
+                    # Anything sent while disconnected is gone
+                    self._stats["reconnects"] += 1
+                    self._publish('resync', {"reason": 'reconnected'})
+                first_connect = False
+                backoff = 1
+                last_ping = time.monotonic()
+
+                while True:
+                    idle_since, stop = self._idle(idle_since)
+                    if stop:
+                        return
+
+                    if select.select([conn], [], [], _POLL_INTERVAL)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            self._stats["notifications"] += 1
+                            try:
+                                execution = json.loads(notify.payload)
+                            except ValueError:
+                                continue
+                            self._publish('execution', execution, execution)
+                    elif time.monotonic() - last_ping >= config["N8N_CHANGE_FEED_HEARTBEAT"]:
+                        # A silent connection may be dead: only a round trip tells
+                        cursor.execute("SELECT 1;")
+                        last_ping = time.monotonic()
+
+            except Exception as e:
+                with self._lock:
+                    self._connected = False
+                    self._last_error = str(e).strip()
+                logger.warning(f"Execution change feed lost its connection to {self.source}: {str(e).strip()}; "
+                               f"reconnecting in {backoff}s")
+                self._publish('error', {"error": str(e).strip(), "retry_in": backoff})
+                time.sleep(backoff)
+                backoff = min(backoff * 2, config["N8N_CHANGE_FEED_MAX_BACKOFF"])
+                idle_since, stop = self._idle(idle_since)
+                if stop:
+                    return
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def status(self):
+        """Describe the feed for API responses."""
+        with self._lock:
+            return {
+                "database": self.source,
+                "listening": self._thread is not None,
+                "connected": self._connected,
+                "subscribers": len(self._subscribers),
+                "last_error": self._last_error,
+                **self._stats,
+            }
+
+def get_change_feed(connection_string):
+    """Get the change feed of a database, creating it on first use."""
+    with _feeds_lock:
+        feed = _feeds.get(connection_string)
+        if feed is None:
+            feed = _feeds[connection_string] = ChangeFeed(connection_string)
+        return feed
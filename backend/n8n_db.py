@@ -0,0 +1,43 @@
+"""
+Access to n8n's own PostgreSQL tables for the n8n AI Assistant Pro backend.
+
+n8n can be configured with a schema and a table prefix (DB_POSTGRESDB_SCHEMA
+and DB_TABLE_PREFIX on the n8n side); N8N_DB_SCHEMA and N8N_TABLE_PREFIX
+must match them.
+"""
+
+from psycopg2 import sql
+from config import get_config
+
+# Execution statuses that no longer change
+FINAL_STATUSES = ('success', 'error', 'crashed', 'canceled')
+# Every status an execution can have
+EXECUTION_STATUSES = ('new', 'running', 'waiting') + FINAL_STATUSES
+# Statuses that count as failed executions
+ERROR_STATUSES = ('error', 'crashed')
+
+def n8n_table(name):
+    """
+    Qualified identifier of an n8n table.
+
+    Args:
+        name: Table name without prefix, e.g. 'execution_entity'
+
+    Returns:
+        psycopg2.sql.Identifier for use in sql.SQL(...).format()
+    """
+    config = get_config()
+    return sql.Identifier(config["N8N_DB_SCHEMA"], config["N8N_TABLE_PREFIX"] + name)
+
+def execution_status(status, finished, stopped):
+    """
+    Normalize the status of an execution row.
+
+    n8n versions before the status column only recorded `finished` and
+    `stoppedAt`: a stopped execution that did not finish failed.
+    """
+    if status:
+        return status
+    if finished:
+        return 'success'
+    return 'error' if stopped else 'running'
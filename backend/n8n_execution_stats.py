@@ -0,0 +1,519 @@
+"""
+Incremental n8n execution statistics for the n8n AI Assistant Pro backend.
+
+execution_entity is read forward from a watermark (the highest execution id
+seen), so each refresh only scans the rows added since the last one.
+Per-workflow counts, statuses and duration percentiles are kept as running
+aggregates; durations go into a log-bucket sketch, which is small, has a
+bounded relative error and merges by adding bucket counts.
+
+Executions that were still running when scanned are remembered by id and
+rechecked on later refreshes. Ids missing between recently started rows are
+rechecked for a while too: a transaction that took its id first can commit
+after a later one, and would otherwise fall behind the watermark for good.
+
+With N8N_EXECUTION_STATS_DB set, the aggregates and the watermark are kept in
+a local SQLite file and survive restarts.
+"""
+
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+import psycopg2
+from psycopg2 import sql
+from config import get_config
+from postgres_pool import pooled_connection, redact_connection_string
+from postgres_handler import QueryError, route_connection
+from n8n_db import n8n_table, execution_status, FINAL_STATUSES, ERROR_STATUSES
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Duration percentiles reported per workflow
+PERCENTILES = (50, 90, 95, 99)
+
+# Ids rechecked per statement
+_RECHECK_CHUNK = 1000
+
+# Missing ids remembered per gap; larger gaps come from deletes, not from
+# transactions still in flight
+_MAX_GAP_IDS = 100
+
+_EXECUTION_COLUMNS = """
+    id,
+    "workflowId",
+    status,
+    finished,
+    "stoppedAt" IS NOT NULL,
+    EXTRACT(EPOCH FROM ("stoppedAt" - "startedAt")) * 1000,
+    EXTRACT(EPOCH FROM "stoppedAt"),
+    "startedAt" > now() - make_interval(secs => %s)
+"""
+
+_NEW_EXECUTIONS_QUERY = (
+    "SELECT" + _EXECUTION_COLUMNS + "FROM {} WHERE id > %s ORDER BY id LIMIT %s;"
+)
+
+_RECHECK_QUERY = "SELECT" + _EXECUTION_COLUMNS + "FROM {} WHERE id = ANY(%s);"
+
+# Workflow ids are integers in old n8n versions and strings since 1.0
+_WORKFLOW_NAMES_QUERY = "SELECT id::text, name FROM {} WHERE id::text = ANY(%s);"
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS execution_stats_state (
+    source TEXT PRIMARY KEY,
+    watermark INTEGER NOT NULL,
+    pending TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workflow_execution_stats (
+    source TEXT NOT NULL,
+    workflow_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (source, workflow_id)
+);
+"""
+
+# Module-level variables
+_trackers = {}  # connection string -> ExecutionStats
+_trackers_lock = threading.Lock()
+
+class DurationSketch:
+    """
+    Mergeable quantile sketch for durations.
+
+    Values are counted in buckets whose bounds grow geometrically by
+    gamma = (1 + a) / (1 - a), so any quantile is returned within a relative
+    error a. Durations from 1 ms to a year take at most about 1,200 buckets.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}  # bucket index -> count
+        self.zero_count = 0  # values below 1 ms
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Count one value."""
+        if value < 1:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same accuracy."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracies")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q):
+        """Return the q-quantile (0 <= q <= 1), or None if the sketch is empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_state(self):
+        """Serializable state, see from_state()."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": sorted(self.buckets.items()),
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a sketch from to_state() output."""
+        sketch = cls(state["relative_accuracy"])
+        sketch.buckets = {int(index): count for index, count in state["buckets"]}
+        sketch.zero_count = state["zero_count"]
+        sketch.count = state["count"]
+        sketch.total = state["total"]
+        sketch.min = state["min"]
+        sketch.max = state["max"]
+        return sketch
+
+class WorkflowStats:
+    """Running aggregates of the finished executions of one workflow."""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.executions = 0
+        self.statuses = {}
+        self.durations = DurationSketch()
+        self.last_stopped_at = None
+
+    def add(self, status, duration_ms, stopped_at):
+        """Count one finished execution."""
+        self.executions += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if duration_ms is not None:
+            self.durations.add(max(duration_ms, 0))
+        if stopped_at is not None and (self.last_stopped_at is None or stopped_at > self.last_stopped_at):
+            self.last_stopped_at = stopped_at
+
+    def merge(self, other):
+        """Add the aggregates of another WorkflowStats."""
+        self.executions += other.executions
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.durations.merge(other.durations)
+        if other.last_stopped_at is not None and (
+                self.last_stopped_at is None or other.last_stopped_at > self.last_stopped_at):
+            self.last_stopped_at = other.last_stopped_at
+
+    def summary(self):
+        """Describe the aggregates for API responses."""
+        errors = sum(self.statuses.get(status, 0) for status in ERROR_STATUSES)
+        durations = self.durations
+        return {
+            "name": self.name,
+            "executions": self.executions,
+            "statuses": dict(self.statuses),
+            "errors": errors,
+            "error_rate": errors / self.executions if self.executions else None,
+            "duration_ms": {
+                "count": durations.count,
+                "mean": durations.total / durations.count if durations.count else None,
+                "min": durations.min,
+                "max": durations.max,
+                **{f"p{percentile}": durations.quantile(percentile / 100) for percentile in PERCENTILES},
+            },
+            "last_stopped_at": self.last_stopped_at,
+        }
+
+    def to_state(self):
+        """Serializable state, see from_state()."""
+        return {
+            "name": self.name,
+            "executions": self.executions,
+            "statuses": self.statuses,
+            "durations": self.durations.to_state(),
+            "last_stopped_at": self.last_stopped_at,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild aggregates from to_state() output."""
+        stats = cls(state["name"])
+        stats.executions = state["executions"]
+        stats.statuses = state["statuses"]
+        stats.durations = DurationSketch.from_state(state["durations"])
+        stats.last_stopped_at = state["last_stopped_at"]
+        return stats
+
+class ExecutionStatsStore:
+    """SQLite file holding the aggregates and watermark of each n8n database."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SQLITE_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def load(self, source):
+        """
+        Load the saved state of a database.
+
+        Returns:
+            (watermark, pending, workflows), or None if nothing was saved
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT watermark, pending FROM execution_stats_state WHERE source = ?", (source,)
+            ).fetchone()
+            if row is None:
+                return None
+            workflows = {
+                workflow_id: WorkflowStats.from_state(json.loads(state))
+                for workflow_id, state in conn.execute(
+                    "SELECT workflow_id, state FROM workflow_execution_stats WHERE source = ?", (source,)
+                )
+            }
+        # Gap ids expire relative to the monotonic clock and are not kept across restarts
+        pending = {execution_id: None for execution_id in json.loads(row[1])}
+        return row[0], pending, workflows
+
+    def save(self, source, watermark, pending, workflows):
+        """Save the watermark, the running executions and the given workflows in one transaction."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO execution_stats_state (source, watermark, pending, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (source, watermark, json.dumps(pending), time.time())
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO workflow_execution_stats (source, workflow_id, state) VALUES (?, ?, ?)",
+                [(source, workflow_id, json.dumps(stats.to_state())) for workflow_id, stats in workflows.items()]
+            )
+
+class ExecutionStats:
+    """Execution aggregates of one n8n database, refreshed incrementally."""
+
+    def __init__(self, connection_string, store=None):
+        self.connection_string = connection_string
+        self.source = redact_connection_string(connection_string)
+        self.store = store
+        self.watermark = 0
+        self.pending = {}  # execution id -> recheck deadline (monotonic) for gap ids, None for running ones
+        self.workflows = {}  # workflow id -> WorkflowStats
+        self._dirty = set()  # workflow ids changed since the last successful save
+        self.last_refresh = None
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+        if store is not None:
+            saved = store.load(self.source)
+            if saved is not None:
+                self.watermark, self.pending, self.workflows = saved
+                logger.info(f"Loaded n8n execution stats for {self.source} up to execution {self.watermark}")
+
+    def _record(self, row, changed):
+        """
+        Count one execution row if it has finished. Caller holds self._lock.
+
+        Returns:
+            True if the execution was counted, False if it is still running
+        """
+        execution_id, workflow_id, status, finished, stopped, duration_ms, stopped_at, _ = row
+        if status:
+            # 'waiting' executions have stoppedAt set but can still resume
+            if status not in FINAL_STATUSES:
+                return False
+        elif not stopped and not finished:
+            return False
+        status = execution_status(status, finished, stopped)
+
+        workflow_id = str(workflow_id) if workflow_id is not None else 'unknown'
+        stats = self.workflows.get(workflow_id)
+        if stats is None:
+            stats = self.workflows[workflow_id] = WorkflowStats()
+        stats.add(status, float(duration_ms) if duration_ms is not None else None,
+                  float(stopped_at) if stopped_at is not None else None)
+        changed.add(workflow_id)
+        return True
+
+    def _scan_new(self, cursor, table, budget, changed):
+        """Read executions past the watermark in id order, at most `budget` rows."""
+        config = get_config()
+        batch_size = config["N8N_EXECUTION_STATS_BATCH_SIZE"]
+        gap_window = config["N8N_EXECUTION_STATS_GAP_WINDOW"]
+        query = sql.SQL(_NEW_EXECUTIONS_QUERY).format(table)
+        scanned = 0
+
+        while scanned < budget:
+            cursor.execute(query, (gap_window, self.watermark, min(batch_size, budget - scanned)))
+            rows = cursor.fetchall()
+            if not rows:
+                return scanned, True
+
+            deadline = time.monotonic() + gap_window
+            with self._lock:
+                previous_id = self.watermark
+                for row in rows:
+                    execution_id, recent = row[0], row[7]
+                    if recent and execution_id - previous_id > 1:
+                        for missing_id in range(max(previous_id + 1, execution_id - _MAX_GAP_IDS), execution_id):
+                            self.pending[missing_id] = deadline
+                    if not self._record(row, changed):
+                        self.pending[execution_id] = None
+                    previous_id = execution_id
+                self.watermark = previous_id
+            scanned += len(rows)
+
+            if len(rows) < batch_size:
+                return scanned, True
+        return scanned, False
+
+    def _recheck_pending(self, cursor, table, changed):
+        """Count pending executions that have finished since; forget deleted ones and expired gaps."""
+        with self._lock:
+            pending_ids = sorted(self.pending)
+        query = sql.SQL(_RECHECK_QUERY).format(table)
+        gap_window = get_config()["N8N_EXECUTION_STATS_GAP_WINDOW"]
+        completed = 0
+
+        for start in range(0, len(pending_ids), _RECHECK_CHUNK):
+            chunk = pending_ids[start:start + _RECHECK_CHUNK]
+            cursor.execute(query, (gap_window, chunk))
+            rows = {row[0]: row for row in cursor.fetchall()}
+
+            now = time.monotonic()
+            with self._lock:
+                for execution_id in chunk:
+                    row = rows.get(execution_id)
+                    if row is not None:
+                        if self._record(row, changed):
+                            del self.pending[execution_id]
+                            completed += 1
+                        else:
+                            # A gap id that showed up, still running
+                            self.pending[execution_id] = None
+                    elif self.pending[execution_id] is None or self.pending[execution_id] < now:
+                        # Deleted (e.g. pruned) before it finished, or a gap that never filled
+                        del self.pending[execution_id]
+        return len(pending_ids), completed
+
+    def _limit_pending(self):
+        """Keep at most N8N_EXECUTION_STATS_MAX_PENDING pending ids, dropping the oldest. Caller holds self._lock."""
+        excess = len(self.pending) - get_config()["N8N_EXECUTION_STATS_MAX_PENDING"]
+        if excess > 0:
+            for execution_id in sorted(self.pending)[:excess]:
+                del self.pending[execution_id]
+            logger.warning(f"Stopped tracking {excess} long-running n8n executions on {self.source}")
+
+    def _load_names(self, cursor, workflow_ids):
+        """Refresh the names of workflows that had new executions."""
+        ids = [workflow_id for workflow_id in workflow_ids if workflow_id != 'unknown']
+        if not ids:
+            return
+        cursor.execute(sql.SQL(_WORKFLOW_NAMES_QUERY).format(n8n_table('workflow_entity')), (ids,))
+        names = dict(cursor.fetchall())
+        with self._lock:
+            for workflow_id in ids:
+                if workflow_id in names:
+                    self.workflows[workflow_id].name = names[workflow_id]
+
+    def refresh(self, force=False):
+        """
+        Bring the aggregates up to date.
+
+        Scans at most N8N_EXECUTION_STATS_MAX_ROWS new executions per call; a
+        backlog larger than that is worked off over the following refreshes.
+        Concurrent callers wait for the refresh in progress instead of
+        starting their own.
+
+        Args:
+            force: Refresh even if the last refresh is recent
+
+        Returns:
+            Dict with rows_scanned, rechecked, completed, caught_up and duration
+
+        Raises:
+            QueryError: If PostgreSQL reports an error
+        """
+        requested_at = time.time()
+        with self._refresh_lock:
+            if self.last_refresh is not None:
+                # Someone else refreshed while we waited for the lock
+                if self.last_refresh >= requested_at:
+                    return self.last_result
+                interval = get_config()["N8N_EXECUTION_STATS_REFRESH_INTERVAL"]
+                if not force and requested_at - self.last_refresh < interval:
+                    return self.last_result
+
+            start_time = time.monotonic()
+            table = n8n_table('execution_entity')
+            changed = set()
+            try:
+                # Only reads: the replica will do, the watermark simply trails its lag
+                with pooled_connection(route_connection(self.connection_string, True)) as conn:
+                    cursor = conn.cursor()
+                    rechecked, completed = self._recheck_pending(cursor, table, changed)
+                    scanned, caught_up = self._scan_new(
+                        cursor, table, get_config()["N8N_EXECUTION_STATS_MAX_ROWS"], changed
+                    )
+                    self._load_names(cursor, changed)
+                    cursor.close()
+                    conn.rollback()
+            except psycopg2.Error as e:
+                raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+            finally:
+                # Rows counted before an error are in memory and still need saving
+                with self._lock:
+                    self._dirty |= changed
+
+            with self._lock:
+                self._limit_pending()
+                if self.store is not None:
+                    self.store.save(
+                        self.source, self.watermark, sorted(self.pending),
+                        {workflow_id: self.workflows[workflow_id] for workflow_id in self._dirty}
+                    )
+                self._dirty.clear()
+
+            self.last_refresh = time.time()
+            self.last_result = {
+                "rows_scanned": scanned,
+                "rechecked": rechecked,
+                "completed": completed,
+                "caught_up": caught_up,
+                "duration": time.monotonic() - start_time,
+            }
+            if scanned:
+                logger.info(f"n8n execution stats: scanned {scanned} new executions up to {self.watermark}")
+            return self.last_result
+
+    def summary(self, workflow_id=None):
+        """
+        Describe the aggregates for API responses.
+
+        Args:
+            workflow_id: Only this workflow (optional)
+
+        Returns:
+            Dict with watermark, running, overall (all workflows merged) and
+            workflows (by workflow id)
+        """
+        with self._lock:
+            if workflow_id is not None:
+                selected = {workflow_id: self.workflows[workflow_id]} if workflow_id in self.workflows else {}
+            else:
+                selected = self.workflows
+
+            overall = WorkflowStats()
+            for stats in selected.values():
+                overall.merge(stats)
+            return {
+                "watermark": self.watermark,
+                "running": sum(1 for deadline in self.pending.values() if deadline is None),
+                "last_refresh": self.last_refresh,
+                "overall": overall.summary(),
+                "workflows": {workflow_id: stats.summary() for workflow_id, stats in selected.items()},
+            }
+
+def get_execution_stats(connection_string):
+    """Get the execution stats tracker of an n8n database, creating it on first use."""
+    with _trackers_lock:
+        tracker = _trackers.get(connection_string)
+        if tracker is None:
+            path = get_config()["N8N_EXECUTION_STATS_DB"]
+            tracker = _trackers[connection_string] = ExecutionStats(
+                connection_string, ExecutionStatsStore(path) if path else None
+            )
+        return tracker
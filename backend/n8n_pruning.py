@@ -0,0 +1,368 @@
+"""
+Throttled pruning of old n8n executions for the n8n AI Assistant Pro backend.
+
+One DELETE of every old execution locks a large part of execution_entity and
+writes the whole deletion to the WAL in one transaction. Pruning jobs delete
+in primary-key batches instead, each in its own short transaction, sleep
+between batches and size them to a target latency, so n8n keeps writing
+executions and replicas keep up while old ones are removed.
+
+Only executions with a final status are pruned; waiting executions keep
+their stoppedAt but can still be resumed. Only database rows are deleted:
+binary data n8n stored on disk for these executions stays where it is.
+"""
+
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import QueryCanceledError
+from config import get_config
+from postgres_pool import pooled_connection
+from postgres_handler import QueryError, route_connection
+from query_jobs import QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED, FINISHED_STATES
+from n8n_db import n8n_table, FINAL_STATUSES
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Executions that stopped before the cutoff with a final status: 'waiting'
+# executions have stoppedAt set too, but can still be resumed
+_CONDITION = '"stoppedAt" < %(cutoff)s AND status = ANY(%(statuses)s::text[])'
+
+_CUTOFF_QUERY = "SELECT now() - make_interval(secs => %s);"
+
+_MAX_ID_QUERY = "SELECT max(id) FROM {table} WHERE " + _CONDITION + ";"
+
+_ESTIMATE_QUERY = "EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE " + _CONDITION + ";"
+
+_COUNT_QUERY = "SELECT count(*) FROM {table} WHERE " + _CONDITION + ";"
+
+# The batch is picked by walking the primary key from the last deleted id,
+# so every batch starts where the previous one ended instead of rescanning
+_DELETE_BATCH_QUERY = """
+WITH batch AS (
+    SELECT id FROM {table}
+    WHERE id > %(after_id)s AND id <= %(max_id)s AND """ + _CONDITION + """
+    ORDER BY id
+    LIMIT %(limit)s
+), deleted AS (
+    DELETE FROM {table} e USING batch WHERE e.id = batch.id RETURNING e.id
+)
+SELECT count(*), max(id) FROM deleted;
+"""
+
+# Module-level variables
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+class PruneInProgressError(Exception):
+    """Raised when a pruning job is already queued or running on the same database."""
+
+class PruneJob:
+    """State and progress of one pruning run."""
+
+    def __init__(self, connection_string, older_than_days, statuses=None, batch_size=None):
+        self.id = str(uuid.uuid4())
+        self.connection_string = connection_string
+        self.older_than_days = older_than_days
+        self.statuses = statuses or list(FINAL_STATUSES)
+        self.batch_size = batch_size or get_config()["N8N_PRUNE_BATCH_SIZE"]
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.resumed_from = None
+        # Fixed when the job starts, and kept when it is resumed
+        self.cutoff = None
+        self.max_id = None
+        self.estimated_rows = None
+        # Progress
+        self.last_id = 0
+        self.deleted = 0
+        self.batches = 0
+        self.last_batch_ms = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.lock = threading.Lock()
+
+    def params(self):
+        """Query parameters selecting the executions this job deletes."""
+        return {"cutoff": self.cutoff, "statuses": self.statuses}
+
+    def to_dict(self):
+        """Describe the job and its progress for API responses."""
+        end = self.finished_at or time.time()
+        duration = (end - self.started_at) if self.started_at else None
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "older_than_days": self.older_than_days,
+            "statuses": self.statuses,
+            "cutoff": self.cutoff.isoformat() if self.cutoff else None,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": duration,
+            "resumed_from": self.resumed_from,
+            "estimated_rows": self.estimated_rows,
+            "deleted": self.deleted,
+            "progress": min(self.deleted / self.estimated_rows, 1.0) if self.estimated_rows else None,
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "last_batch_ms": self.last_batch_ms,
+            "last_id": self.last_id,
+            "max_id": self.max_id,
+            "error": self.error,
+        }
+
+def _get_executor():
+    """Create the pruning executor on first use; one job runs at a time."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="n8n-prune")
+        return _executor
+
+def _statement(query):
+    """Format the execution table into a query."""
+    return sql.SQL(query).format(table=n8n_table('execution_entity'))
+
+def _planner_estimate(cursor, params):
+    """Rows the planner expects the pruning condition to match."""
+    cursor.execute(_statement(_ESTIMATE_QUERY), params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def _next_batch_size(batch_size, latency_ms):
+    """Grow the batch while it is well under the target latency, shrink it in proportion when over."""
+    config = get_config()
+    target = config["N8N_PRUNE_TARGET_BATCH_MS"]
+    if latency_ms < target / 2:
+        batch_size *= 2
+    elif latency_ms > target:
+        batch_size = int(batch_size * target / latency_ms)
+    return max(config["N8N_PRUNE_MIN_BATCH_SIZE"], min(batch_size, config["N8N_PRUNE_MAX_BATCH_SIZE"]))
+
+def estimate_prune(connection_string, older_than_days, statuses=None):
+    """
+    Dry run: count the executions a pruning job would delete, without deleting.
+
+    The planner estimate is always returned; an exact count is added when it
+    finishes within POSTGRES_EXACT_COUNT_BUDGET seconds.
+
+    Returns:
+        Dict with cutoff, estimated_rows and exact_rows (None if the count
+        ran out of time)
+
+    Raises:
+        QueryError: If PostgreSQL reports an error
+    """
+    try:
+        with pooled_connection(route_connection(connection_string, True)) as conn:
+            cursor = conn.cursor()
+            cursor.execute(_CUTOFF_QUERY, (older_than_days * 86400,))
+            statuses = statuses or list(FINAL_STATUSES)
+            params = {"cutoff": cursor.fetchone()[0], "statuses": statuses}
+            estimated_rows = _planner_estimate(cursor, params)
+
+            exact_rows = None
+            try:
+                cursor.execute(f"SET LOCAL statement_timeout = {get_config()['POSTGRES_EXACT_COUNT_BUDGET'] * 1000};")
+                cursor.execute(_statement(_COUNT_QUERY), params)
+                exact_rows = cursor.fetchone()[0]
+            except QueryCanceledError:
+                pass
+            cursor.close()
+            conn.rollback()
+    except psycopg2.Error as e:
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+    return {
+        "cutoff": params["cutoff"].isoformat(),
+        "older_than_days": older_than_days,
+        "statuses": statuses,
+        "estimated_rows": estimated_rows,
+        "exact_rows": exact_rows,
+    }
+
+def _finish(job, status, error=None):
+    """Mark a job as finished. Caller holds job.lock."""
+    job.status = status
+    job.error = error
+    job.finished_at = time.time()
+
+def _prepare(conn, job):
+    """Fix the cutoff and the highest id to delete, and estimate the work."""
+    cursor = conn.cursor()
+    if job.cutoff is None:
+        cursor.execute(_CUTOFF_QUERY, (job.older_than_days * 86400,))
+        job.cutoff = cursor.fetchone()[0]
+    if job.max_id is None:
+        # Rows past this id were not old enough when the job started; the
+        # bound stops the last batch from scanning them
+        cursor.execute(_statement(_MAX_ID_QUERY), job.params())
+        job.max_id = cursor.fetchone()[0]
+    if job.estimated_rows is None:
+        job.estimated_rows = _planner_estimate(cursor, job.params())
+    cursor.close()
+    conn.commit()
+
+def _run_prune(job):
+    """Delete batch after batch until nothing is left or the job is cancelled (runs on the executor)."""
+    with job.lock:
+        if job.cancel_event.is_set():
+            _finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+
+    config = get_config()
+    statement = _statement(_DELETE_BATCH_QUERY)
+    try:
+        with pooled_connection(job.connection_string) as conn:
+            _prepare(conn, job)
+            cursor = conn.cursor()
+
+            while job.max_id is not None and not job.cancel_event.is_set():
+                start_time = time.monotonic()
+                cursor.execute(statement, dict(job.params(), after_id=job.last_id, max_id=job.max_id,
+                                               limit=job.batch_size))
+                deleted, last_id = cursor.fetchone()
+                # One transaction per batch keeps locks and WAL bursts small
+                conn.commit()
+                latency_ms = (time.monotonic() - start_time) * 1000
+
+                with job.lock:
+                    job.deleted += deleted
+                    job.batches += 1
+                    job.last_batch_ms = round(latency_ms, 1)
+                    if last_id is not None:
+                        job.last_id = last_id
+                    full_batch = deleted >= job.batch_size
+                    job.batch_size = _next_batch_size(job.batch_size, latency_ms)
+
+                if not full_batch:
+                    break
+                job.cancel_event.wait(config["N8N_PRUNE_SLEEP_MS"] / 1000)
+
+            cursor.close()
+
+        with job.lock:
+            _finish(job, CANCELLED if job.cancel_event.is_set() else SUCCEEDED)
+        logger.info(f"Pruning job {job.id} {job.status}: {job.deleted} executions deleted in {job.batches} batches")
+
+    except psycopg2.Error as e:
+        with job.lock:
+            _finish(job, FAILED, f"PostgreSQL Error: {str(e).strip()}")
+        logger.warning(f"Pruning job {job.id} failed after {job.deleted} executions: {str(e).strip()}")
+    except Exception as e:
+        logger.error(f"Error running pruning job {job.id}: {str(e)}", exc_info=True)
+        with job.lock:
+            _finish(job, FAILED, str(e))
+
+def _prune_finished_jobs():
+    """Forget finished jobs older than QUERY_JOB_RETENTION. Caller holds _jobs_lock."""
+    cutoff = time.time() - get_config()["QUERY_JOB_RETENTION"]
+    for job_id in [job_id for job_id, job in _jobs.items()
+                   if job.status in FINISHED_STATES and job.finished_at < cutoff]:
+        del _jobs[job_id]
+
+def _submit(job):
+    """Register and queue a job, one active job per database."""
+    with _jobs_lock:
+        _prune_finished_jobs()
+        for other in _jobs.values():
+            if other.connection_string == job.connection_string and other.status not in FINISHED_STATES:
+                raise PruneInProgressError(f"Pruning job {other.id} is already {other.status} on this database")
+        _jobs[job.id] = job
+        job.future = _get_executor().submit(_run_prune, job)
+    logger.info(f"Pruning job {job.id} submitted: executions older than {job.older_than_days} days")
+    return job
+
+def validate_prune_options(older_than_days, statuses):
+    """
+    Check the options of a pruning run.
+
+    Raises:
+        ValueError: If they are invalid
+    """
+    if not isinstance(older_than_days, (int, float)) or isinstance(older_than_days, bool) or older_than_days <= 0:
+        raise ValueError("older_than_days must be a positive number")
+    if statuses is not None:
+        if not isinstance(statuses, list) or not statuses:
+            raise ValueError("statuses must be a non-empty list")
+        invalid = [status for status in statuses if status not in FINAL_STATUSES]
+        if invalid:
+            raise ValueError(f"Invalid statuses: {', '.join(map(str, invalid))}; use {', '.join(FINAL_STATUSES)}")
+
+def submit_prune_job(connection_string, older_than_days, statuses=None, batch_size=None):
+    """
+    Queue a pruning job for executions that stopped more than older_than_days ago.
+
+    Returns:
+        The new PruneJob
+
+    Raises:
+        ValueError: If the options are invalid
+        PruneInProgressError: If a job is already active on the database
+    """
+    validate_prune_options(older_than_days, statuses)
+    return _submit(PruneJob(connection_string, older_than_days, statuses, batch_size))
+
+def resume_prune_job(job):
+    """
+    Continue a cancelled or failed job where it stopped.
+
+    The new job keeps the cutoff, id range and counters of the old one and
+    starts after the last deleted id.
+
+    Returns:
+        The new PruneJob, or None if the job cannot be resumed
+    """
+    if job.status not in (CANCELLED, FAILED):
+        return None
+    resumed = PruneJob(job.connection_string, job.older_than_days, job.statuses, job.batch_size)
+    resumed.resumed_from = job.id
+    resumed.cutoff = job.cutoff
+    resumed.max_id = job.max_id
+    resumed.estimated_rows = job.estimated_rows
+    resumed.last_id = job.last_id
+    resumed.deleted = job.deleted
+    resumed.batches = job.batches
+    return _submit(resumed)
+
+def get_prune_job(job_id):
+    """Return a job by ID, or None if unknown or expired."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def list_prune_jobs():
+    """Return every known job, most recent first."""
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+def cancel_prune_job(job):
+    """
+    Cancel a job. A running job stops after its current batch, which is
+    committed; resume_prune_job() continues from there.
+
+    Returns:
+        True if a cancellation was issued, False if the job had already finished
+    """
+    with job.lock:
+        if job.status in FINISHED_STATES:
+            return False
+        job.cancel_event.set()
+        if job.status == QUEUED and job.future is not None and job.future.cancel():
+            _finish(job, CANCELLED)
+    return True
@@ -0,0 +1,400 @@
+"""
+In-memory index of n8n workflow graphs for the n8n AI Assistant Pro backend.
+
+The nodes and connections JSON of workflow_entity is parsed once per
+workflow version into inverted indexes (node type, credential, node type
+with credential, webhook path -> workflow ids) and per-workflow graph
+metrics. Questions like "which workflows use the HTTP Request node with
+credential X" then become set lookups instead of a JSON scan over every row.
+
+Refreshes only load workflows whose updatedAt moved past the last one seen,
+minus N8N_WORKFLOW_INDEX_LOOKBACK seconds: updatedAt is stamped before
+commit, so a save can become visible after a later-stamped one was read.
+Deleted workflows are detected from the list of ids, which is cheap.
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+import psycopg2
+from psycopg2 import sql
+from config import get_config
+from postgres_pool import pooled_connection
+from postgres_handler import QueryError, route_connection
+from n8n_db import n8n_table
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+_CHANGED_WORKFLOWS_QUERY = """
+SELECT id::text, name, active, nodes, connections, "updatedAt"
+FROM {}
+WHERE %s::timestamptz IS NULL OR "updatedAt" >= %s::timestamptz - make_interval(secs => %s)
+ORDER BY "updatedAt";
+"""
+
+_WORKFLOW_IDS_QUERY = "SELECT id::text FROM {};"
+
+# Module-level variables
+_indexes = {}  # connection string -> WorkflowIndex
+_indexes_lock = threading.Lock()
+
+def _load_json(value, default):
+    """Decode a json column; older n8n versions store the JSON as text."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value
+
+def graph_metrics(node_names, connections):
+    """
+    Measure a workflow's connection graph.
+
+    Depth is the number of nodes on the longest path from a node without
+    inputs. Nodes on a cycle (loops back to an earlier node) are left out of
+    the depth, and has_cycle is set.
+
+    Args:
+        node_names: Names of the workflow's nodes
+        connections: n8n connections object,
+            {source: {connection_type: [[{"node": target, ...}, ...], ...]}}
+
+    Returns:
+        Dict with depth, max_fan_out, edges, roots and has_cycle
+    """
+    successors = {name: set() for name in node_names}
+    for source, outputs in connections.items():
+        if source not in successors or not isinstance(outputs, dict):
+            continue
+        for output_groups in outputs.values():
+            for group in output_groups or []:
+                for target in group or []:
+                    target_name = target.get("node") if isinstance(target, dict) else None
+                    if target_name in successors:
+                        successors[source].add(target_name)
+
+    in_degree = {name: 0 for name in successors}
+    for targets in successors.values():
+        for target in targets:
+            in_degree[target] += 1
+
+    # Longest path by Kahn's topological order
+    roots = [name for name, degree in in_degree.items() if degree == 0]
+    depth = {name: 1 for name in roots}
+    ready = deque(roots)
+    visited = 0
+    while ready:
+        name = ready.popleft()
+        visited += 1
+        for target in successors[name]:
+            depth[target] = max(depth.get(target, 0), depth[name] + 1)
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                ready.append(target)
+
+    return {
+        "depth": max(depth.values(), default=0),
+        "max_fan_out": max((len(targets) for targets in successors.values()), default=0),
+        "edges": sum(len(targets) for targets in successors.values()),
+        "roots": len(roots),
+        "has_cycle": visited < len(successors),
+    }
+
+def _webhook_path(node):
+    """
+    The path a webhook-style node listens on, or None.
+
+    Only webhook and trigger nodes with a webhookId listen on one: the `path`
+    parameter of other nodes (FTP, SSH, S3, files...) is a remote or local path.
+    """
+    node_type = node.get("type")
+    node_type = node_type.lower() if isinstance(node_type, str) else ''
+    if not node.get("webhookId") or not node_type.endswith(('webhook', 'trigger')):
+        return None
+    parameters = node.get("parameters") or {}
+    path = parameters.get("path") if isinstance(parameters.get("path"), str) else None
+    if not path and node_type.endswith('webhook'):
+        # Webhook nodes without a path listen on their webhook id
+        path = node["webhookId"]
+    return path.strip('/') if path else None
+
+def parse_workflow(workflow_id, name, active, nodes, connections, updated_at):
+    """
+    Extract what the index needs from one workflow row.
+
+    Returns:
+        Dict with the workflow summary and the keys it is indexed under
+    """
+    nodes = [node for node in _load_json(nodes, []) if isinstance(node, dict)]
+    connections = _load_json(connections, {})
+
+    node_types = set()
+    credentials = {}  # credential id (or name, for old exports without ids) -> {id, name, type}
+    node_credentials = set()  # (node type, credential key)
+    webhooks = set()
+
+    for node in nodes:
+        node_type = node.get("type")
+        if node_type:
+            node_types.add(node_type)
+        for credential_type, credential in (node.get("credentials") or {}).items():
+            if isinstance(credential, dict):
+                key = str(credential.get("id") or credential.get("name"))
+                credentials[key] = {"id": credential.get("id"), "name": credential.get("name"), "type": credential_type}
+            else:
+                # Very old workflows reference credentials by name only
+                key = str(credential)
+                credentials[key] = {"id": None, "name": key, "type": credential_type}
+            if node_type:
+                node_credentials.add((node_type, key))
+        path = _webhook_path(node)
+        if path and not node.get("disabled"):
+            webhooks.add(path)
+
+    metrics = graph_metrics([node.get("name") for node in nodes if node.get("name")],
+                            connections if isinstance(connections, dict) else {})
+    return {
+        "id": workflow_id,
+        "name": name,
+        "active": bool(active),
+        "updated_at": updated_at,
+        "nodes": len(nodes),
+        "node_types": node_types,
+        "credentials": credentials,
+        "node_credentials": node_credentials,
+        "webhooks": webhooks,
+        **metrics,
+    }
+
+def _summary(workflow):
+    """A parsed workflow as returned by the API."""
+    return {
+        "id": workflow["id"],
+        "name": workflow["name"],
+        "active": workflow["active"],
+        "updated_at": workflow["updated_at"].isoformat() if workflow["updated_at"] else None,
+        "nodes": workflow["nodes"],
+        "node_types": sorted(workflow["node_types"]),
+        "credentials": sorted(workflow["credentials"].values(), key=lambda credential: str(credential["name"])),
+        "webhooks": sorted(workflow["webhooks"]),
+        "depth": workflow["depth"],
+        "max_fan_out": workflow["max_fan_out"],
+        "edges": workflow["edges"],
+        "roots": workflow["roots"],
+        "has_cycle": workflow["has_cycle"],
+    }
+
+class WorkflowIndex:
+    """Inverted indexes over the workflows of one n8n database."""
+
+    def __init__(self, connection_string):
+        self.connection_string = connection_string
+        self.workflows = {}  # workflow id -> parse_workflow() result
+        self.by_node_type = {}  # node type -> workflow ids
+        self.by_credential = {}  # credential key -> workflow ids
+        self.by_node_credential = {}  # (node type, credential key) -> workflow ids
+        self.by_webhook = {}  # webhook path -> workflow ids
+        self.credential_keys_by_name = {}  # credential name -> credential keys
+        self.updated_at = None  # highest updatedAt loaded
+        self.last_refresh = None
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _index_keys(self, workflow):
+        """(index, key) pairs a workflow is listed under."""
+        keys = [(self.by_node_type, node_type) for node_type in workflow["node_types"]]
+        keys += [(self.by_credential, key) for key in workflow["credentials"]]
+        keys += [(self.by_node_credential, pair) for pair in workflow["node_credentials"]]
+        keys += [(self.by_webhook, path) for path in workflow["webhooks"]]
+        return keys
+
+    def _remove(self, workflow_id):
+        """Drop a workflow from every index. Caller holds self._lock."""
+        workflow = self.workflows.pop(workflow_id, None)
+        if workflow is None:
+            return
+        for index, key in self._index_keys(workflow):
+            members = index.get(key)
+            if members is not None:
+                members.discard(workflow_id)
+                if not members:
+                    del index[key]
+        for key, credential in workflow["credentials"].items():
+            keys = self.credential_keys_by_name.get(credential["name"])
+            if keys is not None and key not in self.by_credential:
+                # No workflow uses the credential any more
+                keys.discard(key)
+                if not keys:
+                    del self.credential_keys_by_name[credential["name"]]
+
+    def _add(self, workflow):
+        """Add a parsed workflow to every index. Caller holds self._lock."""
+        self.workflows[workflow["id"]] = workflow
+        for index, key in self._index_keys(workflow):
+            index.setdefault(key, set()).add(workflow["id"])
+        for key, credential in workflow["credentials"].items():
+            if credential["name"]:
+                self.credential_keys_by_name.setdefault(credential["name"], set()).add(key)
+
+    def refresh(self, force=False):
+        """
+        Load workflows changed since the last refresh and drop deleted ones.
+
+        Args:
+            force: Refresh even if the last refresh is within N8N_WORKFLOW_INDEX_REFRESH_INTERVAL
+
+        Returns:
+            Dict with loaded, removed, workflows and duration
+
+        Raises:
+            QueryError: If PostgreSQL reports an error
+        """
+        requested_at = time.time()
+        with self._refresh_lock:
+            if self.last_refresh is not None:
+                if self.last_refresh >= requested_at:
+                    return self.last_result
+                interval = get_config()["N8N_WORKFLOW_INDEX_REFRESH_INTERVAL"]
+                if not force and requested_at - self.last_refresh < interval:
+                    return self.last_result
+
+            start_time = time.monotonic()
+            table = n8n_table('workflow_entity')
+            loaded = 0
+            try:
+                with pooled_connection(route_connection(self.connection_string, True)) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(sql.SQL(_WORKFLOW_IDS_QUERY).format(table))
+                    current_ids = {row[0] for row in cursor.fetchall()}
+                    cursor.close()
+
+                    # Server-side cursor: a first load reads every workflow's JSON
+                    # without holding all of it in memory at once
+                    cursor = conn.cursor(name='workflow_index')
+                    cursor.itersize = get_config()["N8N_WORKFLOW_INDEX_BATCH_SIZE"]
+                    cursor.execute(
+                        sql.SQL(_CHANGED_WORKFLOWS_QUERY).format(table),
+                        (self.updated_at, self.updated_at, get_config()["N8N_WORKFLOW_INDEX_LOOKBACK"])
+                    )
+                    for workflow_id, name, active, nodes, connections, updated_at in cursor:
+                        known = self.workflows.get(workflow_id)
+                        if known is not None and known["updated_at"] == updated_at:
+                            # Rows in the look-back window are read again; skip unchanged ones
+                            continue
+                        workflow = parse_workflow(workflow_id, name, active, nodes, connections, updated_at)
+                        with self._lock:
+                            self._remove(workflow_id)
+                            self._add(workflow)
+                            if updated_at is not None and (self.updated_at is None or updated_at > self.updated_at):
+                                self.updated_at = updated_at
+                        loaded += 1
+                    cursor.close()
+                    conn.rollback()
+            except psycopg2.Error as e:
+                raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+            with self._lock:
+                removed = [workflow_id for workflow_id in self.workflows if workflow_id not in current_ids]
+                for workflow_id in removed:
+                    self._remove(workflow_id)
+
+            self.last_refresh = time.time()
+            self.last_result = {
+                "loaded": loaded,
+                "removed": len(removed),
+                "workflows": len(self.workflows),
+                "duration": time.monotonic() - start_time,
+            }
+            if loaded or removed:
+                logger.info(f"Workflow index: {loaded} workflows loaded, {len(removed)} removed")
+            return self.last_result
+
+    def _resolve_node_types(self, node_type):
+        """Index keys for a node type, given in full or without its package prefix."""
+        if node_type in self.by_node_type:
+            return [node_type]
+        suffix = '.' + node_type.lower()
+        return [key for key in self.by_node_type if key.lower().endswith(suffix)]
+
+    def _resolve_credentials(self, credential):
+        """Index keys for a credential given by id or by name."""
+        keys = set(self.credential_keys_by_name.get(credential, ()))
+        if credential in self.by_credential:
+            keys.add(credential)
+        return keys
+
+    def find(self, node_type=None, credential=None, webhook=None, active=None):
+        """
+        Find workflows by node type, credential and webhook path.
+
+        Filters combine with AND; node_type together with credential matches
+        workflows where a node of that type itself uses the credential.
+
+        Args:
+            node_type: Node type, e.g. 'n8n-nodes-base.httpRequest' or 'httpRequest'
+            credential: Credential id or name
+            webhook: Webhook path
+            active: Only active (True) or inactive (False) workflows
+
+        Returns:
+            List of workflow summaries
+        """
+        with self._lock:
+            candidates = None
+
+            def narrow(ids):
+                nonlocal candidates
+                candidates = set(ids) if candidates is None else candidates & set(ids)
+
+            if node_type and credential:
+                ids = set()
+                for type_key in self._resolve_node_types(node_type):
+                    for credential_key in self._resolve_credentials(credential):
+                        ids |= self.by_node_credential.get((type_key, credential_key), set())
+                narrow(ids)
+            elif node_type:
+                ids = set()
+                for type_key in self._resolve_node_types(node_type):
+                    ids |= self.by_node_type[type_key]
+                narrow(ids)
+            elif credential:
+                ids = set()
+                for credential_key in self._resolve_credentials(credential):
+                    ids |= self.by_credential[credential_key]
+                narrow(ids)
+
+            if webhook:
+                narrow(self.by_webhook.get(webhook.strip('/'), set()))
+
+            if candidates is None:
+                candidates = self.workflows.keys()
+            workflows = [self.workflows[workflow_id] for workflow_id in candidates]
+            if active is not None:
+                workflows = [workflow for workflow in workflows if workflow["active"] == active]
+            return sorted((_summary(workflow) for workflow in workflows), key=lambda workflow: str(workflow["name"]))
+
+    def overview(self):
+        """Sizes of the indexes and the most used node types and credentials."""
+        with self._lock:
+            return {
+                "workflows": len(self.workflows),
+                "node_types": {key: len(ids) for key, ids in self.by_node_type.items()},
+                "credentials": len(self.by_credential),
+                "webhooks": {path: sorted(ids) for path, ids in self.by_webhook.items()},
+                "last_refresh": self.last_refresh,
+                "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            }
+
+def get_workflow_index(connection_string):
+    """Get the workflow index of an n8n database, creating it on first use."""
+    with _indexes_lock:
+        index = _indexes.get(connection_string)
+        if index is None:
+            index = _indexes[connection_string] = WorkflowIndex(connection_string)
+        return index
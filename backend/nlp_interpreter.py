@@ -4,8 +4,10 @@ Natural language interpreter for Docker and PostgreSQL commands.
 
 import re
 import logging
-from docker_handler import execute_docker_command, get_container_names
-from postgres_handler import execute_postgres_query
+from docker_fleet import run_docker_command
+from container_inventory import get_container_names
+from postgres_handler import execute_postgres_query, QueryError
+from postgres_catalog import list_tables, tables_as_result
 
 logger = logging.getLogger("n8n_ai_assistant_api")
 
@@ -15,7 +17,7 @@ def interpret_natural_language_command(command, docker_host, postgres_connection
     
     Args:
         command: Natural language command
-        docker_host: Docker host URL
+        docker_host: Docker host URL, or a list of URLs
         postgres_connection: PostgreSQL connection string
         
     Returns:
@@ -29,18 +31,18 @@ def interpret_natural_language_command(command, docker_host, postgres_connection
         if any(keyword in command_lower for keyword in ['container', 'docker', 'image', 'volume']):
             # List containers
             if any(keyword in command_lower for keyword in ['list', 'show', 'view']) and 'container' in command_lower:
-                return execute_docker_command('ps -a', docker_host)
+                return run_docker_command('ps -a', docker_host)
             
             # Restart container
             if any(keyword in command_lower for keyword in ['restart', 'reboot']):
                 # Look for container name
                 for container_name in get_container_names(docker_host):
                     if container_name.lower() in command_lower:
-                        return execute_docker_command(f'restart {container_name}', docker_host)
+                        return run_docker_command(f'restart {container_name}', docker_host)
                 
                 # If specifically mentions n8n
                 if 'n8n' in command_lower:
-                    return execute_docker_command('restart n8n', docker_host)
+                    return run_docker_command('restart n8n', docker_host)
                 
                 return "Please specify which container you want to restart"
             
@@ -55,22 +57,22 @@ def interpret_natural_language_command(command, docker_host, postgres_connection
                         if match:
                             lines = int(match.group(1))
                         
-                        return execute_docker_command(f'logs --tail {lines} {container_name}', docker_host)
+                        return run_docker_command(f'logs --tail {lines} {container_name}', docker_host)
                 
                 # If specifically mentions n8n
                 if 'n8n' in command_lower:
-                    return execute_docker_command('logs --tail 100 n8n', docker_host)
+                    return run_docker_command('logs --tail 100 n8n', docker_host)
                 
                 return "Please specify which container logs you want to see"
             
             # Container statistics
             if any(keyword in command_lower for keyword in ['stats', 'statistics', 'status', 'usage']):
-                return execute_docker_command('stats --no-stream', docker_host)
+                return run_docker_command('stats --no-stream', docker_host)
             
             # List images
             if any(keyword in command_lower for keyword in ['image', 'images']):
                 if any(keyword in command_lower for keyword in ['list', 'show', 'view']):
-                    return execute_docker_command('images', docker_host)
+                    return run_docker_command('images', docker_host)
             
             # If no specific Docker command is recognized
             return "Could not interpret Docker command. Please be more specific or use direct Docker syntax."
@@ -95,13 +97,14 @@ def interpret_natural_language_command(command, docker_host, postgres_connection
                     if match:
                         schema = match.group(1)
                 
-                return execute_postgres_query(
-                    f"SELECT table_name, (xpath('/row/cnt/text()', xml_count))[1]::text::int as row_count "
-                    f"FROM (SELECT table_name, table_schema, "
-                    f"query_to_xml('select count(*) as cnt from ' || table_schema || '.' || table_name, false, true, '') as xml_count "
-                    f"FROM information_schema.tables WHERE table_schema = '{schema}') t ORDER BY table_name;", 
-                    postgres_connection
-                )
+                if not postgres_connection:
+                    return "No PostgreSQL connection string provided"
+                
+                # Estimated row counts: counting every table would scan them all
+                try:
+                    return tables_as_result(list_tables(postgres_connection, schema)).to_text()
+                except QueryError as e:
+                    return str(e)
             
             # View table schema
             if 'schema' in command_lower:
@@ -0,0 +1,330 @@
+"""
+PostgreSQL catalog introspection for the n8n AI Assistant Pro backend.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import QueryCanceledError
+from config import get_config
+from postgres_pool import pooled_connection
+from postgres_handler import QueryError, QueryRejectedError, QueryResult
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Row counts come from the planner statistics: reltuples scaled to the current
+# relation size (what the planner itself does), falling back to n_live_tup
+TABLE_ESTIMATES_QUERY = """
+SELECT
+    c.relname AS table_name,
+    c.relkind,
+    CASE
+        WHEN c.reltuples < 0 THEN NULL
+        WHEN c.relpages > 0 THEN round(
+            (c.reltuples / c.relpages)
+            * (pg_relation_size(c.oid) / current_setting('block_size')::int)
+        )::bigint
+        ELSE c.reltuples::bigint
+    END AS estimated_rows,
+    s.n_live_tup,
+    s.last_analyze IS NOT NULL OR s.last_autoanalyze IS NOT NULL AS analyzed,
+    pg_size_pretty(pg_total_relation_size(c.oid)) AS total_size
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+ORDER BY c.relname;
+"""
+
+COUNT_MODES = ('estimate', 'exact')
+
+# Changes whenever DDL touches a schema's relations: any CREATE/ALTER/DROP
+# rewrites, inserts or deletes their rows in these catalogs, moving the max
+# xmin or row count. Only the schema's own rows are read (through the catalog
+# indexes on relation oid), so DDL elsewhere, temp tables included, leaves it as is.
+CATALOG_FINGERPRINT_QUERY = """
+WITH rels AS (
+    SELECT c.oid, c.xmin FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = %s
+)
+SELECT concat_ws(':',
+    (SELECT max(xmin::text::bigint) FROM rels), (SELECT count(*) FROM rels),
+    (SELECT max(a.xmin::text::bigint) FROM pg_attribute a WHERE a.attrelid IN (SELECT oid FROM rels)),
+    (SELECT count(*) FROM pg_attribute a WHERE a.attrelid IN (SELECT oid FROM rels)),
+    (SELECT max(k.xmin::text::bigint) FROM pg_constraint k WHERE k.conrelid IN (SELECT oid FROM rels)),
+    (SELECT count(*) FROM pg_constraint k WHERE k.conrelid IN (SELECT oid FROM rels)),
+    (SELECT max(d.xmin::text::bigint) FROM pg_attrdef d WHERE d.adrelid IN (SELECT oid FROM rels)),
+    (SELECT count(*) FROM pg_attrdef d WHERE d.adrelid IN (SELECT oid FROM rels))
+)
+"""
+
+# Columns, indexes and constraints of every relation in a schema, plus the
+# schema's catalog fingerprint, in a single round trip
+SCHEMA_SNAPSHOT_QUERY = """
+SELECT
+    c.relname,
+    COALESCE((
+        SELECT json_agg(json_build_object(
+            'column_name', a.attname,
+            'data_type', format_type(a.atttypid, a.atttypmod),
+            'is_nullable', CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END,
+            'column_default', pg_get_expr(d.adbin, d.adrelid),
+            'ordinal_position', a.attnum
+        ) ORDER BY a.attnum)
+        FROM pg_attribute a
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    ), '[]') AS columns,
+    COALESCE((
+        SELECT json_agg(json_build_object(
+            'indexname', i.relname,
+            'indexdef', pg_get_indexdef(i.oid)
+        ) ORDER BY i.relname)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = c.oid
+    ), '[]') AS indexes,
+    COALESCE((
+        SELECT json_agg(json_build_object(
+            'constraint_name', k.conname,
+            'constraint_type', CASE k.contype
+                WHEN 'p' THEN 'PRIMARY KEY' WHEN 'f' THEN 'FOREIGN KEY'
+                WHEN 'u' THEN 'UNIQUE' WHEN 'c' THEN 'CHECK'
+                WHEN 'x' THEN 'EXCLUDE' ELSE k.contype::text END,
+            'definition', pg_get_constraintdef(k.oid)
+        ) ORDER BY k.conname)
+        FROM pg_constraint k
+        WHERE k.conrelid = c.oid
+    ), '[]') AS constraints,
+    (""" + CATALOG_FINGERPRINT_QUERY + """) AS fingerprint
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+ORDER BY c.relname;
+"""
+
+# Module-level variables
+_schema_cache = OrderedDict()  # (connection_string, schema) -> entry dict, least recently used first
+_schema_cache_lock = threading.Lock()
+_schema_cache_stats = {
+    "hits": 0,
+    "validations": 0,
+    "loads": 0,
+    "invalidations": 0,
+    "evictions": 0,
+}
+
+def _estimated_count(estimated_rows, n_live_tup, analyzed):
+    """Pick the best available estimate and the mode that produced it."""
+    # Tables that were never analyzed report reltuples = 0 on older servers
+    if estimated_rows is not None and (analyzed or estimated_rows > 0 or n_live_tup is None):
+        return estimated_rows, 'estimate'
+    if n_live_tup is not None:
+        return n_live_tup, 'stats'
+    return None, 'unknown'
+
+def _exact_counts(conn, schema, tables, budget):
+    """
+    Replace estimates with exact counts while the time budget lasts.
+
+    Each count runs in its own transaction with a statement timeout equal to
+    the remaining budget. Tables that time out or are reached after the
+    budget is spent keep their estimate.
+    """
+    deadline = time.monotonic() + budget
+    cursor = conn.cursor()
+
+    for table in tables:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            table["exact_count_skipped"] = True
+            continue
+
+        try:
+            cursor.execute(f"SET LOCAL statement_timeout = {remaining_ms};")
+            cursor.execute(sql.SQL("SELECT count(*) FROM {}.{};").format(
+                sql.Identifier(schema), sql.Identifier(table["table_name"])
+            ))
+            table["row_count"] = cursor.fetchone()[0]
+            table["row_count_mode"] = 'exact'
+        except QueryCanceledError:
+            table["exact_count_skipped"] = True
+        except psycopg2.Error as e:
+            logger.warning(f"Could not count rows of {schema}.{table['table_name']}: {str(e).strip()}")
+            table["exact_count_skipped"] = True
+        finally:
+            # Ends the transaction, which also resets the SET LOCAL timeout
+            conn.rollback()
+
+    cursor.close()
+
+def list_tables(connection_string, schema='public', count_mode='estimate'):
+    """
+    List the tables of a schema with their row counts and sizes.
+
+    Args:
+        connection_string: PostgreSQL connection string
+        schema: Schema name
+        count_mode: 'estimate' to read planner statistics (fast), or 'exact'
+            to run count(*) per table within POSTGRES_EXACT_COUNT_BUDGET
+
+    Returns:
+        List of dicts with table_name, row_count, row_count_mode and total_size.
+        row_count_mode is 'exact', 'estimate' (pg_class.reltuples),
+        'stats' (pg_stat_user_tables.n_live_tup) or 'unknown'.
+
+    Raises:
+        QueryRejectedError: If the connection string is missing
+        QueryError: If PostgreSQL reports an error
+    """
+    if not connection_string:
+        raise QueryRejectedError("No PostgreSQL connection string provided")
+
+    if count_mode not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode '{count_mode}'")
+
+    try:
+        with pooled_connection(connection_string) as conn:
+            cursor = conn.cursor()
+            cursor.execute(TABLE_ESTIMATES_QUERY, (schema,))
+            rows = cursor.fetchall()
+            cursor.close()
+            conn.rollback()
+
+            tables = []
+            for table_name, relkind, estimated_rows, n_live_tup, analyzed, total_size in rows:
+                if relkind == 'v':
+                    # Views have no statistics of their own
+                    row_count, mode = None, 'unknown'
+                else:
+                    row_count, mode = _estimated_count(estimated_rows, n_live_tup, analyzed)
+                tables.append({
+                    "table_name": table_name,
+                    "row_count": row_count,
+                    "row_count_mode": mode,
+                    "total_size": total_size,
+                })
+
+            if count_mode == 'exact':
+                _exact_counts(conn, schema, tables, get_config()["POSTGRES_EXACT_COUNT_BUDGET"])
+
+            return tables
+
+    except psycopg2.Error as e:
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+def tables_as_result(tables):
+    """Wrap a list_tables() result in a QueryResult for text rendering."""
+    columns = ["table_name", "row_count", "row_count_mode", "total_size"]
+    rows = [tuple(table[column] for column in columns) for table in tables]
+    return QueryResult(columns, rows, len(rows))
+
+def _load_schema_snapshot(connection_string, schema):
+    """Load the catalog snapshot of a schema in one round trip."""
+    with pooled_connection(connection_string) as conn:
+        cursor = conn.cursor()
+        cursor.execute(SCHEMA_SNAPSHOT_QUERY, (schema, schema))
+        rows = cursor.fetchall()
+        fingerprint = rows[0][4] if rows else None
+        if fingerprint is None:
+            # Empty schema: the fingerprint still has to be read on its own
+            cursor.execute(CATALOG_FINGERPRINT_QUERY, (schema,))
+            fingerprint = cursor.fetchone()[0]
+        cursor.close()
+
+    tables = {
+        relname: {"columns": columns, "indexes": indexes, "constraints": constraints}
+        for relname, columns, indexes, constraints, _ in rows
+    }
+    return tables, fingerprint
+
+def _read_fingerprint(connection_string, schema):
+    """Read the current catalog fingerprint of a schema."""
+    with pooled_connection(connection_string) as conn:
+        cursor = conn.cursor()
+        cursor.execute(CATALOG_FINGERPRINT_QUERY, (schema,))
+        fingerprint = cursor.fetchone()[0]
+        cursor.close()
+    return fingerprint
+
+def get_schema_snapshot(connection_string, schema='public', force_refresh=False):
+    """
+    Get the columns, indexes and constraints of every relation in a schema.
+
+    Snapshots are cached per connection string and schema. Within
+    SCHEMA_CACHE_CHECK_INTERVAL a cached snapshot is returned as is; after
+    that the schema's catalog fingerprint is compared and the snapshot is
+    reloaded only if DDL changed the schema's relations. Snapshots older than SCHEMA_CACHE_TTL
+    are always reloaded.
+
+    Returns:
+        Dict mapping relation name to {"columns", "indexes", "constraints"}
+
+    Raises:
+        QueryError: If PostgreSQL reports an error
+    """
+    config = get_config()
+    key = (connection_string, schema)
+    now = time.monotonic()
+
+    with _schema_cache_lock:
+        entry = _schema_cache.get(key)
+        if entry is not None and not force_refresh and now - entry["loaded_at"] < config["SCHEMA_CACHE_TTL"]:
+            if now - entry["checked_at"] < config["SCHEMA_CACHE_CHECK_INTERVAL"]:
+                _schema_cache.move_to_end(key)
+                _schema_cache_stats["hits"] += 1
+                return entry["tables"]
+        else:
+            entry = None
+
+    try:
+        if entry is not None:
+            # Cheap validation: one small query instead of reloading the snapshot
+            fingerprint = _read_fingerprint(connection_string, schema)
+            with _schema_cache_lock:
+                _schema_cache_stats["validations"] += 1
+                if fingerprint == entry["fingerprint"]:
+                    entry["checked_at"] = time.monotonic()
+                    if key in _schema_cache:
+                        _schema_cache.move_to_end(key)
+                    return entry["tables"]
+                _schema_cache_stats["invalidations"] += 1
+
+        tables, fingerprint = _load_schema_snapshot(connection_string, schema)
+
+    except psycopg2.Error as e:
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+    loaded_at = time.monotonic()
+    with _schema_cache_lock:
+        _schema_cache_stats["loads"] += 1
+        _schema_cache[key] = {
+            "tables": tables,
+            "fingerprint": fingerprint,
+            "loaded_at": loaded_at,
+            "checked_at": loaded_at,
+        }
+        _schema_cache.move_to_end(key)
+        while len(_schema_cache) > config["SCHEMA_CACHE_SIZE"]:
+            _schema_cache.popitem(last=False)
+            _schema_cache_stats["evictions"] += 1
+
+    return tables
+
+def invalidate_schema_cache(connection_string=None):
+    """Drop cached snapshots, for one connection string or all of them."""
+    with _schema_cache_lock:
+        for key in list(_schema_cache):
+            if connection_string is None or key[0] == connection_string:
+                del _schema_cache[key]
+
+def get_schema_cache_stats():
+    """Return schema cache statistics."""
+    with _schema_cache_lock:
+        stats = dict(_schema_cache_stats)
+        stats["entries"] = len(_schema_cache)
+    return stats
@@ -0,0 +1,110 @@
+"""
+Query plan analysis for the n8n AI Assistant Pro backend.
+"""
+
+import psycopg2
+from postgres_pool import pooled_connection
+from postgres_handler import validate_query, route_connection, QueryError, QueryRejectedError
+
+# Most expensive nodes a caller can ask for
+MAX_TOP_NODES = 50
+
+def _walk_plan(node, depth=0):
+    """Yield (node, depth) for a plan node and all of its descendants."""
+    yield node, depth
+    for child in node.get("Plans", []):
+        yield from _walk_plan(child, depth + 1)
+
+def _node_summary(node, depth, analyzed):
+    """
+    Describe one plan node, with the time (or cost) spent in the node itself.
+
+    Actual times in EXPLAIN ANALYZE are per loop and include the children,
+    so the exclusive time is total * loops minus the children's totals.
+    """
+    children = node.get("Plans", [])
+    if analyzed:
+        loops = node.get("Actual Loops", 1) or 1
+        inclusive = node.get("Actual Total Time", 0.0) * loops
+        children_total = sum(child.get("Actual Total Time", 0.0) * (child.get("Actual Loops", 1) or 1)
+                             for child in children)
+    else:
+        loops = None
+        inclusive = node.get("Total Cost", 0.0)
+        children_total = sum(child.get("Total Cost", 0.0) for child in children)
+
+    summary = {
+        "node_type": node.get("Node Type"),
+        "relation": node.get("Relation Name"),
+        "index": node.get("Index Name"),
+        "depth": depth,
+        "plan_rows": node.get("Plan Rows"),
+        "total_cost": node.get("Total Cost"),
+    }
+    if analyzed:
+        summary.update({
+            "exclusive_time_ms": round(max(inclusive - children_total, 0.0), 3),
+            "inclusive_time_ms": round(inclusive, 3),
+            "actual_rows": node.get("Actual Rows", 0) * loops,
+            "loops": loops,
+            "shared_hit_blocks": node.get("Shared Hit Blocks"),
+            "shared_read_blocks": node.get("Shared Read Blocks"),
+        })
+    else:
+        summary["exclusive_cost"] = round(max(inclusive - children_total, 0.0), 3)
+    return summary
+
+def explain_query(query, connection_string, analyze=True, top=5):
+    """
+    Run EXPLAIN on a single statement and rank its most expensive plan nodes.
+
+    With analyze=True the statement is really executed (with buffer
+    statistics) inside a transaction that is always rolled back, so
+    modifications are not kept.
+
+    Args:
+        query: SQL statement to explain
+        connection_string: PostgreSQL connection string
+        analyze: Use EXPLAIN ANALYZE instead of a plan-only EXPLAIN
+        top: Number of expensive nodes to return
+
+    Returns:
+        Dict with the plan tree, planning/execution times and the most
+        expensive nodes by exclusive time (or cost without analyze)
+
+    Raises:
+        QueryRejectedError: If the query is rejected or has several statements
+        QueryError: If PostgreSQL reports an error
+    """
+    classification = validate_query(query, connection_string)
+    if len(classification.statements) != 1:
+        raise QueryRejectedError("EXPLAIN accepts exactly one statement")
+    
+    # Plan-only EXPLAIN never executes anything, so it can always use the replica
+    target = route_connection(connection_string, classification.is_read_only or not analyze)
+
+    statement = query.strip().rstrip(';')
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+
+    try:
+        with pooled_connection(target) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"EXPLAIN ({options}) {statement}")
+            explain = cursor.fetchone()[0][0]
+            cursor.close()
+            # Whatever ANALYZE executed must not be kept
+            conn.rollback()
+    except psycopg2.Error as e:
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+    nodes = [_node_summary(node, depth, analyze) for node, depth in _walk_plan(explain["Plan"])]
+    sort_key = "exclusive_time_ms" if analyze else "exclusive_cost"
+    nodes.sort(key=lambda node: node[sort_key], reverse=True)
+
+    return {
+        "analyzed": analyze,
+        "plan": explain["Plan"],
+        "planning_time_ms": explain.get("Planning Time"),
+        "execution_time_ms": explain.get("Execution Time"),
+        "expensive_nodes": nodes[:top],
+    }
@@ -2,108 +2,393 @@
 PostgreSQL interaction functionality for the n8n AI Assistant Pro backend.
 """
 
+import math
 import psycopg2
-import re
+import uuid
 import logging
+import time
+import datetime
+from decimal import Decimal
 from config import get_config
+from postgres_pool import pooled_connection
+from query_cache import get_result_cache
+from sql_utils import normalize_sql, classify_query
+from slow_query_log import record_query
 
 logger = logging.getLogger("n8n_ai_assistant_api")
 
 def create_postgres_connection(connection_string):
-    """Create and return a PostgreSQL connection."""
+    """Create and return a dedicated (non-pooled) PostgreSQL connection."""
     return psycopg2.connect(connection_string)
 
 def is_dangerous_query(query):
-    """Detect if a SQL query is potentially dangerous."""
-    dangerous_patterns = [
-        r"delete\s+from\s+\w+\s*;?$",
-        r"truncate\s+table\s+\w+\s*;?$",
-        r"drop\s+table\s+\w+\s*;?$",
-        r"update\s+\w+\s+set\s+.+;?$"
-    ]
-    for pattern in dangerous_patterns:
-        if re.search(pattern, query, re.IGNORECASE):
-            return True
-    return False
-
-def execute_postgres_query(query, connection_string):
-    """
-    Execute a SQL query on PostgreSQL.
+    """
+    Detect if a SQL query is potentially dangerous.
+    
+    DELETE or UPDATE without a WHERE clause (also inside CTEs), TRUNCATE and
+    DROP TABLE/SCHEMA/DATABASE are dangerous, in any statement of the query.
+    """
+    return classify_query(query).is_dangerous
+
+def is_streamable_query(query):
+    """
+    Check whether a query can run on a named server-side cursor.
+    
+    Only single, row-returning statements qualify: DECLARE CURSOR rejects
+    multiple statements and data-modifying statements.
+    """
+    return classify_query(query).is_streamable
+
+def route_connection(connection_string, read_only):
+    """
+    Pick the connection string a statement should run on.
+    
+    Read-only statements against the default database go to the read replica
+    when POSTGRES_READ_REPLICA_CONNECTION is configured; everything else runs
+    on the primary.
+    """
+    config = get_config()
+    replica = config["POSTGRES_READ_REPLICA_CONNECTION"]
+    if read_only and replica and connection_string == config["DEFAULT_POSTGRES_CONNECTION"]:
+        return replica
+    return connection_string
+
+def fetch_limited_rows(cursor, limit, batch_size, on_batch=None):
+    """
+    Fetch at most limit + 1 rows from a cursor in fetchmany batches.
+    
+    The extra row is only used to know whether the result was truncated, so
+    no more than one batch beyond the limit is ever held in memory.
     
     Args:
+        cursor: Cursor with a pending result
+        limit: Maximum number of rows to return
+        batch_size: Rows per fetchmany call
+        on_batch: Optional callback called with the number of rows fetched so far
+    
+    Returns:
+        Tuple (rows, truncated) with at most limit rows
+    """
+    rows = []
+    wanted = limit + 1
+    while len(rows) < wanted:
+        batch = cursor.fetchmany(min(batch_size, wanted - len(rows)))
+        if not batch:
+            break
+        rows.extend(batch)
+        if on_batch is not None:
+            on_batch(len(rows))
+    truncated = len(rows) > limit
+    return rows[:limit], truncated
+
+class QueryError(Exception):
+    """Raised when a query cannot be executed or PostgreSQL reports an error."""
+
+class QueryRejectedError(QueryError):
+    """Raised when a query is rejected before it reaches PostgreSQL."""
+
+class QueryResult:
+    """
+    Result of a PostgreSQL query.
+    
+    Attributes:
+        columns: Column names, or None for statements that return no rows
+        rows: Row tuples with the values as returned by psycopg2
+        rowcount: Rows returned (queries) or rows affected (modifications)
+        truncated: Whether more rows were available than MAX_RESULTS
+        total_rows: Total number of rows when known, None otherwise
+        cached: Whether the result was served from the result cache
+    """
+    
+    def __init__(self, columns, rows, rowcount, truncated=False, total_rows=None, cached=False):
+        self.columns = columns
+        self.rows = rows
+        self.rowcount = rowcount
+        self.truncated = truncated
+        self.total_rows = total_rows
+        self.cached = cached
+    
+    def as_cached(self):
+        """Return a copy marked as served from the cache (rows are shared, not copied)."""
+        return QueryResult(self.columns, self.rows, self.rowcount, self.truncated, self.total_rows, cached=True)
+    
+    @property
+    def is_modification(self):
+        """Whether the statement returned no rows (INSERT, UPDATE, DDL, etc.)."""
+        return self.columns is None
+    
+    @property
+    def truncation_message(self):
+        """Human readable description of the truncation, empty if not truncated."""
+        if not self.truncated:
+            return ""
+        if self.total_rows is not None:
+            return f"... (showing {len(self.rows)} of {self.total_rows} results)"
+        return f"... (showing {len(self.rows)} of more than {len(self.rows)} results)"
+    
+    def records(self):
+        """Return the rows as dicts keyed by column name, with JSON-safe values."""
+        columns = self.columns or []
+        return [
+            {column: to_json_value(value) for column, value in zip(columns, row)}
+            for row in self.rows
+        ]
+    
+    def to_text(self):
+        """Render the result as the tab-separated table used by /execute."""
+        if self.is_modification:
+            return f"Query executed successfully. Rows affected: {self.rowcount}"
+        
+        lines = ['\t'.join(self.columns)]
+        lines.append('-' * (sum(len(name) for name in self.columns) + (len(self.columns) - 1) * 1))
+        lines.extend('\t'.join(str(cell) for cell in row) for row in self.rows)
+        result = '\n'.join(lines) + '\n'
+        if self.truncated:
+            result += f"\n{self.truncation_message}"
+        return result
+
+def _non_finite_text(value):
+    """PostgreSQL's spelling of a NaN or infinite number ('NaN', 'Infinity', '-Infinity')."""
+    if value.is_nan() if isinstance(value, Decimal) else math.isnan(value):
+        return 'NaN'
+    return 'Infinity' if value > 0 else '-Infinity'
+
+def to_json_value(value):
+    """
+    Convert a value returned by psycopg2 into something jsonify can encode.
+    
+    NaN and infinite numeric/float8 values become strings: JSON has no
+    literal for them.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return _non_finite_text(value)
+    if value is None or isinstance(value, (bool, int, float, str, dict)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            return _non_finite_text(value)
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    return str(value)
+
+def validate_query(query, connection_string):
+    """
+    Reject queries that must not reach PostgreSQL.
+    
+    Returns:
+        QueryClassification of the query
+    
+    Raises:
+        QueryRejectedError: If the query or connection string is missing, or
+            the query is considered dangerous
+    """
+    # Check for empty query
+    if not query:
+        raise QueryRejectedError("Empty SQL query")
+    
+    # Check for missing connection string
+    if not connection_string:
+        raise QueryRejectedError("No PostgreSQL connection string provided")
+    
+    # Check for dangerous queries
+    classification = classify_query(query)
+    if classification.is_dangerous:
+        raise QueryRejectedError("Query rejected for security reasons. Operations that can modify the database massively without specific conditions are not allowed.")
+    
+    return classification
+
+def execute_on_connection(conn, query, on_batch=None, classification=None):
+    """
+    Execute a query on a connection that is already checked out.
+    
+    Args:
+        conn: psycopg2 connection
         query: SQL query to execute
-        connection_string: PostgreSQL connection string
+        on_batch: Optional callback called with the number of rows fetched so far
+        classification: QueryClassification, if the caller already has one
         
     Returns:
-        Result of the query execution
+        QueryResult with at most MAX_RESULTS rows
     """
+    classification = classification or classify_query(query)
+    start_time = time.monotonic()
     try:
-        # Check for empty query
-        if not query:
-            return "Empty SQL query"
-        
-        # Check for missing connection string
-        if not connection_string:
-            return "No PostgreSQL connection string provided"
+        result = _execute_on_connection(conn, query, on_batch, classification)
+    except psycopg2.Error as e:
+        # Timeouts are usually the slowest queries of all
+        _record_slow_query(conn, query, start_time, error=str(e).strip())
+        raise
+    _record_slow_query(conn, query, start_time, rows=result.rowcount)
+    return result
+
+def _record_slow_query(conn, query, start_time, rows=None, error=None):
+    """Pass the query timing to the slow query log."""
+    duration_ms = (time.monotonic() - start_time) * 1000
+    try:
+        database = conn.info.dbname
+    except psycopg2.Error:
+        database = None
+    record_query(query, duration_ms, rows=rows, database=database, error=error)
+
+def _execute_on_connection(conn, query, on_batch, classification):
+    """Run a query and fetch its rows; see execute_on_connection."""
+    config = get_config()
+    max_results = config["MAX_RESULTS"]
+    stream = config["POSTGRES_STREAM_RESULTS"] and classification.is_streamable
+    
+    if stream:
+        # Named cursor: rows stay on the server until fetched in batches
+        cursor = conn.cursor(name=f"n8n_ai_{uuid.uuid4().hex}")
+        cursor.itersize = config["POSTGRES_FETCH_BATCH_SIZE"]
+    else:
+        cursor = conn.cursor()
+    
+    # Execute the query
+    cursor.execute(query)
+    
+    # Named cursors only get a description after the first fetch
+    if stream or cursor.description is not None:
+        # Stop fetching one row past the limit so the truncation flag stays exact
+        rows, truncated = fetch_limited_rows(cursor, max_results, config["POSTGRES_FETCH_BATCH_SIZE"], on_batch)
+        columns = [desc[0] for desc in cursor.description]
+        total_rows = None if stream else cursor.rowcount
+        result = QueryResult(columns, rows, len(rows), truncated, total_rows)
+    else:
+        # For queries that don't return results (INSERT, UPDATE, etc.)
+        conn.commit()
+        result = QueryResult(None, [], cursor.rowcount)
+    
+    # The pool rolls back anything left open when the connection is released
+    cursor.close()
+    return result
+
+def run_postgres_query(query, connection_string, use_cache=True, refresh_cache=False, cache_ttl=None, store_cache=True):
+    """
+    Execute a SQL query on PostgreSQL and return a structured result.
+    
+    Read-only statements are served from the result cache when possible.
+    
+    Args:
+        query: SQL query to execute
+        connection_string: PostgreSQL connection string
+        use_cache: Look up and store read-only results in the result cache
+        refresh_cache: Skip the cache lookup but store the fresh result
+            (Cache-Control: no-cache)
+        cache_ttl: Seconds to keep this result (defaults to QUERY_CACHE_TTL)
+        store_cache: Store the fresh result; False for Cache-Control: no-store
         
-        # Establish PostgreSQL connection
-        conn = create_postgres_connection(connection_string)
+    Returns:
+        QueryResult with at most MAX_RESULTS rows
         
-        if not conn:
-            return "Could not establish PostgreSQL connection"
+    Raises:
+        QueryRejectedError: If the query is empty or considered dangerous
+        QueryError: If PostgreSQL reports an error
+    """
+    classification = validate_query(query, connection_string)
+    
+    cache = get_result_cache() if use_cache else None
+    cache_key = None
+    if cache is not None and classification.is_read_only:
+        cache_key = (connection_string, normalize_sql(query))
+        if refresh_cache:
+            cache.record_bypass()
+        else:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached.as_cached()
+    
+    try:
+        # Borrow a pooled connection (statement_timeout is set once per session);
+        # reads may be served by the replica
+        target = route_connection(connection_string, classification.is_read_only)
+        with pooled_connection(target) as conn:
+            result = execute_on_connection(conn, query, classification=classification)
         
-        cursor = conn.cursor()
+        if cache_key is not None:
+            if store_cache:
+                cache.put(cache_key, result, cache_ttl)
+        elif result.is_modification and cache is not None:
+            # Cached reads on this connection may no longer be current
+            cache.invalidate(connection_string)
         
-        # Check for dangerous queries
-        if is_dangerous_query(query):
-            cursor.close()
-            conn.close()
-            return "Query rejected for security reasons. Operations that can modify the database massively without specific conditions are not allowed."
+        return result
         
-        # Set timeout for long queries
-        config = get_config()
-        cursor.execute(f"SET statement_timeout = {config['COMMAND_TIMEOUT'] * 1000};")
+    except psycopg2.Error as e:
+        # Handle specific PostgreSQL errors
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+def stream_postgres_query(query, connection_string, batch_size=None):
+    """
+    Stream the rows of a SELECT query without the MAX_RESULTS cap.
+    
+    Rows are read from a named server-side cursor in batches and handed out
+    as soon as they arrive, so memory use does not depend on the result size.
+    The pooled connection is held until the generator is exhausted or closed.
+    
+    Args:
+        query: Single row-returning SQL statement
+        connection_string: PostgreSQL connection string
+        batch_size: Rows per fetch (defaults to POSTGRES_FETCH_BATCH_SIZE)
         
-        # Execute the query
-        cursor.execute(query)
+    Yields:
+        The list of column names first, then lists of row tuples
         
-        # Try to get results
-        try:
-            rows = cursor.fetchall()
+    Raises:
+        QueryRejectedError: If the query cannot be streamed
+        QueryError: If PostgreSQL reports an error
+    """
+    if not query:
+        raise QueryRejectedError("Empty SQL query")
+    
+    if not connection_string:
+        raise QueryRejectedError("No PostgreSQL connection string provided")
+    
+    if not is_streamable_query(query):
+        raise QueryRejectedError("Only single SELECT, WITH, VALUES or TABLE statements can be streamed")
+    
+    batch_size = batch_size or get_config()["POSTGRES_FETCH_BATCH_SIZE"]
+    
+    try:
+        with pooled_connection(route_connection(connection_string, True)) as conn:
+            # Rolling back on release also closes the server-side cursor
+            cursor = conn.cursor(name=f"n8n_ai_{uuid.uuid4().hex}")
+            cursor.execute(query)
             
-            # Get column names
-            column_names = [desc[0] for desc in cursor.description]
+            # The description is only known once the first batch is fetched
+            batch = cursor.fetchmany(batch_size)
+            yield [desc[0] for desc in cursor.description]
             
-            # Format results as a table
-            result = '\t'.join(column_names) + '\n'
-            result += '-' * (sum(len(name) for name in column_names) + (len(column_names) - 1) * 1) + '\n'
+            while batch:
+                yield batch
+                batch = cursor.fetchmany(batch_size)
             
-            # Limit results if too many
-            max_results = config["MAX_RESULTS"]
-            if len(rows) > max_results:
-                limited_rows = rows[:max_results]
-                for row in limited_rows:
-                    result += '\t'.join(str(cell) for cell in row) + '\n'
-                result += f"\n... (showing {max_results} of {len(rows)} results)"
-            else:
-                for row in rows:
-                    result += '\t'.join(str(cell) for cell in row) + '\n'
-                
-        except psycopg2.ProgrammingError:
-            # For queries that don't return results (INSERT, UPDATE, etc.)
-            conn.commit()
-            result = f"Query executed successfully. Rows affected: {cursor.rowcount}"
-        
-        # Close cursor and connection
-        cursor.close()
-        conn.close()
-        
-        return result
-        
     except psycopg2.Error as e:
-        # Handle specific PostgreSQL errors
-        error_message = str(e).strip()
-        return f"PostgreSQL Error: {error_message}"
+        raise QueryError(f"PostgreSQL Error: {str(e).strip()}") from e
+
+def execute_postgres_query(query, connection_string, refresh_cache=False, store_cache=True):
+    """
+    Execute a SQL query on PostgreSQL and render the result as text.
+    
+    Args:
+        query: SQL query to execute
+        connection_string: PostgreSQL connection string
+        refresh_cache: Skip the result cache lookup (Cache-Control: no-cache)
+        store_cache: Store the fresh result (False for Cache-Control: no-store)
+        
+    Returns:
+        Result of the query execution
+    """
+    try:
+        return run_postgres_query(
+            query, connection_string, refresh_cache=refresh_cache, store_cache=store_cache
+        ).to_text()
+    except QueryError as e:
+        return str(e)
     except Exception as e:
         logger.error(f"Error executing PostgreSQL query: {str(e)}", exc_info=True)
-        return f"Error executing PostgreSQL query: {str(e)}"
\ No newline at end of file
+        return f"Error executing PostgreSQL query: {str(e)}"
@@ -0,0 +1,348 @@
+"""
+PostgreSQL connection pooling for the n8n AI Assistant Pro backend.
+
+One bounded pool is kept per connection string. Sessions are configured
+(statement timeout) when they are opened, reset when they are returned, and
+reused across requests.
+"""
+
+import atexit
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from config import get_config
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Module-level variables
+_pools = OrderedDict()  # connection string -> ConnectionPool, least recently used first
+_pools_lock = threading.Lock()
+_reaper = None
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of connections for one connection string."""
+
+    def __init__(self, connection_string, max_size, idle_timeout, acquire_timeout,
+                 health_check_interval, statement_timeout_ms):
+        self.connection_string = connection_string
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.statement_timeout_ms = statement_timeout_ms
+
+        self._condition = threading.Condition()
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0   # open connections, idle and checked out
+        self._closed = False
+        self.last_used = time.monotonic()
+
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "evicted_idle": 0,
+            "failed_health_checks": 0,
+            "checkout_time_total_ms": 0.0,
+            "checkout_time_max_ms": 0.0,
+        }
+
+    def _open(self):
+        """
+        Open a new session.
+
+        The statement timeout goes in the startup packet, so it costs no round
+        trip and is the session default that DISCARD ALL resets to.
+        """
+        options = extensions.parse_dsn(self.connection_string).get('options', '')
+        options = f"{options} -c statement_timeout={int(self.statement_timeout_ms)}".strip()
+        return psycopg2.connect(self.connection_string, options=options)
+
+    def _reset_session(self, conn):
+        """
+        Drop session state a request may have committed (SET, SET ROLE,
+        search_path, prepared statements, temp tables, LISTEN), so the next
+        checkout starts clean with the session defaults from _open().
+        """
+        # DISCARD ALL cannot run inside a transaction block
+        conn.autocommit = True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DISCARD ALL;")
+            cursor.close()
+        finally:
+            conn.autocommit = False
+
+    def _close(self, conn):
+        """Close a connection, ignoring errors from already broken sessions."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._stats["closed"] += 1
+
+    def _is_healthy(self, conn, last_used):
+        """Check that an idle connection can still be used."""
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1;")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _evict_idle(self):
+        """Close idle connections that have not been used for too long. Caller holds the lock."""
+        now = time.monotonic()
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                self._close(conn)
+                self._size -= 1
+                self._stats["evicted_idle"] += 1
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+
+    def acquire(self):
+        """
+        Check a connection out of the pool.
+
+        Reuses a healthy idle connection when possible, opens a new one while the
+        pool is below its maximum size and otherwise waits for a release.
+
+        Raises:
+            PoolTimeoutError: If no connection is available within acquire_timeout
+        """
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+        waited = False
+        self.last_used = start
+
+        while True:
+            candidate = None
+
+            with self._condition:
+                self._evict_idle()
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"No PostgreSQL connection available after {self.acquire_timeout} seconds "
+                            f"(pool size {self.max_size})"
+                        )
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._condition.wait(remaining)
+                    continue
+
+            # Health checks and connects happen outside the lock
+            if candidate is not None:
+                conn, last_used = candidate
+                if not self._is_healthy(conn, last_used):
+                    with self._condition:
+                        self._close(conn)
+                        self._size -= 1
+                        self._stats["failed_health_checks"] += 1
+                        self._condition.notify()
+                    continue
+            else:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._stats["created"] += 1
+
+            elapsed_ms = (time.monotonic() - start) * 1000
+            with self._condition:
+                self._stats["checkouts"] += 1
+                self._stats["checkout_time_total_ms"] += elapsed_ms
+                self._stats["checkout_time_max_ms"] = max(self._stats["checkout_time_max_ms"], elapsed_ms)
+            return conn
+
+    def release(self, conn, discard=False):
+        """
+        Return a connection to the pool.
+
+        Any open transaction is rolled back and the session is reset. Broken
+        connections, or connections released with discard=True, are closed
+        instead of being reused.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                self._reset_session(conn)
+            except psycopg2.Error:
+                discard = True
+
+        with self._condition:
+            if discard or conn.closed or self._closed:
+                self._close(conn)
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def evict_idle(self):
+        """
+        Close idle connections that have not been used for too long.
+
+        Returns:
+            Number of connections still open
+        """
+        with self._condition:
+            self._evict_idle()
+            return self._size
+
+    def close(self):
+        """Close the pool: idle connections now, checked out ones when they are released."""
+        with self._condition:
+            self._closed = True
+        self.close_all()
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self._condition:
+            for conn, _ in self._idle:
+                self._close(conn)
+                self._size -= 1
+            self._idle = []
+            self._condition.notify_all()
+
+    def stats(self):
+        """Return a snapshot of the pool statistics."""
+        with self._condition:
+            checkouts = self._stats["checkouts"]
+            snapshot = dict(self._stats)
+            snapshot.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "checkout_time_avg_ms": (self._stats["checkout_time_total_ms"] / checkouts) if checkouts else 0.0,
+            })
+        return snapshot
+
+def _reap_pools():
+    """
+    Close idle connections of every pool, and drop pools that have had no
+    connections and no checkouts for POSTGRES_POOL_IDLE_TIMEOUT (runs on the
+    reaper thread).
+    """
+    while True:
+        idle_timeout = get_config()["POSTGRES_POOL_IDLE_TIMEOUT"]
+        time.sleep(max(idle_timeout / 2, 1))
+        with _pools_lock:
+            pools = list(_pools.items())
+        for connection_string, pool in pools:
+            if pool.evict_idle() == 0 and time.monotonic() - pool.last_used > idle_timeout:
+                with _pools_lock:
+                    if _pools.get(connection_string) is pool:
+                        del _pools[connection_string]
+                pool.close()
+
+def _start_reaper():
+    """Start the reaper thread on first use. Caller holds _pools_lock."""
+    global _reaper
+    if _reaper is None:
+        _reaper = threading.Thread(target=_reap_pools, name="postgres-pool-reaper", daemon=True)
+        _reaper.start()
+
+def get_pool(connection_string):
+    """
+    Get the pool for a connection string, creating it on first use.
+
+    At most POSTGRES_POOL_MAX_POOLS pools are kept; creating one more closes
+    the least recently used pool.
+    """
+    evicted = None
+    with _pools_lock:
+        _start_reaper()
+        pool = _pools.get(connection_string)
+        if pool is not None:
+            _pools.move_to_end(connection_string)
+        else:
+            config = get_config()
+            pool = ConnectionPool(
+                connection_string,
+                max_size=config["POSTGRES_POOL_MAX_SIZE"],
+                idle_timeout=config["POSTGRES_POOL_IDLE_TIMEOUT"],
+                acquire_timeout=config["POSTGRES_POOL_ACQUIRE_TIMEOUT"],
+                health_check_interval=config["POSTGRES_POOL_HEALTH_CHECK_INTERVAL"],
+                statement_timeout_ms=config["COMMAND_TIMEOUT"] * 1000,
+            )
+            _pools[connection_string] = pool
+            if len(_pools) > config["POSTGRES_POOL_MAX_POOLS"]:
+                _, evicted = _pools.popitem(last=False)
+
+    if evicted is not None:
+        logger.info(f"Closing least recently used PostgreSQL pool {redact_connection_string(evicted.connection_string)}")
+        evicted.close()
+    return pool
+
+@contextmanager
+def pooled_connection(connection_string):
+    """
+    Context manager that checks out a pooled connection and returns it afterwards.
+
+    Broken connections are detected on release and closed instead of reused.
+    """
+    pool = get_pool(connection_string)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+def get_pool_stats():
+    """Return statistics for every pool, keyed by a redacted connection string."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {redact_connection_string(pool.connection_string): pool.stats() for pool in pools}
+
+def close_all_pools():
+    """Close every pool, e.g. on shutdown."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_all_pools)
+
+def redact_connection_string(connection_string):
+    """Hide the password of a connection string so it can be reported."""
+    try:
+        params = extensions.parse_dsn(connection_string)
+    except psycopg2.Error:
+        return "<invalid connection string>"
+    user = params.get("user", "")
+    host = params.get("host", "localhost")
+    port = params.get("port", "5432")
+    dbname = params.get("dbname", "")
+    return f"postgresql://{user}@{host}:{port}/{dbname}"
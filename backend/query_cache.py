@@ -0,0 +1,126 @@
+"""
+Read-only query result cache for the n8n AI Assistant Pro backend.
+
+Results are kept in a memory-bounded LRU with a per-entry TTL, keyed by
+connection string and normalized SQL.
+"""
+
+import sys
+import time
+import threading
+from collections import OrderedDict
+from config import get_config
+
+# Module-level variables
+_cache = None
+_cache_lock = threading.Lock()
+
+def estimate_result_size(result):
+    """Approximate the memory held by a QueryResult, in bytes."""
+    size = sys.getsizeof(result.rows)
+    for row in result.rows:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    if result.columns:
+        size += sum(sys.getsizeof(column) for column in result.columns)
+    return size
+
+class ResultCache:
+    """Memory-bounded LRU cache of query results with a per-entry TTL."""
+
+    def __init__(self, max_bytes, default_ttl):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (result, expires_at, size), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "bypasses": 0,
+            "stores": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "rejected_too_large": 0,
+        }
+
+    def _remove(self, key):
+        """Drop an entry. Caller holds the lock."""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Return the cached result for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            result, expires_at, _ = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return result
+
+    def put(self, key, result, ttl=None):
+        """Store a result, evicting least recently used entries to stay within max_bytes."""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        size = estimate_result_size(result)
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats["rejected_too_large"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, time.monotonic() + ttl, size)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def record_bypass(self):
+        """Count a lookup skipped because the client asked for a fresh result."""
+        with self._lock:
+            self._stats["bypasses"] += 1
+
+    def invalidate(self, connection_string=None):
+        """Drop cached results, for one connection string or all of them."""
+        with self._lock:
+            for key in list(self._entries):
+                if connection_string is None or key[0] == connection_string:
+                    self._remove(key)
+                    self._stats["invalidations"] += 1
+
+    def stats(self):
+        """Return cache statistics, including the hit ratio."""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats.update({
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": (stats["hits"] / lookups) if lookups else 0.0,
+            })
+        return stats
+
+def get_result_cache():
+    """Get the process-wide result cache, or None if caching is disabled."""
+    global _cache
+    config = get_config()
+    if not config["QUERY_CACHE_ENABLED"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(config["QUERY_CACHE_MAX_BYTES"], config["QUERY_CACHE_TTL"])
+        return _cache
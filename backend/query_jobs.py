@@ -0,0 +1,231 @@
+"""
+Asynchronous PostgreSQL query jobs for the n8n AI Assistant Pro backend.
+
+Jobs run on a small bounded executor of their own, so slow analytics queries
+cannot take the Flask workers or the interactive endpoints with them.
+"""
+
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from psycopg2.extensions import QueryCanceledError
+from config import get_config
+from postgres_pool import pooled_connection
+from postgres_handler import validate_query, execute_on_connection, route_connection
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Module-level variables
+_executor = None
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are already waiting or running."""
+
+class _JobCancelled(Exception):
+    """Raised inside a job when a cancel arrives between statements or batches."""
+
+class QueryJob:
+    """State of one asynchronous query."""
+
+    def __init__(self, query, connection_string):
+        self.id = str(uuid.uuid4())
+        self.query = query
+        self.connection_string = connection_string
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rows_fetched = 0
+        self.connection = None  # pooled connection the job is running on
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.future = None
+        # Guards status and connection against a concurrent cancel
+        self.lock = threading.Lock()
+        # Held while a cancel request is sent, so the connection cannot go
+        # back to the pool under it; taken before self.lock
+        self.cancel_lock = threading.Lock()
+
+    def to_dict(self):
+        """Describe the job for API responses, without its result rows."""
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "query": self.query,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": (end - self.started_at) if self.started_at else None,
+            "rows_fetched": self.rows_fetched,
+            "error": self.error,
+        }
+
+def _get_executor():
+    """Create the job executor on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_config()["QUERY_JOB_WORKERS"],
+            thread_name_prefix="query-job"
+        )
+    return _executor
+
+def _finish(job, status, error=None):
+    """Mark a job as finished. Caller holds job.lock."""
+    job.status = status
+    job.error = error
+    job.finished_at = time.time()
+
+def _run_job(job):
+    """Execute a job on a pooled connection (runs on the job executor)."""
+    with job.lock:
+        if job.cancel_requested:
+            _finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+
+    def on_batch(rows_fetched):
+        job.rows_fetched = rows_fetched
+        if job.cancel_requested:
+            raise _JobCancelled()
+
+    try:
+        with pooled_connection(job.connection_string) as conn:
+            with job.lock:
+                job.connection = conn
+            try:
+                # Jobs get their own, longer timeout for this transaction only
+                cursor = conn.cursor()
+                cursor.execute(f"SET LOCAL statement_timeout = {get_config()['QUERY_JOB_TIMEOUT'] * 1000};")
+                cursor.close()
+
+                # A cancel sent while no statement was running has no effect on the backend
+                if job.cancel_requested:
+                    raise _JobCancelled()
+                result = execute_on_connection(conn, job.query, on_batch)
+
+                with job.lock:
+                    job.result = result
+                    job.rows_fetched = result.rowcount
+                    _finish(job, SUCCEEDED)
+            finally:
+                # Detach before the connection goes back to the pool, after any
+                # cancel in flight, so a late cancel can never hit whatever runs
+                # on it next
+                with job.cancel_lock, job.lock:
+                    job.connection = None
+
+    except _JobCancelled:
+        with job.lock:
+            _finish(job, CANCELLED)
+    except QueryCanceledError as e:
+        with job.lock:
+            if job.cancel_requested:
+                _finish(job, CANCELLED)
+            else:
+                _finish(job, FAILED, f"PostgreSQL Error: {str(e).strip()}")
+    except psycopg2.Error as e:
+        with job.lock:
+            _finish(job, FAILED, f"PostgreSQL Error: {str(e).strip()}")
+    except Exception as e:
+        logger.error(f"Error running query job {job.id}: {str(e)}", exc_info=True)
+        with job.lock:
+            _finish(job, FAILED, str(e))
+
+def _prune_finished_jobs():
+    """Forget finished jobs older than QUERY_JOB_RETENTION. Caller holds _jobs_lock."""
+    cutoff = time.time() - get_config()["QUERY_JOB_RETENTION"]
+    for job_id in [job_id for job_id, job in _jobs.items()
+                   if job.status in FINISHED_STATES and job.finished_at < cutoff]:
+        del _jobs[job_id]
+
+def submit_query_job(query, connection_string):
+    """
+    Queue a query for asynchronous execution.
+
+    Returns:
+        The new QueryJob
+
+    Raises:
+        QueryRejectedError: If the query is rejected
+        JobQueueFullError: If QUERY_JOB_MAX_PENDING jobs are already queued or running
+    """
+    classification = validate_query(query, connection_string)
+
+    # Analytics reads are the main use of jobs: keep them off the primary when possible
+    connection_string = route_connection(connection_string, classification.is_read_only)
+
+    with _jobs_lock:
+        _prune_finished_jobs()
+        pending = sum(1 for job in _jobs.values() if job.status not in FINISHED_STATES)
+        if pending >= get_config()["QUERY_JOB_MAX_PENDING"]:
+            raise JobQueueFullError(f"Too many pending query jobs ({pending}), try again later")
+
+        job = QueryJob(query, connection_string)
+        _jobs[job.id] = job
+        job.future = _get_executor().submit(_run_job, job)
+
+    logger.info(f"Query job {job.id} submitted")
+    return job
+
+def get_query_job(job_id):
+    """Return a job by ID, or None if unknown or expired."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def list_query_jobs():
+    """Return every known job, most recent first."""
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+def cancel_query_job(job):
+    """
+    Cancel a job.
+
+    Queued jobs are dropped before they start; running jobs are interrupted
+    with a cancel request for the connection serving them, sent over its own
+    socket so it needs no pool slot.
+
+    Returns:
+        True if a cancellation was issued, False if the job had already finished
+    """
+    with job.lock:
+        if job.status in FINISHED_STATES:
+            return False
+        job.cancel_requested = True
+
+        if job.status == QUEUED:
+            if job.future is not None and job.future.cancel():
+                _finish(job, CANCELLED)
+            # Otherwise _run_job sees cancel_requested as soon as it starts
+            return True
+
+    # The cancel request goes over the network: job.lock is not held meanwhile
+    with job.cancel_lock:
+        with job.lock:
+            conn = job.connection
+        if conn is not None:
+            try:
+                conn.cancel()
+                logger.info(f"Cancel sent for query job {job.id}")
+            except psycopg2.Error as e:
+                # The job still stops at its next batch
+                logger.warning(f"Could not send cancel for query job {job.id}: {str(e).strip()}")
+    return True
@@ -0,0 +1,74 @@
+"""
+In-memory slow query log for the n8n AI Assistant Pro backend.
+
+Queries slower than SLOW_QUERY_THRESHOLD_MS are kept in a fixed-size ring
+buffer, newest last.
+"""
+
+import time
+import threading
+from collections import deque
+from config import get_config
+from sql_utils import fingerprint_sql
+
+# Module-level variables
+_entries = None
+_lock = threading.Lock()
+_recorded_total = 0
+
+def _buffer():
+    """Create the ring buffer on first use. Caller holds the lock."""
+    global _entries
+    if _entries is None:
+        _entries = deque(maxlen=get_config()["SLOW_QUERY_LOG_SIZE"])
+    return _entries
+
+def record_query(query, duration_ms, rows=None, database=None, error=None):
+    """
+    Record a query if it exceeded the slow query threshold.
+
+    Args:
+        query: SQL text as executed (stored as a normalized fingerprint)
+        duration_ms: Execution time in milliseconds
+        rows: Rows returned or affected, if known
+        database: Database name
+        error: Error message if the query failed
+    """
+    global _recorded_total
+    if duration_ms < get_config()["SLOW_QUERY_THRESHOLD_MS"]:
+        return
+
+    entry = {
+        "timestamp": time.time(),
+        "duration_ms": round(duration_ms, 3),
+        "rows": rows,
+        "database": database,
+        "query": fingerprint_sql(query),
+        "error": error,
+    }
+    with _lock:
+        _buffer().append(entry)
+        _recorded_total += 1
+
+def get_slow_queries(limit=None):
+    """Return recorded slow queries, newest first."""
+    with _lock:
+        entries = list(_buffer())
+    entries.reverse()
+    return entries[:limit] if limit else entries
+
+def clear_slow_queries():
+    """Empty the slow query log."""
+    with _lock:
+        _buffer().clear()
+
+def get_slow_query_stats():
+    """Return the size and threshold of the slow query log."""
+    config = get_config()
+    with _lock:
+        return {
+            "entries": len(_buffer()),
+            "capacity": config["SLOW_QUERY_LOG_SIZE"],
+            "threshold_ms": config["SLOW_QUERY_THRESHOLD_MS"],
+            "recorded_total": _recorded_total,
+        }
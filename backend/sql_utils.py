@@ -0,0 +1,324 @@
+"""
+SQL lexing helpers for the n8n AI Assistant Pro backend.
+
+The lexer understands string literals, quoted identifiers, dollar quoting and
+(nested) comments, so keywords are never matched inside text or comments.
+"""
+
+import re
+
+# Simple tokens; comments, dollar quotes and whitespace are handled in tokenize()
+_TOKEN_RE = re.compile(r"""
+      (?P<string>[eE]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*')
+    | (?P<ident>"(?:[^"]|"")*")
+    | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<word>[A-Za-z_\u0080-\uffff][A-Za-z0-9_$\u0080-\uffff]*)
+    | (?P<param>\$\d+|%\(\w+\)s|%s)
+    | (?P<op>::|<=|>=|<>|!=|\|\||[^\s\w])
+""", re.VERBOSE | re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+_DOLLAR_TAG_RE = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+
+# Statement kinds
+READ = 'read'
+WRITE = 'write'
+DDL = 'ddl'
+TRANSACTION = 'transaction'
+UTILITY = 'utility'
+
+# Statement kind by leading keyword; 'with' and 'explain' depend on what follows
+_READ_START = frozenset(['select', 'values', 'table', 'show', 'with', 'explain'])
+_WRITE_START = frozenset(['insert', 'update', 'delete', 'merge', 'copy', 'lock', 'call', 'do'])
+_DDL_START = frozenset([
+    'create', 'alter', 'drop', 'truncate', 'comment', 'grant', 'revoke', 'reindex',
+    'cluster', 'vacuum', 'analyze', 'refresh', 'import', 'security',
+])
+_TRANSACTION_START = frozenset([
+    'begin', 'start', 'commit', 'end', 'rollback', 'abort', 'savepoint', 'release', 'prepare',
+])
+
+# Keywords and functions that make an otherwise read-looking statement write
+# or have side effects (SELECT ... INTO creates a table)
+_WRITE_WORDS = frozenset([
+    'insert', 'update', 'delete', 'merge', 'into', 'truncate', 'copy',
+    'nextval', 'setval', 'pg_advisory_lock', 'pg_advisory_xact_lock',
+    'pg_cancel_backend', 'pg_terminate_backend', 'pg_reload_conf',
+    'dblink_exec', 'lo_import', 'lo_export', 'lo_unlink', 'set_config',
+])
+_LOCKING_WORDS = frozenset(['update', 'share', 'no', 'key'])
+
+# Words before DELETE/UPDATE that do not start a data-modifying clause
+# (ON DELETE CASCADE, FOR UPDATE, FOR NO KEY UPDATE, ON CONFLICT DO UPDATE)
+_NON_STATEMENT_PREFIXES = frozenset(['on', 'for', 'key', 'do', 'before', 'after', 'of', 'or'])
+_DANGEROUS_DROP_TARGETS = frozenset(['table', 'schema', 'database'])
+
+class Token:
+    """A lexical token: kind is one of string, ident, dollar, number, word, param, op, comment."""
+
+    __slots__ = ('kind', 'text')
+
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+
+    @property
+    def value(self):
+        """Lower-cased text for words (unquoted identifiers fold to lower case), raw text otherwise."""
+        return self.text.lower() if self.kind == 'word' else self.text
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.text!r})"
+
+def tokenize(query, keep_comments=False):
+    """
+    Split SQL text into tokens.
+
+    Args:
+        query: SQL text
+        keep_comments: Include comment tokens in the output
+
+    Returns:
+        List of Token objects, without whitespace
+    """
+    tokens = []
+    pos = 0
+    length = len(query)
+
+    while pos < length:
+        match = _WHITESPACE_RE.match(query, pos)
+        if match:
+            pos = match.end()
+            continue
+
+        if query.startswith('--', pos):
+            end = query.find('\n', pos)
+            end = length if end == -1 else end
+            if keep_comments:
+                tokens.append(Token('comment', query[pos:end]))
+            pos = end
+            continue
+
+        if query.startswith('/*', pos):
+            # Block comments nest in PostgreSQL
+            depth = 0
+            end = pos
+            while end < length:
+                if query.startswith('/*', end):
+                    depth += 1
+                    end += 2
+                elif query.startswith('*/', end):
+                    depth -= 1
+                    end += 2
+                    if depth == 0:
+                        break
+                else:
+                    end += 1
+            if keep_comments:
+                tokens.append(Token('comment', query[pos:end]))
+            pos = end
+            continue
+
+        if query[pos] == '$':
+            match = _DOLLAR_TAG_RE.match(query, pos)
+            if match:
+                tag = match.group(0)
+                end = query.find(tag, match.end())
+                end = length if end == -1 else end + len(tag)
+                tokens.append(Token('dollar', query[pos:end]))
+                pos = end
+                continue
+
+        match = _TOKEN_RE.match(query, pos)
+        if not match:
+            # Unterminated literal or identifier: keep the rest as a single token
+            tokens.append(Token('string', query[pos:]))
+            break
+        tokens.append(Token(match.lastgroup, match.group(0)))
+        pos = match.end()
+
+    return tokens
+
+def split_statements(tokens):
+    """Split a token list on semicolons, dropping empty statements."""
+    statements = []
+    current = []
+    for token in tokens:
+        if token.kind == 'op' and token.text == ';':
+            if current:
+                statements.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        statements.append(current)
+    return statements
+
+def normalize_sql(query):
+    """
+    Normalize SQL text for use as a cache key.
+
+    Comments are dropped, whitespace is collapsed, unquoted words are
+    lower-cased and trailing semicolons are removed. Literals are kept as is.
+    """
+    tokens = [token for token in tokenize(query) if token.kind != 'comment']
+    while tokens and tokens[-1].kind == 'op' and tokens[-1].text == ';':
+        tokens.pop()
+    return ' '.join(token.value for token in tokens)
+
+def fingerprint_sql(query):
+    """
+    Normalize SQL text and replace literals with '?'.
+
+    Queries that differ only in their constants share a fingerprint, which is
+    what the slow query log groups and displays.
+    """
+    parts = []
+    for token in tokenize(query):
+        if token.kind in ('string', 'number', 'dollar'):
+            parts.append('?')
+        else:
+            parts.append(token.value)
+    while parts and parts[-1] == ';':
+        parts.pop()
+    return ' '.join(parts)
+
+class StatementInfo:
+    """Classification of one SQL statement."""
+
+    __slots__ = ('kind', 'command', 'dangerous', 'locking')
+
+    def __init__(self, kind, command, dangerous=False, locking=False):
+        self.kind = kind
+        self.command = command
+        self.dangerous = dangerous
+        self.locking = locking
+
+    def to_dict(self):
+        """Describe the statement for API responses."""
+        return {"kind": self.kind, "command": self.command, "dangerous": self.dangerous}
+
+class QueryClassification:
+    """Classification of every statement in a query."""
+
+    __slots__ = ('statements',)
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    @property
+    def is_read_only(self):
+        """A single statement that only reads data."""
+        return len(self.statements) == 1 and self.statements[0].kind == READ
+
+    @property
+    def is_dangerous(self):
+        """Any statement could modify a whole table without conditions."""
+        return any(statement.dangerous for statement in self.statements)
+
+    @property
+    def is_streamable(self):
+        """A single read that can be declared as a server-side cursor."""
+        if not self.is_read_only:
+            return False
+        statement = self.statements[0]
+        return statement.command in ('select', 'with', 'values', 'table') and not statement.locking
+
+    def to_dict(self):
+        """Describe the classification for API responses."""
+        return {
+            "read_only": self.is_read_only,
+            "dangerous": self.is_dangerous,
+            "statements": [statement.to_dict() for statement in self.statements],
+        }
+
+def _has_where_clause(words, start):
+    """
+    Check for a WHERE at the same nesting depth as words[start], before the
+    enclosing parenthesis closes.
+    """
+    depth = 0
+    for word in words[start + 1:]:
+        if word == '(':
+            depth += 1
+        elif word == ')':
+            depth -= 1
+            if depth < 0:
+                return False
+        elif word == 'where' and depth == 0:
+            return True
+    return False
+
+def _unconditional_modification(words):
+    """Find DELETE or UPDATE clauses (including inside CTEs) without a WHERE."""
+    for index, word in enumerate(words):
+        if word not in ('delete', 'update'):
+            continue
+        if index > 0 and words[index - 1] in _NON_STATEMENT_PREFIXES:
+            continue
+        if not _has_where_clause(words, index):
+            return True
+    return False
+
+def _explain_analyzes(keywords):
+    """Check whether an EXPLAIN statement has the ANALYZE option."""
+    for word in keywords[1:]:
+        if word in _READ_START or word in _WRITE_START:
+            return False
+        if word == 'analyze':
+            return True
+    return False
+
+def classify_statement(tokens):
+    """
+    Classify the tokens of one statement.
+
+    Returns:
+        StatementInfo with the statement kind (read, write, ddl, transaction,
+        utility), its leading command and whether it is dangerous
+    """
+    # Parentheses are kept so clause nesting can be followed
+    words = [token.value for token in tokens
+             if token.kind == 'word' or (token.kind == 'op' and token.text in '()')]
+    keywords = [word for word in words if word not in ('(', ')')]
+    if not keywords:
+        return StatementInfo(UTILITY, '')
+
+    command = keywords[0]
+    locking = any(word == 'for' and next_word in _LOCKING_WORDS
+                  for word, next_word in zip(keywords, keywords[1:]))
+
+    if command in _DDL_START:
+        dangerous = command == 'truncate' or (
+            command == 'drop' and len(keywords) > 1 and keywords[1] in _DANGEROUS_DROP_TARGETS
+        )
+        return StatementInfo(DDL, command, dangerous=dangerous)
+
+    if command in _TRANSACTION_START:
+        return StatementInfo(TRANSACTION, command)
+
+    if command in _READ_START:
+        # EXPLAIN ANALYZE really executes the statement it explains
+        if command == 'explain' and not _explain_analyzes(keywords):
+            return StatementInfo(READ, command)
+        if not any(word in _WRITE_WORDS for word in keywords) and not locking:
+            return StatementInfo(READ, command)
+        return StatementInfo(WRITE, command, dangerous=_unconditional_modification(words), locking=locking)
+
+    if command in _WRITE_START:
+        return StatementInfo(WRITE, command, dangerous=_unconditional_modification(words))
+
+    # SET, RESET, SHOW-like session commands, LISTEN/NOTIFY, prepared statements...
+    return StatementInfo(UTILITY, command)
+
+def classify_query(query):
+    """Lex a query and classify each of its statements."""
+    return QueryClassification([classify_statement(tokens) for tokens in split_statements(tokenize(query))])
+
+def is_read_only_query(query):
+    """
+    Check whether a query is a single statement that only reads data.
+
+    Conservative: anything that might write, lock rows or call a function
+    with known side effects is not considered read-only.
+    """
+    return classify_query(query).is_read_only
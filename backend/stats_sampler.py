@@ -0,0 +1,396 @@
+"""
+Background container metrics sampler for the n8n AI Assistant Pro backend.
+
+One streaming stats connection is kept open per running container on the
+default Docker host. Samples are stored in fixed-size, array-backed ring
+buffers, so current stats and recent trends are served from memory.
+"""
+
+import math
+import time
+import logging
+import threading
+from array import array
+import docker
+from config import get_config
+
+logger = logging.getLogger("n8n_ai_assistant_api")
+
+# Metrics kept per sample, in storage order
+METRICS = (
+    'cpu_percent', 'mem_usage', 'mem_limit', 'mem_percent',
+    'net_rx', 'net_tx', 'block_read', 'block_write',
+)
+
+# Module-level variables
+_sampler = None
+_sampler_lock = threading.Lock()
+
+def compute_container_stats(stats):
+    """
+    Turn a raw stats sample into usage figures.
+
+    Args:
+        stats: One sample from container.stats()
+
+    Returns:
+        Dict with cpu_percent, mem_usage, mem_limit, mem_percent and
+        net_io / block_io as (read, write) byte pairs, or None where the
+        sample does not have them
+    """
+    cpu_stats = stats.get('cpu_stats', {})
+    precpu_stats = stats.get('precpu_stats', {})
+
+    # Calculate CPU percentage; the first sample of a container has no previous reading
+    cpu_percent = None
+    system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
+    if system_delta > 0:
+        cpu_delta = cpu_stats['cpu_usage']['total_usage'] - precpu_stats.get('cpu_usage', {}).get('total_usage', 0)
+        num_cpus = cpu_stats.get('online_cpus') or len(cpu_stats['cpu_usage'].get('percpu_usage') or [None])
+        cpu_percent = (cpu_delta / system_delta) * num_cpus * 100.0
+
+    # Calculate memory usage
+    memory_stats = stats.get('memory_stats', {})
+    mem_usage = memory_stats.get('usage')
+    mem_limit = memory_stats.get('limit')
+    mem_percent = (mem_usage / mem_limit) * 100.0 if mem_usage is not None and mem_limit else None
+
+    # Network and storage
+    net_io = None
+    if 'networks' in stats:
+        net_io = (
+            sum(net['rx_bytes'] for net in stats['networks'].values()),
+            sum(net['tx_bytes'] for net in stats['networks'].values()),
+        )
+
+    block_io = None
+    io_bytes = (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive')
+    if io_bytes:
+        block_io = (
+            sum(item['value'] for item in io_bytes if item['op'] == 'Read'),
+            sum(item['value'] for item in io_bytes if item['op'] == 'Write'),
+        )
+
+    return {
+        "cpu_percent": cpu_percent,
+        "mem_usage": mem_usage,
+        "mem_limit": mem_limit,
+        "mem_percent": mem_percent,
+        "net_io": net_io,
+        "block_io": block_io,
+    }
+
+def _flatten(computed):
+    """Map compute_container_stats() output to METRICS values, NaN where missing."""
+    net_io = computed["net_io"] or (None, None)
+    block_io = computed["block_io"] or (None, None)
+    values = (
+        computed["cpu_percent"], computed["mem_usage"], computed["mem_limit"], computed["mem_percent"],
+        net_io[0], net_io[1], block_io[0], block_io[1],
+    )
+    return [math.nan if value is None else float(value) for value in values]
+
+def _clean(value):
+    """NaN to None, for JSON."""
+    return None if math.isnan(value) else value
+
+class RingBuffer:
+    """
+    Fixed-size sample history of one container.
+
+    Timestamps and each metric live in preallocated arrays of doubles, so
+    the memory used is constant and appending never allocates.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._timestamps = array('d', [0.0]) * capacity
+        self._values = [array('d', [math.nan]) * capacity for _ in METRICS]
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, values):
+        """Store one sample, overwriting the oldest when full."""
+        with self._lock:
+            index = self._next
+            self._timestamps[index] = timestamp
+            for column, value in zip(self._values, values):
+                column[index] = value
+            self._next = (index + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def __len__(self):
+        return self._count
+
+    def last_timestamp(self):
+        """Timestamp of the newest sample, or None when empty."""
+        with self._lock:
+            if not self._count:
+                return None
+            return self._timestamps[(self._next - 1) % self.capacity]
+
+    def latest(self):
+        """Return the newest sample as a dict, or None when empty."""
+        with self._lock:
+            if not self._count:
+                return None
+            index = (self._next - 1) % self.capacity
+            sample = {"timestamp": self._timestamps[index]}
+            for name, column in zip(METRICS, self._values):
+                sample[name] = _clean(column[index])
+        return sample
+
+    def snapshot(self, since=None):
+        """
+        Copy the samples out in chronological order.
+
+        Returns:
+            (timestamps, columns) where columns holds one list per METRICS entry
+        """
+        with self._lock:
+            start = (self._next - self._count) % self.capacity
+            order = [(start + offset) % self.capacity for offset in range(self._count)]
+            timestamps = [self._timestamps[index] for index in order]
+            columns = [[column[index] for index in order] for column in self._values]
+
+        if since is not None:
+            first = next((position for position, timestamp in enumerate(timestamps) if timestamp >= since),
+                         len(timestamps))
+            timestamps = timestamps[first:]
+            columns = [column[first:] for column in columns]
+        return timestamps, columns
+
+def downsample(timestamps, columns, points):
+    """
+    Reduce a series to at most `points` samples.
+
+    The time range is split into equal buckets; each bucket reports the mean
+    of every metric (ignoring missing values) plus the peak CPU, so short
+    spikes stay visible.
+
+    Returns:
+        List of sample dicts
+    """
+    if not timestamps:
+        return []
+
+    start, end = timestamps[0], timestamps[-1]
+    bucket_count = max(1, min(points, len(timestamps)))
+    width = (end - start) / bucket_count or 1.0
+
+    buckets = [[] for _ in range(bucket_count)]
+    for position, timestamp in enumerate(timestamps):
+        buckets[min(int((timestamp - start) / width), bucket_count - 1)].append(position)
+
+    cpu_column = columns[METRICS.index('cpu_percent')]
+    samples = []
+    for positions in buckets:
+        if not positions:
+            continue
+        sample = {"timestamp": timestamps[positions[-1]], "samples": len(positions)}
+        for name, column in zip(METRICS, columns):
+            values = [column[position] for position in positions if not math.isnan(column[position])]
+            sample[name] = sum(values) / len(values) if values else None
+        peaks = [cpu_column[position] for position in positions if not math.isnan(cpu_column[position])]
+        sample["cpu_percent_max"] = max(peaks) if peaks else None
+        samples.append(sample)
+    return samples
+
+class StatsSampler:
+    """Keeps a streaming stats reader per running container of one Docker host."""
+
+    def __init__(self, docker_host, capacity, interval, rescan_interval, max_containers):
+        self.docker_host = docker_host
+        self.capacity = capacity
+        self.interval = interval
+        self.rescan_interval = rescan_interval
+        self.max_containers = max_containers
+        self._client = None
+        self._buffers = {}  # container name -> RingBuffer
+        self._readers = {}  # container id -> reader thread
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the supervisor thread."""
+        self._thread = threading.Thread(target=self._supervise, name="stats-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling; closing the client ends the open streams."""
+        self._stop.set()
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+
+    def _get_client(self):
+        """Create the sampler's own client, sized for one connection per stream."""
+        if self._client is None:
+            # Streams hold their connection for as long as they run, so they
+            # must not take the slots of the shared per-host client
+            self._client = docker.DockerClient(base_url=self.docker_host, max_pool_size=self.max_containers + 2)
+        return self._client
+
+    def _supervise(self):
+        """Start readers for new containers and drop stale history, every rescan_interval."""
+        while not self._stop.is_set():
+            try:
+                self._rescan()
+            except Exception as e:
+                logger.warning(f"Stats sampler rescan failed: {str(e)}")
+                # Reconnect on the next round, e.g. after a daemon restart
+                client, self._client = self._client, None
+                if client is not None:
+                    try:
+                        client.close()
+                    except Exception:
+                        pass
+            self._stop.wait(self.rescan_interval)
+
+    def _rescan(self):
+        """Match the set of readers to the running containers."""
+        containers = self._get_client().containers.list()
+        running = {container.name for container in containers}
+
+        with self._lock:
+            for container in containers:
+                reader = self._readers.get(container.id)
+                if reader is not None and reader.is_alive():
+                    continue
+                if len(self._readers) >= self.max_containers and container.id not in self._readers:
+                    continue
+                reader = threading.Thread(
+                    target=self._read_stream, args=(container,),
+                    name=f"stats-{container.name}", daemon=True
+                )
+                self._readers[container.id] = reader
+                reader.start()
+
+            # Readers end by themselves when their container stops
+            for container_id in [container_id for container_id, reader in self._readers.items()
+                                 if not reader.is_alive()]:
+                del self._readers[container_id]
+
+            # Keep the history of stopped containers until it would have rolled over
+            horizon = time.time() - self.capacity * self.interval
+            for name in [name for name, buffer in self._buffers.items()
+                         if name not in running and (buffer.last_timestamp() or 0) < horizon]:
+                del self._buffers[name]
+
+    def _read_stream(self, container):
+        """Record one sample every interval from a container's stats stream."""
+        with self._lock:
+            buffer = self._buffers.get(container.name)
+            if buffer is None:
+                buffer = self._buffers[container.name] = RingBuffer(self.capacity)
+
+        last_recorded = 0.0
+        try:
+            # The daemon pushes a sample about every second
+            for stats in container.stats(stream=True, decode=True):
+                if self._stop.is_set():
+                    break
+                now = time.time()
+                if now - last_recorded < self.interval:
+                    continue
+                last_recorded = now
+                buffer.append(now, _flatten(compute_container_stats(stats)))
+        except Exception as e:
+            if not self._stop.is_set():
+                logger.debug(f"Stats stream for {container.name} ended: {str(e)}")
+
+    def latest(self, name, max_age):
+        """Newest sample of a container if it is at most max_age seconds old."""
+        with self._lock:
+            buffer = self._buffers.get(name)
+        if buffer is None:
+            return None
+        sample = buffer.latest()
+        if sample is None or time.time() - sample["timestamp"] > max_age:
+            return None
+        return sample
+
+    def history(self, name=None, points=120, since=None):
+        """Downsampled history of one container, or of all of them, keyed by name."""
+        with self._lock:
+            buffers = dict(self._buffers)
+        if name is not None:
+            buffers = {name: buffers[name]} if name in buffers else {}
+        return {
+            container_name: downsample(*buffer.snapshot(since), points)
+            for container_name, buffer in buffers.items()
+        }
+
+    def status(self):
+        """Describe the sampler for API responses."""
+        with self._lock:
+            return {
+                "docker_host": self.docker_host,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "streams": sum(1 for reader in self._readers.values() if reader.is_alive()),
+                "containers": len(self._buffers),
+                "capacity": self.capacity,
+                "interval": self.interval,
+            }
+
+def start_stats_sampler():
+    """Start the sampler for the default Docker host, if enabled."""
+    global _sampler
+    config = get_config()
+    if not config["DOCKER_STATS_SAMPLER_ENABLED"]:
+        return None
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StatsSampler(
+                config["DEFAULT_DOCKER_HOST"],
+                capacity=config["DOCKER_STATS_HISTORY_SIZE"],
+                interval=config["DOCKER_STATS_SAMPLE_INTERVAL"],
+                rescan_interval=config["DOCKER_STATS_RESCAN_INTERVAL"],
+                max_containers=config["DOCKER_STATS_SAMPLER_MAX_CONTAINERS"],
+            )
+            _sampler.start()
+            logger.info(f"Stats sampler started for {config['DEFAULT_DOCKER_HOST']}")
+        return _sampler
+
+def stop_stats_sampler():
+    """Stop the sampler if it is running."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is not None:
+            _sampler.stop()
+            _sampler = None
+
+def get_stats_sampler():
+    """Get the running sampler, or None."""
+    return _sampler
+
+def get_latest_stats(docker_host, name):
+    """
+    Get the newest sampled stats of a container, if the sampler covers the host.
+
+    Returns:
+        Dict shaped like compute_container_stats() output, or None when the
+        host is not sampled or the sample is older than two intervals
+    """
+    sampler = _sampler
+    if sampler is None or (docker_host or get_config()["DEFAULT_DOCKER_HOST"]) != sampler.docker_host:
+        return None
+    sample = sampler.latest(name, max_age=2 * sampler.interval)
+    if sample is None:
+        return None
+
+    def pair(first, second):
+        return None if sample[first] is None or sample[second] is None else (sample[first], sample[second])
+
+    return {
+        "cpu_percent": sample["cpu_percent"],
+        "mem_usage": sample["mem_usage"],
+        "mem_limit": sample["mem_limit"],
+        "mem_percent": sample["mem_percent"],
+        "net_io": pair("net_rx", "net_tx"),
+        "block_io": pair("block_read", "block_write"),
+    }
@@ -41,4 +41,18 @@ def graceful_shutdown(environ):
         return True
     except Exception as e:
         logger.error(f"Error during graceful shutdown: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def _cache_control_directives():
+    """Directives of the current request's Cache-Control header."""
+    cache_control = request.headers.get('Cache-Control', '').lower()
+    return [directive.strip() for directive in cache_control.split(',')]
+
+def request_bypasses_cache():
+    """Check whether the current request asks for a fresh (uncached) response."""
+    directives = _cache_control_directives()
+    return 'no-cache' in directives or 'no-store' in directives
+
+def request_forbids_store():
+    """Check whether the current request's response must not be cached (no-store)."""
+    return 'no-store' in _cache_control_directives()